@@ -3,7 +3,7 @@ from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from django.utils.translation import gettext_lazy as _
 
-from .models import User
+from .models import AccountDeletion, Task, User
 
 
 class UserAdmin(BaseUserAdmin):
@@ -44,3 +44,25 @@ class UserAdmin(BaseUserAdmin):
 
 
 admin.site.register(User, UserAdmin)
+
+
+@admin.register(AccountDeletion)
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """Progress of the account deletions, read only."""
+    list_display = ['email', 'status', 'step', 'deleted_rows', 'created_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = [field.name for field in AccountDeletion._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Background tasks, read only."""
+    list_display = ['name', 'status', 'priority', 'attempts', 'run_at', 'finished_at']
+    list_filter = ['status', 'name']
+    readonly_fields = [field.name for field in Task._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
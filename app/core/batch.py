@@ -0,0 +1,139 @@
+"""
+Batches of API calls served in one HTTP request.
+
+The batch is authenticated once and each call is dispatched straight to
+the view of its path with the user of the batch, without the middlewares.
+Runs of consecutive reads are served concurrently on a pool of
+`BATCH_MAX_WORKERS` threads and writes one after the other, so a read
+listed after a write sees it. An `atomic` batch with writes runs in the
+request thread in one transaction on each database of the user, rolled
+back when a write fails.
+"""
+import io
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from functools import partial
+from itertools import groupby
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections, transaction
+from django.urls import Resolver404, resolve
+
+from .sharding import shard_for
+
+logger = logging.getLogger(__name__)
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+METHODS = READ_METHODS + ('POST', 'PUT', 'PATCH', 'DELETE')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+class Rollback(Exception):
+    pass
+
+
+def get_executor():
+    """Returns the pool of the process, its threads keep their connections between batches."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS, thread_name_prefix='batch')
+        return _executor
+
+
+def resolve_call(path):
+    """Returns the resolver match of a path of the `BATCH_APPS`, None for any other path."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return None
+    return match if match.app_name in settings.BATCH_APPS else None
+
+
+def build_request(request, call):
+    """Returns the request of a call, authenticated as the batch."""
+    url = urlsplit(call['path'])
+    body = b'' if call.get('body') is None else json.dumps(call['body']).encode()
+    environ = {
+        **request.META,
+        'REQUEST_METHOD': call['method'],
+        'PATH_INFO': url.path,
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    sub_request = WSGIRequest(environ)
+    # Read by rest_framework.request.Request in place of the authenticators.
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
+
+
+def dispatch(request, call):
+    """Serve one call, returns its status and body."""
+    sub_request = build_request(request, call)
+    match = resolve_call(call['path'])
+    sub_request.resolver_match = match
+    try:
+        response = match.func(sub_request, *match.args, **match.kwargs)
+    except Exception:
+        logger.exception('Batch call %s %s failed', call['method'], call['path'])
+        return {'status': 500, 'body': {'detail': 'Server error.'}}
+    if hasattr(response, 'data'):
+        body = response.data
+    elif not response.content:
+        body = None
+    elif 'json' in response.get('Content-Type', ''):
+        body = json.loads(response.content)
+    else:
+        body = response.content.decode(response.charset)
+    return {'status': response.status_code, 'body': body}
+
+
+def _dispatch_in_thread(request, call):
+    """Serve a call on a pool thread, which handles its connections like a request."""
+    close_old_connections()
+    try:
+        return dispatch(request, call)
+    finally:
+        close_old_connections()
+
+
+def _run_atomic(request, calls):
+    responses = []
+    try:
+        with ExitStack() as stack:
+            # The user and the recipe data of the user may be on different databases.
+            for using in sorted({'default', shard_for(request.user)}):
+                stack.enter_context(transaction.atomic(using=using))
+            for call in calls:
+                response = dispatch(request, call)
+                responses.append(response)
+                if response['status'] >= 500 or response['status'] >= 400 and call['method'] not in READ_METHODS:
+                    raise Rollback
+    except Rollback:
+        skipped = {'status': 424, 'body': {'detail': 'Not run, a previous write of the batch failed.'}}
+        return responses + [skipped] * (len(calls) - len(responses)), True
+    return responses, False
+
+
+def run(request, calls, atomic=False):
+    """Serve the calls, returns their responses in order and whether the writes were rolled back."""
+    if atomic and any(call['method'] not in READ_METHODS for call in calls):
+        return _run_atomic(request, calls)
+    responses = []
+    for is_read, group in groupby(calls, key=lambda call: call['method'] in READ_METHODS):
+        group = list(group)
+        if is_read and len(group) > 1 and settings.BATCH_MAX_WORKERS > 1:
+            responses += get_executor().map(partial(_dispatch_in_thread, request), group)
+        else:
+            responses += [dispatch(request, call) for call in group]
+    return responses, False
@@ -0,0 +1,32 @@
+"""
+Cache backends recording hit and miss metrics.
+"""
+from django.core.cache.backends.locmem import LocMemCache
+
+from .metrics import record_cache_lookup
+
+_missing = object()
+
+
+class InstrumentedCacheMixin:
+    """Count hits and misses of `get` and `get_many` for any cache backend."""
+
+    def __init__(self, location, params):
+        super().__init__(location, params)
+        self.metrics_alias = params.get('METRICS_ALIAS', 'default')
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version=version)
+        record_cache_lookup(self.metrics_alias, value is not _missing)
+        return default if value is _missing else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        values = super().get_many(keys, version=version)
+        for key in keys:
+            record_cache_lookup(self.metrics_alias, key in values)
+        return values
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    """Local memory cache with hit ratio metrics."""
@@ -0,0 +1,81 @@
+"""
+Background deletion of user accounts, run as a task of `core.tasks`.
+
+Deleting a user cascades through all of its data in one transaction. The
+account is deactivated at once instead, then the rows of every model of
+`ACCOUNT_DELETION_MODELS` are deleted in batches of
+`ACCOUNT_DELETION_BATCH_SIZE`, each in its own transaction, and the user
+last. Querysets with a `bulk_delete` method use it instead of `delete`.
+"""
+import traceback
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import sharding, tasks
+from .models import AccountDeletion
+
+
+def request_deletion(user):
+    """Deactivate the user and queue the deletion of the account."""
+    using = user._state.db
+    with transaction.atomic(using=using):
+        user.is_active = False
+        user.save(using=using, update_fields=['is_active'])
+        apps.get_model('authtoken', 'Token').objects.using(using).filter(user=user).delete()
+        deletion, _ = AccountDeletion.objects.using(using).get_or_create(user_id=user.pk, defaults={'email': user.email})
+        # Queued in the same transaction, the worker only sees committed deletions.
+        tasks.enqueue(run_deletion, deletion.pk, using, using=using, priority=settings.ACCOUNT_DELETION_PRIORITY)
+    return deletion
+
+
+def _delete_in_batches(deletion, model, using):
+    """Delete the rows of the model owned by the user, returns the number deleted."""
+    # Sharded rows are on the shard of the user, the progress next to the user.
+    rows_using = sharding.shard_for(deletion.user_id) if sharding.is_sharded(model) else using
+    rows = model._default_manager.using(rows_using).filter(user_id=deletion.user_id)
+    deleted = 0
+    while True:
+        ids = list(rows.order_by('pk').values_list('pk', flat=True)[:settings.ACCOUNT_DELETION_BATCH_SIZE])
+        if not ids:
+            return deleted
+        with transaction.atomic(using=rows_using):
+            if sharding.is_sharded(model):
+                sharding.lock_user(deletion.user_id, rows_using)
+            batch = model._default_manager.using(rows_using).filter(pk__in=ids)
+            count = batch.bulk_delete() if hasattr(batch, 'bulk_delete') else batch.delete()[1].get(model._meta.label, 0)
+        AccountDeletion.objects.using(using).filter(pk=deletion.pk).update(
+            deleted_rows=F('deleted_rows') + count, updated_at=timezone.now(),
+        )
+        deleted += count
+
+
+def run_deletion(deletion_id, using='default'):
+    """Delete the account batch by batch, can be resumed after a failure."""
+    deletion = AccountDeletion.objects.using(using).get(pk=deletion_id)
+    if deletion.status == AccountDeletion.DONE:
+        return deletion
+    try:
+        for label in settings.ACCOUNT_DELETION_MODELS:
+            AccountDeletion.objects.using(using).filter(pk=deletion.pk).update(
+                status=AccountDeletion.RUNNING, step=label, updated_at=timezone.now(),
+            )
+            _delete_in_batches(deletion, apps.get_model(label), using)
+        # The remaining dependents are small, they cascade with the user.
+        get_user_model().objects.using(using).filter(pk=deletion.user_id).delete()
+    except Exception:
+        AccountDeletion.objects.using(using).filter(pk=deletion.pk).update(
+            status=AccountDeletion.FAILED, error=traceback.format_exc(), updated_at=timezone.now(),
+        )
+        # The task is retried with backoff, from the progress made.
+        raise
+    else:
+        AccountDeletion.objects.using(using).filter(pk=deletion.pk).update(
+            status=AccountDeletion.DONE, step='', error='', finished_at=timezone.now(), updated_at=timezone.now(),
+        )
+    deletion.refresh_from_db()
+    return deletion
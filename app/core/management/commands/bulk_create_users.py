@@ -0,0 +1,46 @@
+"""
+Django command to create many user accounts from a CSV file.
+"""
+import csv
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+FIELDS = ('email', 'password', 'first_name', 'last_name')
+
+
+def read_users(file):
+    """Returns the users of the rows of a CSV file, without the empty fields."""
+    reader = csv.DictReader(file)
+    if 'email' not in (reader.fieldnames or []):
+        raise CommandError('The CSV file has no email column')
+    return [{field: row[field] for field in FIELDS if row.get(field)} for row in reader]
+
+
+class Command(BaseCommand):
+    """Django command creating the users of a CSV file, reporting the rejected rows."""
+    help = 'Create users from a CSV file with an email column and optional password, first_name and last_name.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Path of the CSV file, - for stdin.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Users per INSERT.')
+        parser.add_argument('--workers', type=int, default=None, help='Processes hashing the passwords.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['file'] == '-':
+            users = read_users(sys.stdin)
+        else:
+            try:
+                with open(options['file'], newline='') as file:
+                    users = read_users(file)
+            except OSError as error:
+                raise CommandError(str(error))
+
+        created, rejected = get_user_model().objects.bulk_create_users(
+            users, batch_size=options['batch_size'], max_workers=options['workers'],
+        )
+        for email, reason in rejected:
+            self.stdout.write(self.style.WARNING(f'{email}: {reason}'))
+        self.stdout.write(self.style.SUCCESS(f'Created {created} users, rejected {len(rejected)}'))
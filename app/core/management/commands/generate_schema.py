@@ -0,0 +1,18 @@
+"""
+Django command to precompute the OpenAPI schema of the current code version.
+"""
+from django.core.management.base import BaseCommand
+
+from core.schema import SCHEMA_FORMATS, code_version, schema_path, write_schema
+
+
+class Command(BaseCommand):
+    """Django command to generate the cached schema artifacts."""
+    help = 'Generate the compressed OpenAPI schema served by /api/schema/.'
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        for schema_format in SCHEMA_FORMATS:
+            write_schema(schema_format)
+            self.stdout.write(f'Schema written to {schema_path(schema_format)}')
+        self.stdout.write(self.style.SUCCESS(f'Schema generated for version {code_version()}'))
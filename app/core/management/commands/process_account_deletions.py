@@ -0,0 +1,31 @@
+"""
+Django command to run the account deletions that did not finish.
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+from core.deletion import run_deletion
+from core.models import AccountDeletion
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Django command resuming pending, interrupted or failed account deletions."""
+    help = 'Run the account deletions that are not done, without waiting for the task worker.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        using = options['database']
+        deletions = AccountDeletion.objects.using(using).exclude(status=AccountDeletion.DONE).order_by('pk')
+        for deletion_id in deletions.values_list('pk', flat=True):
+            try:
+                run_deletion(deletion_id, using)
+            except Exception:
+                logger.exception('Deletion %s failed', deletion_id)
+            deletion = AccountDeletion.objects.using(using).get(pk=deletion_id)
+            self.stdout.write(f'{deletion.email}: {deletion.status}, {deletion.deleted_rows} rows deleted')
@@ -0,0 +1,68 @@
+"""
+Django command to profile the import time of the project startup.
+"""
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+STARTUP_SCRIPT = """
+import django
+django.setup()
+if {load_urls}:
+    from django.urls import get_resolver
+    get_resolver().url_patterns
+"""
+
+
+def parse_importtime(output):
+    """Returns (module, self_us, cumulative_us) from a `-X importtime` report."""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    """Django command reporting the slowest modules imported at startup."""
+    help = 'Report the slowest modules imported by django.setup() and the URLconf.'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Number of modules to report.')
+        parser.add_argument('--no-urls', action='store_true', help='Do not load the URLconf.')
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Fail when a module of STARTUP_LAZY_MODULES is imported at startup.',
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        script = STARTUP_SCRIPT.format(load_urls=not options['no_urls'])
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'recipe_project.settings'))
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr)
+
+        modules = parse_importtime(result.stderr)
+        total = sum(self_us for _, self_us, _ in modules)
+        self.stdout.write(f'{len(modules)} modules imported in {total / 1000:.1f}ms')
+        self.stdout.write(f'{"self [ms]":>10} {"cumulative [ms]":>16}  module')
+        for name, self_us, cumulative_us in sorted(modules, key=lambda m: m[1], reverse=True)[:options['limit']]:
+            self.stdout.write(f'{self_us / 1000:>10.1f} {cumulative_us / 1000:>16.1f}  {name}')
+
+        imported = {name for name, _, _ in modules}
+        eager = [name for name in settings.STARTUP_LAZY_MODULES if name in imported]
+        if eager:
+            message = f'Imported at startup but expected on first use: {", ".join(eager)}'
+            if options['strict']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
@@ -0,0 +1,33 @@
+"""
+Django command to move the recipe data of a user to another shard.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import sharding
+
+
+class Command(BaseCommand):
+    """Django command copying the recipe data of a user to a shard and pinning the user on it."""
+    help = 'Move the recipes, tags and ingredients of a user to another database of RECIPE_SHARDS.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('user', help='Id or email of the user.')
+        parser.add_argument('shard', help='Database alias of the target shard.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if options['shard'] not in settings.RECIPE_SHARDS:
+            raise CommandError(f'{options["shard"]} is not one of {", ".join(settings.RECIPE_SHARDS)}')
+        users = get_user_model()._default_manager
+        lookup = {'pk': options['user']} if options['user'].isdigit() else {'email': options['user'].lower()}
+        user = users.filter(**lookup).first()
+        if user is None:
+            raise CommandError(f'User {options["user"]} not found')
+        source = sharding.shard_for(user)
+        try:
+            moved = sharding.move_user(user, options['shard'])
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        self.stdout.write(self.style.SUCCESS(f'Moved {moved} rows of {user.email} from {source} to {options["shard"]}'))
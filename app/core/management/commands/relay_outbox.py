@@ -0,0 +1,55 @@
+"""
+Django command to deliver the outbox events to the configured sinks.
+"""
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Django command draining the outbox in batches until stopped."""
+    help = 'Deliver the outbox events to OUTBOX_SINKS, until stopped or until empty with --burst.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OUTBOX_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=settings.OUTBOX_POLL_INTERVAL)
+        parser.add_argument('--burst', action='store_true', help='Exit once the outbox is empty.')
+        parser.add_argument('--database', default='default', help='Database alias of the outbox.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if not outbox.enabled():
+            raise CommandError('No OUTBOX_SINKS configured.')
+        sinks = outbox.get_sinks()
+        stopping = []
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        drained, failures = 0, 0
+        try:
+            while not stopping:
+                try:
+                    count, lag = outbox.relay_batch(sinks, options['batch_size'], options['database'])
+                except Exception:
+                    # Delivered again from the same events, back off while the sink is down.
+                    failures += 1
+                    delay = min(options['poll_interval'] * 2 ** failures, settings.OUTBOX_MAX_RETRY_DELAY)
+                    logger.exception('Outbox delivery failed, retrying in %.1fs', delay)
+                    time.sleep(delay)
+                    continue
+                failures = 0
+                drained += count
+                if lag > settings.OUTBOX_MAX_LAG:
+                    logger.warning('Outbox lag of %.0fs above %ss', lag, settings.OUTBOX_MAX_LAG)
+                if count < options['batch_size']:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+        finally:
+            signal.signal(signal.SIGTERM, previous_handler)
+        self.stdout.write(f'Drained {drained} outbox events')
@@ -0,0 +1,83 @@
+"""
+Django command to run the background tasks of the `Task` table.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import tasks
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    """Django command claiming due tasks and running them in a thread or process pool."""
+    help = 'Run background tasks until stopped, or until the queue is empty with --burst.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.TASK_WORKER_CONCURRENCY,
+            help='Number of tasks run at the same time.',
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Run tasks in threads, or in processes for CPU bound tasks.',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=settings.TASK_POLL_INTERVAL,
+            help='Seconds to wait when no task is due.',
+        )
+        parser.add_argument('--burst', action='store_true', help='Exit once no task is due.')
+        parser.add_argument('--database', default='default', help='Database alias of the task table.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        using, concurrency = options['database'], options['concurrency']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        if options['pool'] == 'process':
+            # Fresh interpreters, forked children would share the database connections.
+            executor = ProcessPoolExecutor(
+                concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+            )
+        else:
+            executor = ThreadPoolExecutor(concurrency, thread_name_prefix='task')
+
+        stopping = []
+        previous_handler = signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        running, outcomes = set(), {}
+        started = last_stale_check = time.monotonic()
+        self.stdout.write(f'Worker {worker_id} running {concurrency} tasks at a time')
+        try:
+            while not stopping:
+                if time.monotonic() - last_stale_check > settings.TASK_LOCK_TIMEOUT / 4:
+                    last_stale_check = time.monotonic()
+                    if tasks.requeue_stale(using):
+                        logger.warning('Requeued tasks of dead workers')
+                claimed = tasks.claim(worker_id, concurrency - len(running), using) if len(running) < concurrency else []
+                running.update(executor.submit(tasks.execute_by_pk, task.pk, using) for task in claimed)
+                if not claimed and not running and options['burst']:
+                    break
+                if running:
+                    done, running = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        outcome = future.result()
+                        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+                elif not claimed:
+                    time.sleep(options['poll_interval'])
+        finally:
+            # Let the running tasks finish, a stopped worker leaves no task behind.
+            executor.shutdown(wait=True)
+            signal.signal(signal.SIGTERM, previous_handler)
+
+        elapsed = time.monotonic() - started
+        processed = sum(outcomes.values())
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items())) or 'none'
+        self.stdout.write(f'Processed {processed} tasks in {elapsed:.1f}s ({processed / elapsed:.1f}/s): {summary}')
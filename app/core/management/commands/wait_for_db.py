@@ -1,27 +1,39 @@
 """
-Django command to wait for the database to be available.
+Django command to wait for the databases and the storage to be available.
 """
-import time
+from functools import partial
 
-from psycopg2 import OperationalError as Psycopg2OpError
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 
-from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from core.readiness import check_storage, wait_for
+from core.sharding import databases
 
 
 class Command(BaseCommand):
-    """Django command to wait for database."""
+    """Django command to wait for the global database and the shards, and optionally the storage."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout', type=float, default=settings.READINESS_TIMEOUT,
+            help='Seconds to wait before giving up.',
+        )
+        parser.add_argument(
+            '--storage', action='store_true',
+            help='Also wait for the default file storage backend.',
+        )
 
     def handle(self, *args, **options):
         """Entrypoint for command."""
-        # self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                # self.stdout.write('Database unavailable, waiting 1 second...')
-                time.sleep(1)
+        checks = {
+            f'database:{alias}': partial(self.check, databases=[alias])
+            for alias in databases()
+        }
+        if options['storage']:
+            checks['storage'] = check_storage
 
-        # self.stdout.write(self.style.SUCCESS('Database available!'))
+        errors = wait_for(checks, timeout=options['timeout'])
+        if errors:
+            details = ', '.join(f'{name} ({error!r})' for name, error in errors.items())
+            raise CommandError(f'Unavailable after {options["timeout"]}s: {details}')
+        self.stdout.write(self.style.SUCCESS(f'Available: {", ".join(checks)}'))
@@ -0,0 +1,162 @@
+"""
+Prometheus metrics for the project.
+
+When the ``PROMETHEUS_MULTIPROC_DIR`` environment variable is set every
+pre-forked worker writes its samples to memory mapped files in that directory
+and the metrics endpoint aggregates them, otherwise samples live in memory.
+"""
+import os
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .075, .1, .25, .5, .75, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+UNRESOLVED_VIEW = '<unresolved>'
+
+REQUESTS = Counter(
+    'django_http_requests_total',
+    'Total HTTP requests by view, method and status code.',
+    ['view', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'django_http_request_duration_seconds',
+    'HTTP request latency by view and method.',
+    ['view', 'method'],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'django_http_response_size_bytes',
+    'HTTP response body size by view.',
+    ['view'],
+    buckets=SIZE_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'django_db_queries_per_request',
+    'Database queries executed per request by view.',
+    ['view'],
+    buckets=QUERY_BUCKETS,
+)
+IN_FLIGHT = Gauge(
+    'django_http_requests_in_flight',
+    'HTTP requests currently being served.',
+    multiprocess_mode='livesum',
+)
+TASKS = Counter(
+    'tasks_processed_total',
+    'Background tasks processed by task name and outcome (done, retry, failed or lost).',
+    ['task', 'outcome'],
+)
+TASK_DURATION = Histogram(
+    'task_duration_seconds',
+    'Background task run time by task name.',
+    ['task'],
+    buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0),
+)
+TASK_QUEUE_DELAY = Histogram(
+    'task_queue_delay_seconds',
+    'Time between a background task becoming due and a worker starting it.',
+    buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0),
+)
+OUTBOX_EVENTS = Counter(
+    'outbox_events_total',
+    'Outbox rows drained and coalesced events delivered to the sinks.',
+    ['stage'],
+)
+OUTBOX_DELIVERY_DELAY = Histogram(
+    'outbox_delivery_delay_seconds',
+    'Time between a change being recorded and its delivery to every sink.',
+    buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0),
+)
+OUTBOX_LAG = Gauge(
+    'outbox_lag_seconds',
+    'Age of the oldest undelivered outbox event seen by the relay.',
+    multiprocess_mode='max',
+)
+CACHE_REQUESTS = Counter(
+    'django_cache_requests_total',
+    'Cache lookups by cache alias and result (hit or miss).',
+    ['cache', 'result'],
+)
+
+
+def view_label(view_func, method):
+    """Returns the label for a resolved view, like `RecipeViewSet.list`."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__qualname__', UNRESOLVED_VIEW)
+    actions = getattr(view_func, 'actions', None)
+    if actions and method.lower() in actions:
+        return f'{cls.__name__}.{actions[method.lower()]}'
+    return cls.__name__
+
+
+def record_cache_lookup(cache_alias, hit):
+    """Count a cache hit or miss."""
+    CACHE_REQUESTS.labels(cache_alias, 'hit' if hit else 'miss').inc()
+
+
+def render_latest():
+    """Returns the exposition body and its content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class QueryCounter:
+    """Database execute wrapper counting the queries of a request."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Collect request count, latency, response size and query count per view."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.metrics_view = UNRESOLVED_VIEW
+        queries = QueryCounter()
+        start = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.get_response(request)
+        finally:
+            IN_FLIGHT.dec()
+
+        view, method = request.metrics_view, request.method
+        LATENCY.labels(view, method).observe(time.perf_counter() - start)
+        REQUESTS.labels(view, method, response.status_code).inc()
+        DB_QUERIES.labels(view).observe(queries.count)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view).observe(len(response.content))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.metrics_view = view_label(view_func, request.method)
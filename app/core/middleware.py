@@ -0,0 +1,123 @@
+"""
+Core middlewares
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+
+from django.conf import settings
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+PROFILE_MODES = ('cpu', 'mem')
+
+
+class ProfilingMiddleware:
+    """Profile a request on demand with cProfile and/or tracemalloc.
+
+    Staff users opt in by sending the ``X-Profile`` header or the ``profile``
+    query parameter with ``cpu``, ``mem`` or ``cpu,mem``. Only a fraction of
+    the matching requests, given by ``PROFILING_SAMPLE_RATE``, is profiled.
+    """
+    _lock = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace('-', '_')
+        self.query_param = settings.PROFILING_QUERY_PARAM
+
+    def __call__(self, request):
+        value = request.META.get(self.header) or request.GET.get(self.query_param)
+        if not value:
+            return self.get_response(request)
+
+        modes = self._parse_modes(value)
+        if not modes or random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        if not self._is_staff(request):
+            return self.get_response(request)
+        # Profilers are process wide, only one request is profiled at a time.
+        if not self._lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self._profile(request, modes)
+        finally:
+            self._lock.release()
+
+    def _parse_modes(self, value):
+        """Returns the profilers requested by the client."""
+        value = value.lower()
+        if value in ('1', 'true', 'all'):
+            return PROFILE_MODES
+        return tuple(mode for mode in PROFILE_MODES if mode in value.split(','))
+
+    def _is_staff(self, request):
+        """Check the requester is staff, resolving token authentication when needed."""
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            try:
+                result = TokenAuthentication().authenticate(request)
+            except AuthenticationFailed:
+                return False
+            user = result[0] if result else None
+        return bool(user and user.is_active and user.is_staff)
+
+    def _profile(self, request, modes):
+        """Run the request under the requested profilers and save the reports."""
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        profiler = cProfile.Profile() if 'cpu' in modes else None
+        trace_memory = 'mem' in modes and not tracemalloc.is_tracing()
+
+        if trace_memory:
+            tracemalloc.start()
+        if profiler:
+            profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            if profiler:
+                profiler.disable()
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        response['X-Profile-Id'] = profile_id
+        if profiler:
+            response['X-Profile-Cpu'] = self._save_cpu_profile(profiler, profile_id)
+        if trace_memory:
+            response['X-Profile-Mem'] = self._save_memory_snapshot(snapshot, peak, profile_id)
+        return response
+
+    def _save_cpu_profile(self, profiler, profile_id):
+        """Dump the pstats file and returns the summary for the response header."""
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        stats.dump_stats(os.path.join(settings.PROFILING_DIR, f'{profile_id}.prof'))
+        stats.sort_stats(pstats.SortKey.TIME)
+        top = ''
+        if stats.fcn_list:
+            filename, line, func = stats.fcn_list[0]
+            top = f'{os.path.basename(filename)}:{line}({func})'
+        return f'total={stats.total_tt:.6f}s calls={stats.total_calls} top={top}'
+
+    def _save_memory_snapshot(self, snapshot, peak, profile_id):
+        """Write the top allocations and returns the summary for the response header."""
+        top_stats = snapshot.statistics('lineno')[:settings.PROFILING_TOP]
+        path = os.path.join(settings.PROFILING_DIR, f'{profile_id}.mem.txt')
+        with open(path, 'w') as report:
+            report.write(f'peak={peak}B\n')
+            for stat in top_stats:
+                report.write(f'{stat}\n')
+        top = ''
+        if top_stats:
+            frame = top_stats[0].traceback[0]
+            top = f'{os.path.basename(frame.filename)}:{frame.lineno}'
+        return f'peak={peak}B top={top}'
@@ -1,9 +1,11 @@
 """
 Core models
 """
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
-from .utils import check_email
+from .utils import check_email, check_emails
 
 
 class UserManager(BaseUserManager):
@@ -22,6 +24,49 @@ class UserManager(BaseUserManager):
         user.save(using=self.db)
         return user
 
+    def bulk_create_users(self, users, batch_size=None, max_workers=None):
+        """Create users from dicts of an email, a password and other fields, see `core.provisioning`.
+
+        Returns the number of users created and the (email, reason) of the
+        ones rejected, the others are created.
+        """
+        from . import provisioning
+
+        batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        users = [dict(user) for user in users]
+        emails = [str(user.get('email') or '').lower() for user in users]
+        rows, rejected, seen = [], [], set()
+        for user, email, valid in zip(users, emails, check_emails(emails)):
+            email = self.normalize_email(email)
+            if not valid:
+                rejected.append((user.get('email'), provisioning.INVALID))
+            elif email in seen:
+                rejected.append((email, provisioning.DUPLICATE))
+            else:
+                seen.add(email)
+                rows.append({**user, 'email': email})
+
+        existing = set()
+        for start in range(0, len(rows), batch_size):
+            batch = [row['email'] for row in rows[start:start + batch_size]]
+            existing.update(self.filter(email__in=batch).values_list('email', flat=True))
+        rejected += [(row['email'], provisioning.EXISTS) for row in rows if row['email'] in existing]
+        rows = [row for row in rows if row['email'] not in existing]
+
+        hashes = provisioning.hash_passwords([row.pop('password', None) for row in rows], max_workers)
+        created = 0
+        for start in range(0, len(rows), batch_size):
+            batch = list(zip(rows[start:start + batch_size], hashes[start:start + batch_size]))
+            self.bulk_create([self.model(password=password, **row) for row, password in batch], ignore_conflicts=True)
+            # Users registered meanwhile keep their own password hash.
+            stored = dict(self.filter(email__in=[row['email'] for row, _ in batch]).values_list('email', 'password'))
+            for row, password in batch:
+                if stored.get(row['email']) == password:
+                    created += 1
+                else:
+                    rejected.append((row['email'], provisioning.EXISTS))
+        return created, rejected
+
     def create_superuser(self, email, password, **kwargs):
         """Using create_user method to create a superuser."""
         user = self.create_user(email, password, **kwargs)
@@ -39,6 +84,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     last_name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Database of the recipe data pinned by `manage.py rebalance_user`, see `core.sharding`.
+    shard = models.CharField(max_length=64, blank=True)
 
     objects = UserManager()
 
@@ -50,3 +97,92 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def __str__(self):
         return self.email
+
+
+class AccountDeletion(models.Model):
+    """Progress of the background deletion of a deactivated account, see `core.deletion`."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    # Not a foreign key, the progress outlives the user.
+    user_id = models.BigIntegerField(unique=True)
+    email = models.EmailField(max_length=255)
+    status = models.CharField(max_length=16, choices=STATUSES, default=PENDING)
+    step = models.CharField(max_length=255, blank=True)
+    deleted_rows = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.email} {self.status}'
+
+
+class Task(models.Model):
+    """Background task run by the `run_worker` command, see `core.tasks`."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=255)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.IntegerField(default=0)
+    status = models.CharField(max_length=16, choices=STATUSES, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=1)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Workers claim the due tasks of highest priority first.
+            models.Index(fields=['status', '-priority', 'run_at'], name='task_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} {self.status}'
+
+
+class OutboxEvent(models.Model):
+    """Change of a row, recorded in the transaction of the change, see `core.outbox`."""
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, 'Created'),
+        (UPDATED, 'Updated'),
+        (DELETED, 'Deleted'),
+    )
+
+    model = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=16, choices=ACTIONS)
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Lease of the relay delivering the event, see `core.outbox.relay_batch`.
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.model} {self.object_id} {self.action}'
@@ -0,0 +1,32 @@
+"""
+Migration operations shared by the apps.
+"""
+from django.db.migrations.operations import AddIndex
+
+
+class AddIndexConcurrently(AddIndex):
+    """Create an index without blocking writes to the table.
+
+    PostgreSQL builds it with CREATE INDEX CONCURRENTLY, which cannot run in
+    a transaction: migrations using this operation must set `atomic = False`.
+    Other backends create the index normally.
+    """
+
+    def describe(self):
+        return f'Concurrently create index {self.index.name} on field(s) {", ".join(self.index.fields)} of model {self.model_name}'
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.add_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.add_index(model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            if schema_editor.connection.vendor == 'postgresql':
+                schema_editor.remove_index(model, self.index, concurrently=True)
+            else:
+                schema_editor.remove_index(model, self.index)
@@ -0,0 +1,185 @@
+"""
+Transactional outbox of row changes delivered to downstream systems.
+
+Changes are recorded in `OutboxEvent` in the transaction of the change, so
+an event exists if and only if the change committed. The `relay_outbox`
+command drains the table in batches to the sinks of `OUTBOX_SINKS`:
+repeated changes of a row in a batch are coalesced into one event and rows
+are deleted only once every sink accepted the batch. Delivery is at least
+once, consumers deduplicate on the event `id`.
+
+A relay leases its batch for `OUTBOX_LEASE_TIMEOUT` seconds in a short
+transaction, sends it with no transaction open and deletes the rows it
+still holds in a second one, so slow sinks hold no row locks. A relay dying
+mid-batch leaves the events to the next relay once the lease expires.
+
+Nothing is recorded while `OUTBOX_SINKS` is empty, there is no relay to
+drain the table: changes made then are never delivered, sinks added later
+start from their next change.
+"""
+import json
+import os
+import urllib.request
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import OutboxEvent
+
+
+class FileSink:
+    """Append the events to a newline delimited JSON file, for local development and tests."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def send(self, events):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a') as sink:
+            for event in events:
+                sink.write(json.dumps(event, cls=DjangoJSONEncoder) + '\n')
+            sink.flush()
+            os.fsync(sink.fileno())
+
+
+class WebhookSink:
+    """POST each batch as `{"events": [...]}` to an HTTP endpoint, any non 2xx answer fails the batch."""
+
+    def __init__(self, url, timeout=10, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def send(self, events):
+        body = json.dumps({'events': events}, cls=DjangoJSONEncoder).encode()
+        request = urllib.request.Request(
+            self.url, data=body, method='POST', headers={'Content-Type': 'application/json', **self.headers},
+        )
+        # urlopen raises HTTPError for answers other than 2xx and redirects.
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def get_sinks():
+    """Returns the sinks configured in `OUTBOX_SINKS`."""
+    return [import_string(sink['BACKEND'])(**sink.get('OPTIONS', {})) for sink in settings.OUTBOX_SINKS]
+
+
+def enabled():
+    """Whether changes are recorded, see the module docstring."""
+    return bool(settings.OUTBOX_SINKS)
+
+
+def payload(instance):
+    """Returns the concrete fields of a row, files by name."""
+    values = {}
+    for field in instance._meta.concrete_fields:
+        value = field.value_from_object(instance)
+        values[field.attname] = (value.name or None) if isinstance(value, FieldFile) else value
+    return values
+
+
+def record(instance, action, using):
+    """Record the change of a row, call it in the transaction of the change."""
+    if enabled():
+        OutboxEvent.objects.using(using).create(
+            model=instance._meta.label, object_id=instance.pk, action=action, payload=payload(instance),
+        )
+
+
+def record_many(model, action, payloads, using):
+    """Record changes of many rows of a model from their payloads, which contain the `id`."""
+    if enabled() and payloads:
+        OutboxEvent.objects.using(using).bulk_create([
+            OutboxEvent(model=model._meta.label, object_id=values['id'], action=action, payload=values)
+            for values in payloads
+        ])
+
+
+def coalesce(events):
+    """Returns one event per row from events ordered by id.
+
+    The last payload wins and a row created then updated is `created`. A row
+    created and deleted in the same batch is still `deleted`: a retried batch
+    may have reached a sink with its creation already.
+    """
+    by_row = {}
+    for event in events:
+        key = (event.model, event.object_id)
+        first = by_row[key][0] if key in by_row else event
+        by_row[key] = (first, event, by_row[key][2] + 1 if key in by_row else 1)
+    coalesced = []
+    for first, last, count in by_row.values():
+        action = last.action
+        if first.action == OutboxEvent.CREATED and action != OutboxEvent.DELETED:
+            action = OutboxEvent.CREATED
+        coalesced.append({
+            'id': last.pk,
+            'model': last.model,
+            'object_id': last.object_id,
+            'action': action,
+            'payload': last.payload,
+            'created_at': last.created_at,
+            'coalesced': count,
+        })
+    return sorted(coalesced, key=lambda event: event['id'])
+
+
+def claim(limit, using='default'):
+    """Lease up to `limit` of the oldest events not leased by another relay, returns them."""
+    token = uuid.uuid4().hex
+    now = timezone.now()
+    free = OutboxEvent.objects.using(using).filter(Q(locked_until__isnull=True) | Q(locked_until__lt=now))
+    with transaction.atomic(using=using):
+        events = free.order_by('pk')
+        if connections[using].features.has_select_for_update_skip_locked:
+            events = events.select_for_update(skip_locked=True)
+        pks = list(events.values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+        free.filter(pk__in=pks).update(
+            locked_by=token, locked_until=now + timedelta(seconds=settings.OUTBOX_LEASE_TIMEOUT),
+        )
+    return list(OutboxEvent.objects.using(using).filter(pk__in=pks, locked_by=token).order_by('pk'))
+
+
+def relay_batch(sinks, batch_size=None, using='default'):
+    """Deliver the oldest events to every sink.
+
+    Returns the number of outbox rows drained and the age in seconds of the
+    oldest one, the lag of the downstream systems.
+
+    A failing sink raises, the lease is released and the whole batch is
+    delivered again by the next call.
+    """
+    events = claim(batch_size or settings.OUTBOX_BATCH_SIZE, using)
+    lag = (timezone.now() - events[0].created_at).total_seconds() if events else 0
+    metrics.OUTBOX_LAG.set(lag)
+    if not events:
+        return 0, lag
+    token = events[0].locked_by
+    leased = OutboxEvent.objects.using(using).filter(pk__in=[event.pk for event in events], locked_by=token)
+    delivered = coalesce(events)
+    try:
+        for sink in sinks:
+            sink.send(delivered)
+    except Exception:
+        leased.update(locked_by='', locked_until=None)
+        raise
+    # Rows leased again by another relay after an expired lease are left to it.
+    with transaction.atomic(using=using):
+        leased.delete()
+    now = timezone.now()
+    for event in events:
+        metrics.OUTBOX_DELIVERY_DELAY.observe((now - event.created_at).total_seconds())
+    metrics.OUTBOX_EVENTS.labels('drained').inc(len(events))
+    metrics.OUTBOX_EVENTS.labels('delivered').inc(len(delivered))
+    return len(events), lag
@@ -0,0 +1,31 @@
+"""
+Bulk creation of user accounts, see `UserManager.bulk_create_users`.
+
+Password hashing dominates the cost of an account: the passwords of a batch
+are hashed on a pool of `USER_IMPORT_WORKERS` processes, one per core by
+default, and the users are inserted with `bulk_create` in batches of
+`USER_IMPORT_BATCH_SIZE`.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+
+INVALID = 'invalid email'
+DUPLICATE = 'duplicate email'
+EXISTS = 'email already registered'
+
+
+def workers():
+    return settings.USER_IMPORT_WORKERS or os.cpu_count() or 1
+
+
+def hash_passwords(passwords, max_workers=None):
+    """Returns the hashes of the passwords in order, unusable ones for None."""
+    max_workers = max_workers or workers()
+    if max_workers == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, len(passwords) // (max_workers * 4))
+        return list(executor.map(make_password, passwords, chunksize=chunksize))
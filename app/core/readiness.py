@@ -0,0 +1,105 @@
+"""
+Startup readiness checks and warmup.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections
+from django.urls import get_resolver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_warm = threading.Event()
+_warm_lock = threading.Lock()
+_warmup_started = threading.Event()
+
+
+def check_database(alias):
+    """Open a connection to the database alias."""
+    connections[alias].ensure_connection()
+
+
+def check_storage():
+    """Reach the default file storage backend."""
+    default_storage.exists(settings.READINESS_STORAGE_PROBE)
+
+
+def wait_for(checks, timeout, initial_delay=0.5, max_delay=5.0):
+    """Run every check in parallel retrying with bounded exponential backoff.
+
+    Returns a dict with the last error of each check that did not succeed
+    before the timeout, an empty dict means everything is available.
+    """
+    deadline = time.monotonic() + timeout
+
+    def run(check):
+        delay = initial_delay
+        while True:
+            try:
+                check()
+                return None
+            except Exception as exc:
+                if time.monotonic() + delay > deadline:
+                    return exc
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
+
+    with ThreadPoolExecutor(max_workers=max(len(checks), 1)) as pool:
+        futures = {name: pool.submit(run, check) for name, check in checks.items()}
+    errors = {name: future.result() for name, future in futures.items()}
+    return {name: error for name, error in errors.items() if error is not None}
+
+
+def prime_url_resolvers():
+    """Populate the URL resolver reverse and namespace dictionaries."""
+    resolver = get_resolver()
+    resolver.reverse_dict
+    resolver.namespace_dict
+    resolver.app_dict
+
+
+def run_warmup():
+    """Run every task of `WARMUP_TASKS`, failures are logged and skipped."""
+    for path in settings.WARMUP_TASKS:
+        start = time.perf_counter()
+        try:
+            import_string(path)()
+        except Exception:
+            logger.exception('Warmup task %s failed', path)
+        else:
+            logger.info('Warmup task %s done in %.3fs', path, time.perf_counter() - start)
+
+
+def ensure_warm():
+    """Run the warmup once per process, concurrent callers wait for it."""
+    if _warm.is_set():
+        return
+    with _warm_lock:
+        if not _warm.is_set():
+            run_warmup()
+            _warm.set()
+
+
+def is_warm():
+    """Returns whether the warmup of this process finished."""
+    return _warm.is_set()
+
+
+def _warmup_in_background():
+    try:
+        ensure_warm()
+    finally:
+        connections.close_all()
+
+
+def start_warmup():
+    """Warm the process up in the background, only the first call starts it."""
+    if _warmup_started.is_set():
+        return
+    _warmup_started.set()
+    threading.Thread(target=_warmup_in_background, name='warmup', daemon=True).start()
@@ -0,0 +1,82 @@
+"""
+Precomputed OpenAPI schema.
+
+The schema is generated once per code version, either at build time by the
+`generate_schema` command or by the first request, and stored gzip
+compressed in `SCHEMA_CACHE_DIR` so every worker serves the same artifact.
+"""
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+SCHEMA_FORMATS = {
+    'yaml': 'application/vnd.oai.openapi',
+    'json': 'application/vnd.oai.openapi+json',
+}
+
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _source_digest():
+    """Hash every python source of the project, computed once per process."""
+    digest = hashlib.sha256()
+    for path in sorted(Path(settings.BASE_DIR).rglob('*.py')):
+        digest.update(str(path.relative_to(settings.BASE_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+def code_version():
+    """Returns `CODE_VERSION` when deployed with one, or a hash of the sources."""
+    return settings.CODE_VERSION or _source_digest()
+
+
+def schema_path(schema_format, version=None):
+    return os.path.join(settings.SCHEMA_CACHE_DIR, f'schema-{version or code_version()}.{schema_format}.gz')
+
+
+def generate_schema(schema_format):
+    """Generate the schema with drf_spectacular and returns it rendered."""
+    from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+    from drf_spectacular.settings import spectacular_settings
+
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=True)
+    renderer = OpenApiJsonRenderer() if schema_format == 'json' else OpenApiYamlRenderer()
+    return renderer.render(schema, renderer_context={})
+
+
+def write_schema(schema_format):
+    """Generate the schema and store it compressed, returns the artifact."""
+    compressed = gzip.compress(generate_schema(schema_format), mtime=0)
+    path = schema_path(schema_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Write then rename so concurrent workers never read a partial artifact.
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as tmp:
+        tmp.write(compressed)
+    os.replace(tmp.name, path)
+    return compressed
+
+
+def get_schema(schema_format):
+    """Returns the compressed schema and its ETag, generating it when missing."""
+    key = (code_version(), schema_format)
+    if key not in _artifacts:
+        with _artifacts_lock:
+            if key not in _artifacts:
+                try:
+                    with open(schema_path(schema_format), 'rb') as artifact:
+                        compressed = artifact.read()
+                except FileNotFoundError:
+                    compressed = write_schema(schema_format)
+                etag = '"%s"' % hashlib.sha256(compressed).hexdigest()[:32]
+                _artifacts[key] = (compressed, etag)
+    return _artifacts[key]
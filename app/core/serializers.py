@@ -0,0 +1,34 @@
+"""
+Serializers for core.
+"""
+from django.conf import settings
+
+from rest_framework import serializers
+
+from . import batch
+
+
+class BatchCallSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=batch.METHODS, default='GET')
+    path = serializers.CharField()
+    body = serializers.JSONField(required=False, allow_null=True)
+
+    def validate_path(self, path):
+        if batch.resolve_call(path) is None:
+            raise serializers.ValidationError('Must be a path of the recipe or user API.')
+        return path
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchCallSerializer(many=True, allow_empty=False, max_length=settings.BATCH_MAX_REQUESTS)
+    atomic = serializers.BooleanField(default=False)
+
+
+class BatchResponseSerializer(serializers.Serializer):
+    status = serializers.IntegerField()
+    body = serializers.JSONField(allow_null=True)
+
+
+class BatchResultSerializer(serializers.Serializer):
+    responses = BatchResponseSerializer(many=True)
+    rolled_back = serializers.BooleanField()
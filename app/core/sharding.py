@@ -0,0 +1,237 @@
+"""
+Placement of the recipe data of users on the databases of `RECIPE_SHARDS`.
+
+Users, tokens and the other global tables stay in `default`. The rows of
+the models of `SHARDED_MODELS` live on the shard of their user: the one
+pinned on the user by `manage.py rebalance_user`, or else one picked by
+hashing the user id. `ShardRouter` routes the queries having an instance
+hint, views select the shard of `request.user` with `shard_for`.
+
+Every database holds the whole schema and the links between the sharded
+rows and the users are not enforced by the databases. Each shard numbers
+its rows from its own range of `SHARD_ID_RANGE` ids, so the rows of a user
+keep their ids when moved to another shard.
+
+Writers of sharded rows call `lock_user` first in their transaction: it
+waits for a move of the user off the database, which holds the same lock
+of the user while it compares and deletes the rows, then reads the shard
+of the user again. A request which picked the shard before the move fails
+with `ShardMoved` instead of writing rows the move left behind.
+"""
+import hashlib
+import zlib
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, models, transaction
+
+from rest_framework.exceptions import APIException
+
+
+def databases():
+    """Returns the aliases in use, `default` and the shards."""
+    return list(dict.fromkeys(['default', *settings.RECIPE_SHARDS]))
+
+
+def hashed_shard(user_id):
+    shards = settings.RECIPE_SHARDS
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def pinned_shard(user_id):
+    """Returns the shard pinned on the user or '', read on every call so every process sees a move at once."""
+    return get_user_model()._default_manager.filter(pk=user_id).values_list('shard', flat=True).first() or ''
+
+
+def shard_for(user):
+    """Returns the alias of the database holding the recipe data of a user or user id."""
+    shards = settings.RECIPE_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    if isinstance(user, get_user_model()):
+        user_id, pinned = user.pk, user.shard
+    else:
+        user_id, pinned = user, pinned_shard(user)
+    return pinned if pinned in shards else hashed_shard(user_id)
+
+
+class ShardMoved(APIException):
+    status_code = 503
+    default_detail = 'The recipe data of the account is being moved, try again shortly.'
+    default_code = 'shard_moved'
+
+
+def _lock_user(user_id, using):
+    """Serialize the writers of the rows of the user on the database until the end of the transaction, on PostgreSQL.
+
+    SQLite runs one writer at a time.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        key = zlib.crc32(f'user-shard:{user_id}'.encode())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def lock_user(user_id, using):
+    """Fence a transaction writing rows of the user on the database against `move_user`.
+
+    Call it before any other lock of the transaction. Raises `ShardMoved`
+    when the rows of the user are no longer on the database.
+    """
+    _lock_user(user_id, using)
+    if shard_for(user_id) != using:
+        raise ShardMoved()
+
+
+def is_sharded(model):
+    return model._meta.label in settings.SHARDED_MODELS
+
+
+class UserShardQuerySet(models.QuerySet):
+    """Creates rows on the shard of their user when no database was selected.
+
+    `create` saves on the database of the queryset, which the router cannot
+    pick without an instance hint.
+    """
+
+    def create(self, **kwargs):
+        user = kwargs.get('user', kwargs.get('user_id'))
+        if self._db is None and user is not None:
+            return super(UserShardQuerySet, self.using(shard_for(user))).create(**kwargs)
+        return super().create(**kwargs)
+
+
+class ShardRouter:
+    """Route the sharded models to the shard of the user of the instance hint, other models to `default`."""
+
+    def db_for_read(self, model, instance=None, **hints):
+        if instance is None or not is_sharded(model):
+            return None
+        if isinstance(instance, get_user_model()):
+            return shard_for(instance)
+        if is_sharded(type(instance)) and instance._state.db is not None:
+            return instance._state.db
+        if getattr(instance, 'user_id', None) is None:
+            return None
+        user_field = instance._meta.get_field('user')
+        return shard_for(instance.user if user_field.is_cached(instance) else instance.user_id)
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Sharded rows link to users of `default` and to rows of their own shard."""
+        user_model = get_user_model()
+        if isinstance(obj1, user_model) and is_sharded(type(obj2)) or \
+                isinstance(obj2, user_model) and is_sharded(type(obj1)):
+            return True
+        return None
+
+
+def reserve_id_ranges(using, apps=global_apps, **kwargs):
+    """Move the id sequences of the sharded models of a shard to its range, run after migrate."""
+    if using not in settings.RECIPE_SHARDS:
+        return
+    start = settings.RECIPE_SHARDS.index(using) * settings.SHARD_ID_RANGE
+    connection = connections[using]
+    if not start or connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    with connection.cursor() as cursor:
+        for label in settings.SHARDED_MODELS:
+            model = apps.get_model(label)
+            table, column = model._meta.db_table, model._meta.pk.column
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, column])
+                sequence = cursor.fetchone()[0]
+                cursor.execute(f'SELECT last_value FROM {sequence}')
+                if cursor.fetchone()[0] < start:
+                    cursor.execute('SELECT setval(%s, %s)', [sequence, start])
+            else:
+                cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+                row = cursor.fetchone()
+                if row is None:
+                    cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+                elif row[0] < start:
+                    cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+
+
+def _user_rows(model, lookup, user_id, using):
+    return model._base_manager.using(using).filter(**{lookup: user_id})
+
+
+def _row_values(model, row):
+    return tuple(getattr(row, field.attname) for field in model._meta.concrete_fields)
+
+
+def _checksum(models, user_id, using):
+    """Returns a digest of every value of the rows of a user, to detect concurrent writes."""
+    digest = hashlib.sha256()
+    for model, lookup in models:
+        rows = _user_rows(model, lookup, user_id, using).order_by('pk').iterator(
+            chunk_size=settings.SHARD_MOVE_BATCH_SIZE,
+        )
+        for row in rows:
+            digest.update(repr(_row_values(model, row)).encode())
+        digest.update(b'\n')
+    return digest.hexdigest()
+
+
+def _copy(models, user_id, source, target):
+    """Copy the rows of a user, returns their number and the digest of `_checksum` of the copied rows."""
+    digest, moved = hashlib.sha256(), 0
+    with transaction.atomic(using=target):
+        # Children first, leftovers of an earlier attempt.
+        for model, lookup in reversed(models):
+            _user_rows(model, lookup, user_id, target)._raw_delete(target)
+        for model, lookup in models:
+            rows = _user_rows(model, lookup, user_id, source).order_by('pk').iterator(
+                chunk_size=settings.SHARD_MOVE_BATCH_SIZE,
+            )
+            while batch := list(islice(rows, settings.SHARD_MOVE_BATCH_SIZE)):
+                # Before the insert, which sets the `auto_now` fields of the rows.
+                for row in batch:
+                    digest.update(repr(_row_values(model, row)).encode())
+                model._base_manager.using(target).bulk_create(batch)
+                moved += len(batch)
+            digest.update(b'\n')
+    return moved, digest.hexdigest()
+
+
+def move_user(user, target):
+    """Copy the recipe data of a user to the target shard, pin the user on it, returns the rows moved.
+
+    The user is deactivated during the move, so their tokens stop working
+    and they cannot log in. The rows are copied with their ids, then the
+    rows of the former shard are compared with the copy under the lock of
+    `lock_user`, the writers of the user wait: the copy starts again when
+    any value changed, else the user is pinned on the target and the rows
+    are deleted from the former shard without the delete signals, the data
+    of the user did not change. The writers waiting then fail with
+    `ShardMoved`, the other users of the shard are not blocked.
+    """
+    source = shard_for(user)
+    if target == source:
+        return 0
+    models = [(global_apps.get_model(label), lookup) for label, lookup in settings.SHARDED_MODELS.items()]
+    users = get_user_model()._default_manager.filter(pk=user.pk)
+    is_active = users.values_list('is_active', flat=True).get()
+    users.update(is_active=False)
+    try:
+        for _ in range(settings.SHARD_MOVE_ATTEMPTS):
+            moved, copied = _copy(models, user.pk, source, target)
+            with transaction.atomic(using=source):
+                _lock_user(user.pk, source)
+                if _checksum(models, user.pk, source) != copied:
+                    continue
+                users.update(shard=target)
+                for model, lookup in reversed(models):
+                    _user_rows(model, lookup, user.pk, source)._raw_delete(source)
+            break
+        else:
+            raise RuntimeError(f'The data of user {user.pk} kept changing during the move, try again later.')
+    finally:
+        users.update(is_active=is_active)
+    user.shard = target
+    return moved
@@ -0,0 +1,154 @@
+"""
+Database backed background tasks.
+
+`enqueue` stores a call to a module level function in the `Task` table,
+in the transaction of the caller, and the `run_worker` command runs them.
+Workers claim due tasks by priority with SELECT ... FOR UPDATE SKIP LOCKED
+where the database supports it. The claim itself is a conditional UPDATE,
+so on SQLite, which serializes writers, two workers never run the same
+task either. Failed tasks are retried with exponential backoff.
+
+While a task runs a heartbeat refreshes its `locked_at` every
+`TASK_HEARTBEAT_INTERVAL` seconds, `requeue_stale` takes back the tasks not
+refreshed for `TASK_LOCK_TIMEOUT` seconds, whose worker died. The attempt
+of a dead worker counts, a task crashing its workers fails after
+`max_attempts`. The outcome of a task is only recorded while its worker
+still holds the lock, a worker which lost it, e.g. stalled past the
+timeout, leaves the task to its new owner.
+"""
+import logging
+import threading
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+CLAIM_ORDER = ('-priority', 'run_at', 'pk')
+
+
+def task_name(func):
+    """Returns the dotted path of a module level function, or the path itself."""
+    if isinstance(func, str):
+        return func
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, priority=0, max_attempts=None, delay=0, using='default', **kwargs):
+    """Queue a call of `func`, arguments must be JSON serializable."""
+    return Task.objects.using(using).create(
+        name=task_name(func),
+        args=list(args),
+        kwargs=kwargs,
+        priority=priority,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def retry_delay(attempts):
+    """Returns the seconds to wait before the next attempt."""
+    return min(settings.TASK_RETRY_DELAY * 2 ** (attempts - 1), settings.TASK_RETRY_MAX_DELAY)
+
+
+def claim(worker_id, limit, using='default'):
+    """Mark up to `limit` due tasks as running for the worker, returns them."""
+    token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+    now = timezone.now()
+    due = Task.objects.using(using).filter(status=Task.QUEUED, run_at__lte=now).order_by(*CLAIM_ORDER)
+    with transaction.atomic(using=using):
+        if connections[using].features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        pks = list(due.values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+        Task.objects.using(using).filter(pk__in=pks, status=Task.QUEUED).update(
+            status=Task.RUNNING, locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Task.objects.using(using).filter(pk__in=pks, locked_by=token, status=Task.RUNNING).order_by(*CLAIM_ORDER))
+
+
+def requeue_stale(using='default'):
+    """Queue again the tasks of workers that died while running them, returns their number.
+
+    The tasks which used their last attempt fail instead.
+    """
+    now = timezone.now()
+    stale = Task.objects.using(using).filter(
+        status=Task.RUNNING, locked_at__lt=now - timedelta(seconds=settings.TASK_LOCK_TIMEOUT),
+    )
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Task.FAILED, locked_by='', locked_at=None, finished_at=now,
+        last_error='The worker running the task stopped.',
+    )
+    return failed + stale.update(status=Task.QUEUED, locked_by='', locked_at=None, run_at=now)
+
+
+@contextmanager
+def heartbeat(task, using='default'):
+    """Refresh the lock of the claimed task in a thread while the block runs."""
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(settings.TASK_HEARTBEAT_INTERVAL):
+                Task.objects.using(using).filter(pk=task.pk, status=Task.RUNNING, locked_by=task.locked_by).update(
+                    locked_at=timezone.now(),
+                )
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=beat, name=f'task-{task.pk}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def execute(task, using='default'):
+    """Run a claimed task and record the outcome, returns it."""
+    started = time.monotonic()
+    metrics.TASK_QUEUE_DELAY.observe(max((timezone.now() - task.run_at).total_seconds(), 0))
+    try:
+        with heartbeat(task, using):
+            import_string(task.name)(*task.args, **task.kwargs)
+    except Exception:
+        logger.exception('Task %s %s failed (attempt %s of %s)', task.pk, task.name, task.attempts, task.max_attempts)
+        changes = {'last_error': traceback.format_exc(), 'locked_by': '', 'locked_at': None}
+        if task.attempts < task.max_attempts:
+            outcome = 'retry'
+            changes.update(status=Task.QUEUED, run_at=timezone.now() + timedelta(seconds=retry_delay(task.attempts)))
+        else:
+            outcome = 'failed'
+            changes.update(status=Task.FAILED, finished_at=timezone.now())
+    else:
+        outcome = 'done'
+        changes = {'status': Task.DONE, 'finished_at': timezone.now(), 'locked_by': '', 'locked_at': None}
+    owned = Task.objects.using(using).filter(pk=task.pk, status=Task.RUNNING, locked_by=task.locked_by)
+    if not owned.update(**changes):
+        logger.warning('Task %s %s lost its lock, its outcome %s is dropped', task.pk, task.name, outcome)
+        outcome = 'lost'
+    metrics.TASKS.labels(task.name, outcome).inc()
+    metrics.TASK_DURATION.labels(task.name).observe(time.monotonic() - started)
+    return outcome
+
+
+def execute_by_pk(pk, using='default'):
+    """Run a claimed task in a pool worker, which owns its own connections."""
+    try:
+        return execute(Task.objects.using(using).get(pk=pk), using)
+    finally:
+        connections.close_all()
@@ -0,0 +1,127 @@
+"""
+Tests for the batch endpoint.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api.models import Recipe, Tag
+
+BATCH_URL = reverse('batch')
+
+
+def create_recipe(user, title='Rice'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+
+
+# Pool threads have their own connections, which do not see the data of a test transaction.
+@override_settings(BATCH_MAX_WORKERS=1)
+class TestBatch(TestCase):
+    """Test calls of a batch are served with the user of the batch."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def batch(self, calls, **params):
+        res = self.client.post(BATCH_URL, {'requests': calls, **params}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_reads(self):
+        """Test each call gets the response of its view, in order."""
+        recipe = create_recipe(self.user)
+        Tag.objects.create(user=self.user, name='vegan')
+
+        result = self.batch([
+            {'path': f'/api/recipes/{recipe.pk}/'},
+            {'path': '/api/tags/?ordering=name'},
+            {'path': '/api/user/me/'},
+            {'path': '/api/recipes/0/'},
+        ])
+
+        self.assertEqual([response['status'] for response in result['responses']], [200, 200, 200, 404])
+        self.assertEqual(result['responses'][0]['body']['title'], 'Rice')
+        self.assertEqual(result['responses'][1]['body'][0]['name'], 'vegan')
+        self.assertEqual(result['responses'][2]['body']['email'], 'user@example.com')
+
+    def test_read_after_write(self):
+        """Test a read listed after a write sees it."""
+        result = self.batch([
+            {'method': 'POST', 'path': '/api/tags/', 'body': {'name': 'vegan'}},
+            {'path': '/api/tags/'},
+        ])
+
+        self.assertEqual(result['responses'][0]['status'], 201)
+        self.assertEqual([tag['name'] for tag in result['responses'][1]['body']], ['vegan'])
+
+    def test_atomic_rolls_back_writes(self):
+        """Test a failed write of an atomic batch rolls back the others and skips the rest."""
+        calls = [
+            {'method': 'POST', 'path': '/api/tags/', 'body': {'name': 'vegan'}},
+            {'method': 'POST', 'path': '/api/recipes/', 'body': {'title': 'No price'}},
+            {'path': '/api/tags/'},
+        ]
+
+        result = self.batch(calls, atomic=True)
+
+        self.assertTrue(result['rolled_back'])
+        self.assertEqual([response['status'] for response in result['responses']], [201, 400, 424])
+        self.assertFalse(Tag.objects.exists())
+
+        result = self.batch(calls)
+
+        self.assertFalse(result['rolled_back'])
+        self.assertTrue(Tag.objects.filter(name='vegan').exists())
+
+    def test_other_users_rows(self):
+        """Test calls cannot reach the rows of other users."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        recipe = create_recipe(other_user)
+
+        result = self.batch([{'method': 'DELETE', 'path': f'/api/recipes/{recipe.pk}/'}])
+
+        self.assertEqual(result['responses'][0]['status'], 404)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+    def test_invalid_batches(self):
+        """Test paths outside the APIs and oversized batches are refused."""
+        oversized = [{'path': '/api/tags/'}] * (settings.BATCH_MAX_REQUESTS + 1)
+        for calls in ([{'path': '/admin/'}], [{'path': '/api/batch/'}], oversized, []):
+            res = self.client.post(BATCH_URL, {'requests': calls}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_auth_required(self):
+        """Test the batch is authenticated."""
+        res = APIClient().post(BATCH_URL, {'requests': [{'path': '/api/tags/'}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TestConcurrentBatch(TransactionTestCase):
+    """Test runs of reads are served on the pool."""
+
+    def test_concurrent_reads(self):
+        """Test concurrent reads are returned in the order of the calls."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        recipes = [create_recipe(user, f'Recipe {index}') for index in range(6)]
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        res = client.post(
+            BATCH_URL, {'requests': [{'path': f'/api/recipes/{recipe.pk}/'} for recipe in recipes]}, format='json',
+        )
+
+        self.assertEqual(
+            [response['body']['title'] for response in res.data['responses']], [recipe.title for recipe in recipes],
+        )
@@ -1,13 +1,19 @@
 """
 Test custom Django management commands.
 """
+import tempfile
+from io import StringIO
 from unittest.mock import patch
 
 from psycopg2 import OperationalError as Psycopg2OpError
 
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from core.management.commands.profile_imports import parse_importtime
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -32,3 +38,83 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+    @patch('time.sleep')
+    def test_wait_for_db_backoff(self, patched_sleep, patched_check):
+        """Test the delay between retries grows exponentially up to a bound."""
+        patched_check.side_effect = [OperationalError] * 6 + [True]
+
+        call_command('wait_for_db')
+
+        delays = [call.args[0] for call in patched_sleep.call_args_list]
+        self.assertEqual(delays, [0.5, 1.0, 2.0, 4.0, 5.0, 5.0])
+
+    @patch('time.sleep')
+    def test_wait_for_db_timeout(self, patched_sleep, patched_check):
+        """Test the command fails when the database is not available in time."""
+        patched_check.side_effect = OperationalError
+
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db', timeout=0)
+
+    @patch('core.readiness.default_storage')
+    def test_wait_for_storage(self, patched_storage, patched_check):
+        """Test waiting for the storage backend."""
+        patched_storage.exists.return_value = False
+
+        call_command('wait_for_db', storage=True)
+
+        patched_storage.exists.assert_called_once()
+        patched_check.assert_called_once_with(databases=['default'])
+
+
+class ProfileImportsCommandTests(SimpleTestCase):
+    """Test the import time profile command."""
+
+    def test_parse_importtime(self):
+        """Test parsing the `-X importtime` report."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       120 |        120 |   encodings.utf_8\n'
+            'import time:      2500 |       3000 | django\n'
+        )
+        self.assertEqual(
+            parse_importtime(output),
+            [('encodings.utf_8', 120, 120), ('django', 2500, 3000)],
+        )
+
+    def test_heavy_modules_not_imported_at_startup(self):
+        """Test the startup budget, lazy modules are not imported by setup and URLconf."""
+        out = StringIO()
+
+        call_command('profile_imports', limit=5, strict=True, stdout=out)
+
+        self.assertIn('modules imported in', out.getvalue())
+
+
+class BulkCreateUsersCommandTests(TestCase):
+    """Test the bulk user creation command."""
+
+    def test_bulk_create_users(self):
+        """Test users of a CSV file are created with passwords hashed on a process pool."""
+        get_user_model().objects.create_user(email='taken@example.com', password='pass1234')
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('email,password,first_name\n')
+            file.write('one@example.com,pass1234,One\ntwo@example.com,pass5678,\ntaken@example.com,pass1234,\n')
+            file.flush()
+
+            call_command('bulk_create_users', file.name, workers=2, stdout=out)
+
+        self.assertIn('taken@example.com: email already registered', out.getvalue())
+        self.assertIn('Created 2 users, rejected 1', out.getvalue())
+        self.assertTrue(get_user_model().objects.get(email='two@example.com').check_password('pass5678'))
+
+    def test_missing_email_column(self):
+        """Test files without emails are refused."""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as file:
+            file.write('name,password\n')
+            file.flush()
+
+            with self.assertRaisesMessage(CommandError, 'no email column'):
+                call_command('bulk_create_users', file.name)
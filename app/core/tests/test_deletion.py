@@ -0,0 +1,70 @@
+"""
+Tests for the background account deletion.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from django.contrib.auth import get_user_model
+
+from core import deletion
+from core.models import AccountDeletion
+from recipe_api.models import Recipe, RecipeStat, Tag, Ingredient, Tombstone
+
+
+@override_settings(ACCOUNT_DELETION_BATCH_SIZE=2)
+class TestAccountDeletion(TestCase):
+    """Test accounts are deleted in batches with progress."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='rice')
+        for index in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'Recipe {index}', price=Decimal('5.00'), description='Sample description',
+            )
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+        Recipe.objects.create(user=self.other_user, title='Other', price=Decimal('5.00'), description='Sample')
+
+    def request_deletion(self):
+        return deletion.request_deletion(self.user)
+
+    def test_run_deletion(self):
+        """Test the account and its data are deleted, other accounts are kept."""
+        account_deletion = deletion.run_deletion(self.request_deletion().pk)
+
+        self.assertEqual(account_deletion.status, AccountDeletion.DONE)
+        self.assertIsNotNone(account_deletion.finished_at)
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Recipe.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(Tag.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(RecipeStat.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(Recipe.objects.filter(user=self.other_user).count(), 1)
+        self.assertEqual(RecipeStat.objects.get(user=self.other_user, dimension=RecipeStat.ALL).recipe_count, 1)
+        # 5 recipes, 1 tag, 1 ingredient, 2 summary rows left after the recipes and their 7 tombstones.
+        self.assertEqual(account_deletion.deleted_rows, 16)
+        self.assertFalse(Tombstone.objects.filter(user_id=self.user.pk).exists())
+
+    def test_failed_deletion_resumes(self):
+        """Test a failed deletion keeps its progress and is resumed by the command."""
+        account_deletion = self.request_deletion()
+        with patch('recipe_api.deletion.counters.adjust', side_effect=RuntimeError('counters down')):
+            with self.assertRaises(RuntimeError):
+                deletion.run_deletion(account_deletion.pk)
+
+        account_deletion.refresh_from_db()
+        self.assertEqual(account_deletion.status, AccountDeletion.FAILED)
+        self.assertIn('counters down', account_deletion.error)
+        self.assertTrue(get_user_model().objects.filter(pk=self.user.pk).exists())
+
+        out = StringIO()
+        call_command('process_account_deletions', stdout=out)
+
+        self.assertIn('user@example.com: done', out.getvalue())
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
@@ -0,0 +1,62 @@
+"""
+Tests for the metrics endpoint.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.metrics import REQUESTS, view_label
+from recipe_api.views import RecipeViewSet
+from user_api.views import UserTokenView
+
+METRICS_URL = reverse('metrics')
+RECIPES_URL = reverse('recipe_api:recipe-list')
+
+
+class TestMetrics(TestCase):
+    """Test metrics collection and exposition."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_view_label(self):
+        """Test labels of viewset actions and api views."""
+        list_view = RecipeViewSet.as_view({'get': 'list'})
+        upload_view = RecipeViewSet.as_view({'post': 'upload_image'})
+
+        self.assertEqual(view_label(list_view, 'GET'), 'RecipeViewSet.list')
+        self.assertEqual(view_label(upload_view, 'POST'), 'RecipeViewSet.upload_image')
+        self.assertEqual(view_label(UserTokenView.as_view(), 'POST'), 'UserTokenView')
+
+    def test_request_counted_by_view(self):
+        """Test requests are counted with the resolved view label."""
+        labels = ('RecipeViewSet.list', 'GET', '200')
+        before = REQUESTS.labels(*labels)._value.get()
+
+        self.client.get(RECIPES_URL)
+
+        self.assertEqual(REQUESTS.labels(*labels)._value.get(), before + 1)
+
+    def test_metrics_endpoint(self):
+        """Test metrics are exposed in the Prometheus text format."""
+        self.client.get(RECIPES_URL)
+        cache.get('missing-key')
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        body = res.content.decode()
+        self.assertIn('django_http_request_duration_seconds_bucket{le="0.005",method="GET",view="RecipeViewSet.list"}', body)
+        self.assertIn('django_db_queries_per_request_count{view="RecipeViewSet.list"}', body)
+        self.assertIn('django_http_response_size_bytes_count{view="RecipeViewSet.list"}', body)
+        self.assertIn('django_http_requests_in_flight', body)
+        self.assertIn('django_cache_requests_total{cache="default",result="miss"}', body)
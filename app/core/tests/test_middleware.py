@@ -0,0 +1,75 @@
+"""
+Tests for the core middlewares.
+"""
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+ME_URL = reverse('user_api:me')
+
+
+class TestProfilingMiddleware(TestCase):
+    """Test on-demand request profiling."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.profile_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PROFILING_DIR=self.profile_dir.name, PROFILING_SAMPLE_RATE=1.0)
+        self.settings_override.enable()
+        self.staff = get_user_model().objects.create_user(
+            email='staff@example.com',
+            password='testpass123',
+            is_staff=True,
+        )
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.profile_dir.cleanup()
+
+    def test_staff_cpu_profile_with_header(self):
+        """Test staff requests are profiled and the report is saved."""
+        token = Token.objects.create(user=self.staff)
+        res = self.client.get(ME_URL, HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_X_PROFILE='cpu')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('X-Profile-Cpu', res)
+        self.assertNotIn('X-Profile-Mem', res)
+        path = os.path.join(self.profile_dir.name, f"{res['X-Profile-Id']}.prof")
+        self.assertTrue(os.path.exists(path))
+
+    def test_staff_memory_profile_with_query_param(self):
+        """Test memory profiling using the query parameter."""
+        self.client.force_login(self.staff)
+        res = self.client.get(ME_URL, {'profile': 'mem'})
+
+        self.assertIn('X-Profile-Mem', res)
+        self.assertNotIn('X-Profile-Cpu', res)
+        path = os.path.join(self.profile_dir.name, f"{res['X-Profile-Id']}.mem.txt")
+        self.assertTrue(os.path.exists(path))
+
+    def test_non_staff_not_profiled(self):
+        """Test requests from non staff users are never profiled."""
+        token = Token.objects.create(user=self.user)
+        res = self.client.get(ME_URL, HTTP_AUTHORIZATION=f'Token {token.key}', HTTP_X_PROFILE='cpu,mem')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('X-Profile-Id', res)
+        self.assertEqual(os.listdir(self.profile_dir.name), [])
+
+    def test_not_sampled_not_profiled(self):
+        """Test requests outside of the sample are not profiled."""
+        self.client.force_login(self.staff)
+        with override_settings(PROFILING_SAMPLE_RATE=0.0):
+            res = self.client.get(ME_URL, HTTP_X_PROFILE='cpu')
+
+        self.assertNotIn('X-Profile-Id', res)
@@ -49,3 +49,27 @@ class TestModels(TestCase):
 
         self.assertTrue(user.is_superuser)
         self.assertTrue(user.is_staff)
+
+    def test_bulk_create_users(self):
+        """Test bulk creation reports invalid, duplicate and registered emails and creates the others"""
+        get_user_model().objects.create_user(email='taken@example.com', password='1a9r86')
+        users = [
+            {'email': 'First@Example.com', 'password': 'pass1234', 'first_name': 'First'},
+            {'email': 'first@example.com', 'password': 'other1234'},
+            {'email': 'bad@', 'password': 'pass1234'},
+            {'email': 'taken@example.com', 'password': 'pass1234'},
+            {'email': 'second@example.com'},
+        ]
+
+        created, rejected = get_user_model().objects.bulk_create_users(users, batch_size=1, max_workers=1)
+
+        self.assertEqual(created, 2)
+        self.assertEqual(rejected, [
+            ('first@example.com', 'duplicate email'),
+            ('bad@', 'invalid email'),
+            ('taken@example.com', 'email already registered'),
+        ])
+        user = get_user_model().objects.get(email='first@example.com')
+        self.assertTrue(user.check_password('pass1234'))
+        self.assertEqual(user.first_name, 'First')
+        self.assertFalse(get_user_model().objects.get(email='second@example.com').has_usable_password())
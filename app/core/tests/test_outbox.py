@@ -0,0 +1,177 @@
+"""
+Tests for the transactional outbox.
+"""
+import json
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from django.contrib.auth import get_user_model
+
+from core import outbox
+from core.models import OutboxEvent
+from recipe_api.models import Recipe, Tag
+
+
+class FailingSink:
+
+    def send(self, events):
+        raise ConnectionError('sink down')
+
+
+class TransactionSink:
+    """Remember the depth of the atomic blocks open during each send."""
+
+    def __init__(self):
+        self.depths = []
+
+    def send(self, events):
+        self.depths.append(len(connection.savepoint_ids))
+
+
+class TestOutbox(TestCase):
+    """Test changes are recorded with their transaction and relayed in batches."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'events.ndjson')
+        sinks = [{'BACKEND': 'core.outbox.FileSink', 'OPTIONS': {'path': self.path}}]
+        self.settings_override = override_settings(OUTBOX_SINKS=sinks)
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def create_recipe(self, **params):
+        return Recipe.objects.create(
+            user=self.user, title='Rice', time_minutes=10, price=Decimal('5.00'), description='Sample', **params,
+        )
+
+    def delivered(self):
+        with open(self.path) as sink:
+            return [json.loads(line) for line in sink]
+
+    def test_relay_coalesces_changes(self):
+        """Test repeated changes of a row are delivered as one event with the last payload."""
+        recipe = self.create_recipe()
+        recipe.title = 'Fried rice'
+        recipe.save()
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        recipe.tags.add(tag)
+        removed = Tag.objects.create(user=self.user, name='removed')
+        removed.delete()
+
+        drained, lag = outbox.relay_batch(outbox.get_sinks())
+
+        self.assertEqual(drained, 6)
+        self.assertGreaterEqual(lag, 0)
+        events = self.delivered()
+        self.assertEqual(
+            [(event['model'], event['action'], event['coalesced']) for event in events],
+            [('recipe_api.Tag', 'created', 1), ('recipe_api.Recipe', 'created', 3), ('recipe_api.Tag', 'deleted', 2)],
+        )
+        self.assertEqual(events[1]['payload']['title'], 'Fried rice')
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_rolled_back_changes_are_not_recorded(self):
+        """Test no event exists for a change that did not commit."""
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_recipe()
+                raise RuntimeError
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_delivery_is_retried(self):
+        """Test events stay in the outbox until every sink accepted them."""
+        recipe = self.create_recipe()
+
+        with self.assertRaises(ConnectionError):
+            outbox.relay_batch([outbox.FileSink(self.path), FailingSink()])
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+        recipe.delete()
+        outbox.relay_batch(outbox.get_sinks())
+
+        # At least once: the first sink got the creation twice.
+        self.assertEqual([event['action'] for event in self.delivered()], ['created', 'deleted'])
+
+    def test_leased_events_are_skipped(self):
+        """Test events leased by another relay are left to it until the lease expires."""
+        self.create_recipe()
+        self.assertEqual(len(outbox.claim(10)), 1)
+
+        self.assertEqual(outbox.relay_batch(outbox.get_sinks())[0], 0)
+
+        OutboxEvent.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(outbox.relay_batch(outbox.get_sinks())[0], 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+    def test_failed_delivery_releases_lease(self):
+        """Test a failed batch can be delivered again at once."""
+        self.create_recipe()
+
+        with self.assertRaises(ConnectionError):
+            outbox.relay_batch([FailingSink()])
+
+        self.assertFalse(OutboxEvent.objects.filter(locked_until__isnull=False).exists())
+        self.assertEqual(outbox.relay_batch(outbox.get_sinks())[0], 1)
+
+    def test_sinks_called_outside_transaction(self):
+        """Test no transaction of the relay is open while the sinks run."""
+        self.create_recipe()
+        sink = TransactionSink()
+
+        outbox.relay_batch([sink])
+
+        self.assertEqual(sink.depths, [len(connection.savepoint_ids)])
+
+    def test_bulk_delete_recorded(self):
+        """Test recipes deleted in bulk are recorded."""
+        recipe = self.create_recipe()
+        outbox.relay_batch(outbox.get_sinks())
+
+        Recipe.objects.filter(pk=recipe.pk).bulk_delete()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.object_id, event.action), (recipe.pk, OutboxEvent.DELETED))
+
+    def test_webhook_sink(self):
+        """Test the webhook sink posts the batch as JSON."""
+        with patch('core.outbox.urllib.request.urlopen') as urlopen:
+            outbox.WebhookSink('https://example.com/events', headers={'Authorization': 'Token x'}).send(
+                [{'id': 1, 'payload': {'price': Decimal('5.00')}}],
+            )
+
+        request = urlopen.call_args[0][0]
+        self.assertEqual(request.full_url, 'https://example.com/events')
+        self.assertEqual(request.get_header('Authorization'), 'Token x')
+        self.assertEqual(json.loads(request.data), {'events': [{'id': 1, 'payload': {'price': '5.00'}}]})
+
+    def test_relay_outbox_command(self):
+        """Test the command drains the outbox in batches."""
+        for _ in range(3):
+            self.create_recipe()
+        out = StringIO()
+
+        call_command('relay_outbox', '--burst', '--batch-size', '2', stdout=out)
+
+        self.assertIn('Drained 3 outbox events', out.getvalue())
+        self.assertEqual(len(self.delivered()), 3)
+
+    @override_settings(OUTBOX_SINKS=[])
+    def test_disabled_without_sinks(self):
+        """Test nothing is recorded without sinks."""
+        self.create_recipe()
+
+        self.assertFalse(OutboxEvent.objects.exists())
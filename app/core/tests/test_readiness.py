@@ -0,0 +1,90 @@
+"""
+Tests for readiness checks and warmup.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import readiness
+from recipe_api import similarity, warmup
+from recipe_api.models import Recipe, Tag
+
+LIVENESS_URL = reverse('liveness')
+READINESS_URL = reverse('readiness')
+TOKEN_URL = reverse('user_api:token')
+
+
+def sample_warmup_task():
+    sample_warmup_task.calls += 1
+
+
+sample_warmup_task.calls = 0
+
+
+class TestReadiness(TestCase):
+    """Test liveness, readiness and warmup."""
+
+    def test_liveness(self):
+        """Test liveness does not depend on warmup."""
+        with patch('core.views.is_warm', return_value=False):
+            res = self.client.get(LIVENESS_URL)
+
+        self.assertEqual(res.status_code, 200)
+
+    @patch('core.views.start_warmup')
+    def test_not_ready_while_warming_up(self, patched_start):
+        """Test readiness fails and the warmup starts while the process is cold."""
+        with patch('core.views.is_warm', return_value=False):
+            res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, 503)
+        patched_start.assert_called_once()
+
+    def test_ready_after_warmup(self):
+        """Test readiness succeeds once warm and the database is reachable."""
+        readiness.ensure_warm()
+
+        res = self.client.get(READINESS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['status'], 'ready')
+
+    @override_settings(WARMUP_TASKS=['core.tests.test_readiness.sample_warmup_task', 'core.missing.task'])
+    def test_warmup_runs_tasks_and_skips_failures(self):
+        """Test every warmup task runs even when one of them fails."""
+        calls = sample_warmup_task.calls
+
+        readiness.run_warmup()
+
+        self.assertEqual(sample_warmup_task.calls, calls + 1)
+
+    def test_default_warmup_tasks(self):
+        """Test the configured warmup tasks run without errors."""
+        with patch.object(readiness.logger, 'exception') as patched_exception:
+            readiness.run_warmup()
+
+        patched_exception.assert_not_called()
+
+    @override_settings(WARMUP_RECENT_RECIPES=1)
+    def test_preload_recent_users_fills_similar_recipes(self):
+        """Test the similar recipes of the latest recipes of recent users are cached."""
+        cache.clear()
+        user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        res = self.client.post(TOKEN_URL, {'email': 'user@example.com', 'password': 'testpass123'})
+        self.assertEqual(res.status_code, 200)
+        tag = Tag.objects.create(user=user, name='vegan')
+        older, latest = [
+            Recipe.objects.create(user=user, title=title, time_minutes=10, price=Decimal('5.00'))
+            for title in ('Older', 'Latest')
+        ]
+        older.tags.add(tag)
+        latest.tags.add(tag)
+
+        warmup.preload_recent_users()
+
+        self.assertEqual(cache.get(similarity.cache_key(latest.pk, similarity.version(latest))), [(older.pk, 1.0)])
+        self.assertIsNone(cache.get(similarity.cache_key(older.pk, similarity.version(older))))
@@ -0,0 +1,96 @@
+"""
+Tests for the precomputed OpenAPI schema.
+"""
+import gzip
+import json
+import os
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('schema')
+
+
+class TestSchema(TestCase):
+    """Test the cached schema endpoint and command."""
+
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(SCHEMA_CACHE_DIR=self.cache_dir.name, CODE_VERSION='v1')
+        self.settings_override.enable()
+        schema._artifacts.clear()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.cache_dir.cleanup()
+
+    def test_generate_schema_command(self):
+        """Test the command writes the compressed artifacts of the version."""
+        call_command('generate_schema', stdout=open(os.devnull, 'w'))
+
+        self.assertEqual(
+            sorted(os.listdir(self.cache_dir.name)),
+            ['schema-v1.json.gz', 'schema-v1.yaml.gz'],
+        )
+
+    def test_schema_generated_on_first_request(self):
+        """Test the schema is generated lazily and served with cache headers."""
+        res = self.client.get(SCHEMA_URL, {'format': 'json'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('ETag', res)
+        self.assertIn('max-age', res['Cache-Control'])
+        self.assertIn('/api/recipes/', json.loads(res.content)['paths'])
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir.name, 'schema-v1.json.gz')))
+
+    def test_schema_compressed(self):
+        """Test gzip capable clients get the stored artifact."""
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertIn(b'openapi:', gzip.decompress(res.content))
+
+    def test_schema_gzip_refused(self):
+        """Test gzip with a zero quality is not served compressed."""
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+
+        self.assertNotIn('Content-Encoding', res)
+        self.assertIn(b'openapi:', res.content)
+
+    def test_schema_json_accept_quality(self):
+        """Test JSON is served only when preferred to YAML."""
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT='application/json;q=0.5, application/vnd.oai.openapi')
+        self.assertEqual(res['Content-Type'], schema.SCHEMA_FORMATS['yaml'])
+
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT='application/vnd.oai.openapi+json')
+        self.assertEqual(res['Content-Type'], schema.SCHEMA_FORMATS['json'])
+
+    def test_schema_not_modified_etag_list(self):
+        """Test the ETag is matched as a member of the list, not as a substring."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        self.assertEqual(self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=f'"other", W/{etag}').status_code, 304)
+        self.assertEqual(self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=f'"x{etag[1:]}').status_code, 200)
+
+    def test_schema_not_modified(self):
+        """Test a matching ETag is answered without a body."""
+        etag = self.client.get(SCHEMA_URL)['ETag']
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_schema_regenerated_on_new_version(self):
+        """Test a new code version gets its own artifact."""
+        self.client.get(SCHEMA_URL)
+        with override_settings(CODE_VERSION='v2'):
+            self.client.get(SCHEMA_URL)
+
+        self.assertEqual(
+            sorted(os.listdir(self.cache_dir.name)),
+            ['schema-v1.yaml.gz', 'schema-v2.yaml.gz'],
+        )
@@ -0,0 +1,198 @@
+"""
+Tests for the sharding of the recipe data.
+"""
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import sharding
+from core.deletion import request_deletion, run_deletion
+from recipe_api.models import Recipe, RecipeIngredient, RecipeStat, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe_api:recipe-list')
+TAGS_URL = reverse('recipe_api:tag-list')
+SHARDS = ['shard_1', 'shard_2']
+
+
+@override_settings(RECIPE_SHARDS=SHARDS)
+class TestSharding(TestCase):
+    """Test the recipe data of users is stored on their shard."""
+    databases = {'default', *SHARDS}
+
+    @classmethod
+    def setUpTestData(cls):
+        # Done by migrate for the databases of RECIPE_SHARDS.
+        for alias in SHARDS:
+            sharding.reserve_id_ranges(alias)
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.shard = sharding.shard_for(self.user)
+        self.other_shard = next(alias for alias in SHARDS if alias != self.shard)
+
+    def create_recipe(self):
+        """Create a tagged recipe through the API, returns its id."""
+        tag = self.client.post(TAGS_URL, {'name': 'vegan'})
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Rice', 'time_minutes': 10, 'price': '5.00', 'description': 'Sample', 'tags': [tag.data['id']],
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data['id']
+
+    def test_users_spread_on_shards(self):
+        """Test users are placed on every shard by their id."""
+        shards = {sharding.hashed_shard(user_id) for user_id in range(1, 20)}
+
+        self.assertEqual(shards, set(SHARDS))
+
+    def test_api_reads_and_writes_the_shard(self):
+        """Test the rows of the user are written to their shard only and read back from it."""
+        recipe_id = self.create_recipe()
+
+        recipe = Recipe.objects.using(self.shard).get(pk=recipe_id)
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['vegan'])
+        self.assertFalse(Recipe.objects.using(self.other_shard).exists())
+        self.assertFalse(Recipe.objects.using('default').exists())
+        self.assertEqual(RecipeStat.objects.using(self.shard).get(dimension=RecipeStat.ALL).recipe_count, 1)
+
+        res = self.client.get(reverse('recipe_api:recipe-detail', args=[recipe_id]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tags'][0]['name'], 'vegan')
+
+    def test_ids_unique_across_shards(self):
+        """Test each shard numbers its rows from its own range."""
+        start = SHARDS.index(self.shard) * settings.SHARD_ID_RANGE
+
+        recipe = Recipe.objects.create(user=self.user, title='Rice', price=Decimal('5.00'), description='Sample')
+
+        self.assertEqual(recipe._state.db, self.shard)
+        self.assertGreater(recipe.pk, start)
+        self.assertLess(recipe.pk, start + settings.SHARD_ID_RANGE)
+
+    def test_rebalance_user(self):
+        """Test the command moves the rows with their ids and pins the user on the target shard."""
+        recipe_id = self.create_recipe()
+        out = StringIO()
+
+        call_command('rebalance_user', self.user.email, self.other_shard, stdout=out)
+
+        self.assertIn(f'from {self.shard} to {self.other_shard}', out.getvalue())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, self.other_shard)
+        self.assertFalse(Recipe.objects.using(self.shard).exists())
+        self.assertFalse(Tag.objects.using(self.shard).exists())
+        recipe = Recipe.objects.using(self.other_shard).get(pk=recipe_id)
+        self.assertEqual([tag.name for tag in recipe.tags.all()], ['vegan'])
+        self.assertEqual(Tag.objects.using(self.other_shard).get().recipe_count, 1)
+
+        self.client.force_authenticate(user=self.user)
+        res = self.client.get(RECIPES_URL)
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe_id])
+
+    def test_move_sees_writes_keeping_counts(self):
+        """Test a write during the copy which keeps the counts and ids is moved too."""
+        recipe_id = self.create_recipe()
+        ingredient = Ingredient.objects.create(user=self.user, name='rice')
+        Recipe.objects.using(self.shard).get(pk=recipe_id).ingredients.add(
+            ingredient, through_defaults={'quantity': 1, 'unit': 'kg'},
+        )
+        lock_user = sharding._lock_user
+        # Users are inactive during the move, the write is done by a request started before.
+        self.assertTrue(get_user_model().objects.get(pk=self.user.pk).is_active)
+
+        def write_once(user_id, using):
+            if not write_once.done:
+                write_once.done = True
+                self.assertFalse(get_user_model().objects.get(pk=self.user.pk).is_active)
+                RecipeIngredient.objects.using(using).filter(recipe_id=recipe_id).update(quantity=2)
+            lock_user(user_id, using)
+
+        write_once.done = False
+        with patch('core.sharding._lock_user', write_once):
+            sharding.move_user(self.user, self.other_shard)
+
+        self.assertEqual(RecipeIngredient.objects.using(self.other_shard).get().quantity, 2)
+        self.assertFalse(RecipeIngredient.objects.using(self.shard).exists())
+        self.assertTrue(get_user_model().objects.get(pk=self.user.pk).is_active)
+
+    @override_settings(SHARD_MOVE_ATTEMPTS=1)
+    def test_move_gives_up_when_data_keeps_changing(self):
+        """Test the user stays on their shard, active, when every copy is outdated."""
+        recipe_id = self.create_recipe()
+        lock_user = sharding._lock_user
+
+        def write(user_id, using):
+            Recipe.objects.using(using).filter(pk=recipe_id).update(title='Changed')
+            lock_user(user_id, using)
+
+        with patch('core.sharding._lock_user', write):
+            with self.assertRaisesMessage(RuntimeError, 'kept changing'):
+                sharding.move_user(self.user, self.other_shard)
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        self.assertEqual((user.shard, user.is_active), ('', True))
+        self.assertEqual(sharding.shard_for(user.pk), self.shard)
+        self.assertEqual(Recipe.objects.using(self.shard).get().title, 'Changed')
+
+    def test_writes_of_requests_started_before_move_fail(self):
+        """Test a request holding the user before the move does not write to the former shard."""
+        recipe_id = self.create_recipe()
+        recipe = Recipe.objects.using(self.shard).get(pk=recipe_id)
+
+        # `self.user` is the user of the request, its shard is the one before the move.
+        sharding.move_user(get_user_model().objects.get(pk=self.user.pk), self.other_shard)
+
+        res = self.client.post(TAGS_URL, {'name': 'quick'})
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        res = self.client.post(RECIPES_URL, {
+            'title': 'Beans', 'time_minutes': 10, 'price': '5.00', 'description': 'Sample',
+        }, format='json')
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        recipe.title = 'Changed'
+        with self.assertRaises(sharding.ShardMoved):
+            recipe.save()
+        self.assertFalse(Recipe.objects.using(self.shard).exists())
+        self.assertFalse(Tag.objects.using(self.shard).exists())
+        self.assertEqual(Recipe.objects.using(self.other_shard).get().title, 'Rice')
+
+        # The next request reads the moved user.
+        self.client.force_authenticate(user=get_user_model().objects.get(pk=self.user.pk))
+        res = self.client.post(TAGS_URL, {'name': 'quick'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Tag.objects.using(self.other_shard).filter(name='quick').exists())
+
+    def test_move_seen_by_user_id_at_once(self):
+        """Test lookups by user id, like the account deletion, see the move without waiting for a cache."""
+        self.assertEqual(sharding.shard_for(self.user.pk), self.shard)
+
+        sharding.move_user(self.user, self.other_shard)
+
+        self.assertEqual(sharding.shard_for(self.user.pk), self.other_shard)
+
+    def test_rebalance_unknown_shard(self):
+        """Test users are only moved to configured shards."""
+        with self.assertRaisesMessage(Exception, 'is not one of'):
+            call_command('rebalance_user', str(self.user.pk), 'default')
+
+    def test_account_deletion(self):
+        """Test deleting an account deletes its rows on its shard."""
+        self.create_recipe()
+
+        run_deletion(request_deletion(self.user).pk)
+
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Recipe.objects.using(self.shard).exists())
+        self.assertFalse(Tag.objects.using(self.shard).exists())
@@ -0,0 +1,190 @@
+"""
+Tests for the background tasks.
+"""
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+
+from core import tasks
+from core.models import Task
+
+calls = []
+
+
+def sample_task(value, scale=1):
+    calls.append(value * scale)
+
+
+def failing_task():
+    raise RuntimeError('boom')
+
+
+def slow_task():
+    time.sleep(0.2)
+    calls.append(Task.objects.get().locked_at)
+
+
+class TestTasks(TestCase):
+    """Test queueing, claiming and running tasks."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_and_execute(self):
+        """Test a queued task is claimed once and run with its arguments."""
+        tasks.enqueue(sample_task, 2, scale=3)
+
+        claimed = tasks.claim('worker', 10)
+
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(claimed[0].name, 'core.tests.test_tasks.sample_task')
+        self.assertEqual(tasks.claim('other-worker', 10), [])
+        self.assertEqual(tasks.execute(claimed[0]), 'done')
+        self.assertEqual(calls, [6])
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.DONE, 1))
+
+    def test_claim_by_priority_and_due_time(self):
+        """Test tasks are claimed by priority, tasks not due yet are left."""
+        low = tasks.enqueue(sample_task, 1)
+        high = tasks.enqueue(sample_task, 2, priority=10)
+        tasks.enqueue(sample_task, 3, priority=20, delay=60)
+
+        claimed = tasks.claim('worker', 10)
+
+        self.assertEqual([task.pk for task in claimed], [high.pk, low.pk])
+
+    @override_settings(TASK_RETRY_DELAY=10, TASK_RETRY_MAX_DELAY=15)
+    def test_retry_with_backoff(self):
+        """Test failed tasks are retried later until the last attempt."""
+        tasks.enqueue(failing_task, max_attempts=2)
+
+        with self.assertLogs('core.tasks', level='ERROR'):
+            self.assertEqual(tasks.execute(tasks.claim('worker', 1)[0]), 'retry')
+        task = Task.objects.get()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertIn('boom', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=9))
+        self.assertEqual(tasks.claim('worker', 1), [])
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', level='ERROR'):
+            self.assertEqual(tasks.execute(tasks.claim('worker', 1)[0]), 'failed')
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        self.assertEqual([tasks.retry_delay(attempts) for attempts in (1, 2, 3)], [10, 15, 15])
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_requeue_stale(self):
+        """Test tasks of dead workers are queued again."""
+        tasks.enqueue(sample_task, 1)
+        tasks.claim('dead-worker', 1)
+        Task.objects.update(locked_at=timezone.now() - timedelta(seconds=120))
+
+        self.assertEqual(tasks.requeue_stale(), 1)
+        self.assertEqual(len(tasks.claim('worker', 1)), 1)
+
+    @override_settings(TASK_LOCK_TIMEOUT=60)
+    def test_requeue_stale_counts_attempts(self):
+        """Test a task whose workers kept dying fails after its last attempt."""
+        tasks.enqueue(sample_task, 1, max_attempts=2)
+        for _ in range(2):
+            tasks.claim('dead-worker', 1)
+            Task.objects.update(locked_at=timezone.now() - timedelta(seconds=120))
+            self.assertEqual(tasks.requeue_stale(), 1)
+
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertEqual(tasks.claim('worker', 1), [])
+
+    def test_outcome_dropped_without_lock(self):
+        """Test a worker which lost the lock of its task leaves it to the new owner."""
+        tasks.enqueue(sample_task, 1)
+        task = tasks.claim('stalled-worker', 1)[0]
+        # Requeued as stale and claimed by another worker meanwhile.
+        Task.objects.update(locked_by='other-worker:token')
+
+        with self.assertLogs('core.tasks', level='WARNING'):
+            self.assertEqual(tasks.execute(task), 'lost')
+
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.locked_by), (Task.RUNNING, 'other-worker:token'))
+
+
+class TestRunWorkerCommand(TransactionTestCase):
+    """Test the worker command runs the committed tasks in a pool."""
+
+    def setUp(self):
+        calls.clear()
+
+    def test_run_worker_burst(self):
+        """Test the worker runs every due task then exits."""
+        for value in range(5):
+            tasks.enqueue(sample_task, value)
+        tasks.enqueue(failing_task, max_attempts=1)
+        out = StringIO()
+
+        # One at a time: the shared cache in-memory SQLite test database fails concurrent writers.
+        with self.assertLogs('core.tasks', level='ERROR'):
+            call_command('run_worker', '--burst', '--concurrency', '1', '--poll-interval', '0.01', stdout=out)
+
+        self.assertEqual(sorted(calls), [0, 1, 2, 3, 4])
+        self.assertIn('Processed 6 tasks', out.getvalue())
+        self.assertIn('5 done, 1 failed', out.getvalue())
+        self.assertFalse(Task.objects.exclude(status__in=[Task.DONE, Task.FAILED]).exists())
+
+    @override_settings(TASK_HEARTBEAT_INTERVAL=0.05)
+    def test_heartbeat_refreshes_lock(self):
+        """Test the lock of a running task is refreshed while it runs."""
+        tasks.enqueue(slow_task)
+        task = tasks.claim('worker', 1)[0]
+        claimed_at = task.locked_at
+
+        self.assertEqual(tasks.execute(task), 'done')
+
+        self.assertGreater(calls[0], claimed_at)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    # The shared cache in-memory SQLite test database fails concurrent writers instead of waiting.
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_run_worker_burst_concurrently(self):
+        """Test workers running at once run every task exactly once."""
+        for value in range(20):
+            tasks.enqueue(sample_task, value)
+        out = StringIO()
+
+        call_command('run_worker', '--burst', '--concurrency', '3', '--poll-interval', '0.01', stdout=out)
+
+        self.assertEqual(sorted(calls), list(range(20)))
+        self.assertIn('Processed 20 tasks', out.getvalue())
+
+    @skipUnlessDBFeature('has_select_for_update_skip_locked')
+    def test_concurrent_claims_skip_locked_tasks(self):
+        """Test two workers claiming at once never claim the same task."""
+        for value in range(20):
+            tasks.enqueue(sample_task, value)
+        barrier = threading.Barrier(2)
+        claimed = {}
+
+        def worker(worker_id):
+            try:
+                barrier.wait()
+                claimed[worker_id] = []
+                while batch := tasks.claim(worker_id, 3):
+                    claimed[worker_id] += [task.pk for task in batch]
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in ('first', 'second')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertFalse(set(claimed['first']) & set(claimed['second']))
+        self.assertEqual(len(claimed['first']) + len(claimed['second']), 20)
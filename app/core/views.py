@@ -1,3 +1,136 @@
-# from django.shortcuts import render
+"""
+Core views
+"""
+import gzip
 
-# Create your views here.
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import batch, sharding
+from .metrics import render_latest
+from .readiness import check_database, is_warm, start_warmup
+from .schema import SCHEMA_FORMATS, get_schema
+from .serializers import BatchSerializer, BatchResultSerializer
+
+
+def lazy_view(view_path, **initkwargs):
+    """Returns a view importing the class based view `view_path` on its first request."""
+    view = None
+
+    @csrf_exempt
+    def wrapper(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(view_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = view_path.rsplit('.', 1)[-1]
+    return wrapper
+
+
+@require_GET
+def metrics_view(request):
+    """Expose the Prometheus metrics of every worker."""
+    body, content_type = render_latest()
+    return HttpResponse(body, content_type=content_type)
+
+
+@require_GET
+def liveness_view(request):
+    """The process is up and serving requests."""
+    return JsonResponse({'status': 'alive'})
+
+
+@require_GET
+def readiness_view(request):
+    """The process finished its warmup and reaches every database."""
+    if not is_warm():
+        start_warmup()
+        return JsonResponse({'status': 'warming up'}, status=503)
+    unavailable = []
+    for alias in sharding.databases():
+        try:
+            check_database(alias)
+        except Exception:
+            unavailable.append(alias)
+    if unavailable:
+        return JsonResponse({'status': 'unavailable', 'databases': unavailable}, status=503)
+    return JsonResponse({'status': 'ready'})
+
+
+JSON_MEDIA_TYPES = ('application/json', SCHEMA_FORMATS['json'])
+YAML_MEDIA_TYPES = ('application/yaml', 'application/x-yaml', 'text/yaml', SCHEMA_FORMATS['yaml'])
+
+
+def _quality_values(header):
+    """Returns the quality of each value of an Accept-like header, lowercased."""
+    qualities = {}
+    for item in header.split(','):
+        value, *params = (part.strip() for part in item.split(';'))
+        quality = 1.0
+        for param in params:
+            name, _, number = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        if value:
+            qualities[value.lower()] = max(quality, qualities.get(value.lower(), 0.0))
+    return qualities
+
+
+def _best(qualities, values):
+    return max((qualities.get(value, 0.0) for value in values), default=0.0)
+
+
+def _etag_matches(etag, header):
+    """Returns whether the ETag matches the If-None-Match header, with the weak comparison."""
+    etags = parse_etags(header)
+    return '*' in etags or etag.removeprefix('W/') in (tag.removeprefix('W/') for tag in etags)
+
+
+@require_GET
+def schema_view(request):
+    """OpenAPI schema, YAML by default or JSON with `?format=json` or a JSON `Accept` preferred to YAML."""
+    accept = _quality_values(request.META.get('HTTP_ACCEPT', ''))
+    json_preferred = _best(accept, JSON_MEDIA_TYPES) > _best(accept, YAML_MEDIA_TYPES)
+    schema_format = 'json' if request.GET.get('format') == 'json' or json_preferred else 'yaml'
+    compressed, etag = get_schema(schema_format)
+    encodings = _quality_values(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+
+    if _etag_matches(etag, request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    elif encodings.get('gzip', encodings.get('*', 0.0)) > 0:
+        response = HttpResponse(compressed, content_type=SCHEMA_FORMATS[schema_format])
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(compressed), content_type=SCHEMA_FORMATS[schema_format])
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.SCHEMA_CACHE_MAX_AGE}'
+    patch_vary_headers(response, ('Accept', 'Accept-Encoding'))
+    return response
+
+
+class BatchView(APIView):
+    """Serve many calls of the recipe and user APIs in one request, see `core.batch`."""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @extend_schema(request=BatchSerializer, responses=BatchResultSerializer)
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        responses, rolled_back = batch.run(
+            request, serializer.validated_data['requests'], serializer.validated_data['atomic'],
+        )
+        return Response({'responses': responses, 'rolled_back': rolled_back})
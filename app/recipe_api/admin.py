@@ -1,6 +1,52 @@
 from django.contrib import admin
-from recipe_api.models import Recipe, Tag, Ingredient
+from recipe_api.models import Recipe, RecipeIngredient, RecipeTag, Tag, Ingredient
+
+
+class RecipeTagInline(admin.TabularInline):
+    model = RecipeTag
+    extra = 0
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    model = RecipeIngredient
+    fields = ('ingredient', 'quantity', 'unit')
+    extra = 0
+
+
+@admin.register(Recipe)
+class RecipeAdmin(admin.ModelAdmin):
+    inlines = [RecipeTagInline, RecipeIngredientInline]
+    # Inline model: (m2m manager, linked field)
+    link_managers = {
+        RecipeTag: ('tags', 'tag'),
+        RecipeIngredient: ('ingredients', 'ingredient'),
+    }
+
+    def save_formset(self, request, form, formset, change):
+        """Save the links through the m2m managers so the link signals keep the counters and statistics."""
+        if formset.model not in self.link_managers:
+            return super().save_formset(request, form, formset, change)
+        name, field = self.link_managers[formset.model]
+        manager = getattr(form.instance, name)
+
+        def extra(link):
+            return {
+                f.name: getattr(link, f.name) for f in formset.model._meta.concrete_fields
+                if not f.primary_key and f.name not in ('recipe', field)
+            }
+
+        formset.save(commit=False)
+        for link in formset.deleted_objects:
+            manager.remove(getattr(link, field))
+        for link, changed in formset.changed_objects:
+            if field in changed:
+                manager.remove(getattr(formset.model.objects.get(pk=link.pk), field))
+                manager.add(getattr(link, field), through_defaults=extra(link))
+            else:
+                link.save()
+        for link in formset.new_objects:
+            manager.add(getattr(link, field), through_defaults=extra(link))
+
 
-admin.site.register(Recipe)
 admin.site.register(Tag)
 admin.site.register(Ingredient)
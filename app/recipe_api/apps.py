@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RecipeApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe_api'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,43 @@
+"""
+Compound documents of recipes, with each related row serialized once.
+
+With `?compound=1` the recipe reads return `{"data": ..., "included": ...}`:
+the recipes reference their user, tags and ingredients by id, and every
+user, tag and ingredient they reference is in `included` once, whatever
+the number of recipes sharing it.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import prefetch_related_objects
+
+from user_api.serializers import UserSerializer
+
+from .serializers import RecipeCompoundSerializer, TagCompoundSerializer, IngredientCompoundSerializer
+
+
+def requested(request):
+    return request.query_params.get('compound') in ('1', 'true')
+
+
+def document(recipes, user, many=True):
+    """Returns the compound document of the recipes, or of one recipe when not many."""
+    recipes = list(recipes) if many else [recipes]
+    prefetch_related_objects(recipes, 'tags', 'ingredients', 'recipeingredient_set')
+    tags = {tag.pk: tag for recipe in recipes for tag in recipe.tags.all()}
+    ingredients = {ingredient.pk: ingredient for recipe in recipes for ingredient in recipe.ingredients.all()}
+    user_ids = {row.user_id for row in [*recipes, *tags.values(), *ingredients.values()]}
+    # Reads are scoped to the rows of the user of the request.
+    if user_ids <= {user.pk}:
+        users = [user] if user_ids else []
+    else:
+        users = get_user_model().objects.filter(pk__in=user_ids).order_by('pk')
+    data = RecipeCompoundSerializer(recipes, many=True).data
+    return {
+        'data': data if many else data[0],
+        'included': {
+            'users': UserSerializer(users, many=True).data,
+            'tags': TagCompoundSerializer(sorted(tags.values(), key=lambda tag: tag.pk), many=True).data,
+            'ingredients': IngredientCompoundSerializer(
+                sorted(ingredients.values(), key=lambda ingredient: ingredient.pk), many=True,
+            ).data,
+        },
+    }
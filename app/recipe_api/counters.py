@@ -0,0 +1,47 @@
+"""
+Denormalized `recipe_count` of tags and ingredients.
+
+Signals in `recipe_api.signals` keep the counters with atomic increments,
+`repair` recomputes them from the link tables.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Recipe, Tag, Ingredient
+
+LINKS = {
+    Tag: (Recipe.tags.through, 'tag_id'),
+    Ingredient: (Recipe.ingredients.through, 'ingredient_id'),
+}
+
+
+def adjust(model, using, ids, sign):
+    """Add `sign` to the counter of every id, once per occurrence."""
+    by_amount = defaultdict(list)
+    for pk, occurrences in Counter(ids).items():
+        by_amount[sign * occurrences].append(pk)
+    for amount, pks in by_amount.items():
+        model.objects.using(using).filter(pk__in=pks).update(recipe_count=F('recipe_count') + amount)
+
+
+def actual_count(model):
+    """Returns the expression counting the recipes linked to each row."""
+    through, field = LINKS[model]
+    links = through.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        count=Count('pk'),
+    ).values('count')
+    return Coalesce(Subquery(links), Value(0))
+
+
+def repair(model, using='default', fix=True):
+    """Returns the ids whose counter was wrong, fixing them unless `fix` is False."""
+    stale = list(
+        model.objects.using(using).annotate(actual=actual_count(model)).exclude(
+            recipe_count=F('actual'),
+        ).values_list('pk', flat=True)
+    )
+    if stale and fix:
+        model.objects.using(using).filter(pk__in=stale).update(recipe_count=actual_count(model))
+    return stale
@@ -0,0 +1,96 @@
+"""
+Incremental changes of the tags and ingredients linked to recipes.
+
+Only the delta is written, by batches of `RECIPE_LINKS_BATCH_SIZE` recipes:
+adding reads the links already there and inserts the missing ones with one
+INSERT ignoring conflicts, removing is one DELETE of the given pairs, and
+the links of other editors are left alone. The rows of the recipes are
+locked for the transaction with `lock_recipes`, which the recipe serializer
+also takes before setting the links of a recipe, so concurrent changes of
+the same recipes wait for each other. The links are read again after the
+INSERT and only the pairs it actually inserted are counted, a link inserted
+meanwhile by another path is skipped by the INSERT rather than failing it
+or being counted twice. The data derived from the links is then updated
+once for the links actually inserted or deleted, like the link signals of
+`recipe_api.signals` do for the related managers.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from . import counters, stats, sync
+from core.sharding import lock_user
+
+from .models import Recipe, RecipeStat, Tag, Ingredient
+
+FIELDS = {
+    'tags': Tag,
+    'ingredients': Ingredient,
+}
+
+# Link model: (linked field, summary dimension, linked model)
+LINK_FIELDS = {
+    Recipe.tags.through: ('tag_id', RecipeStat.TAG, Tag),
+    Recipe.ingredients.through: ('ingredient_id', RecipeStat.INGREDIENT, Ingredient),
+}
+
+
+def _batches(ids):
+    size = settings.RECIPE_LINKS_BATCH_SIZE
+    return [ids[start:start + size] for start in range(0, len(ids), size)]
+
+
+def _existing(links, field):
+    """Returns the (recipe_id, linked id) pairs of the links."""
+    return set(links.values_list('recipe_id', field))
+
+
+def lock_recipes(recipe_ids, using='default'):
+    """Lock the rows of the recipes, by id, until the end of the transaction."""
+    recipes = Recipe.objects.using(using).select_for_update().filter(pk__in=recipe_ids).order_by('pk')
+    list(recipes.values('pk'))
+
+
+def unknown_ids(model, user, ids, using='default'):
+    """Returns the ids which are not rows of the user, sorted."""
+    ids = sorted(set(ids))
+    found = set()
+    for batch in _batches(ids):
+        found.update(model.objects.using(using).filter(user=user, pk__in=batch).values_list('pk', flat=True))
+    return [pk for pk in ids if pk not in found]
+
+
+def links_changed(through, using, links, sign):
+    """Update the data derived from added (sign=1) or removed (sign=-1) (recipe_id, linked id) links."""
+    if not links:
+        return
+    _, dimension, model = LINK_FIELDS[through]
+    stats.links_changed(using, dimension, links, sign)
+    counters.adjust(model, using, [key for _, key in links], sign)
+    # The links are synced with the recipe, see `recipe_api.sync`, and version similarities.
+    sync.touch(using, {recipe_id for recipe_id, _ in links})
+
+
+def change(field, user, recipe_ids, target_ids, add=True, using='default'):
+    """Link (add=True) or unlink the tags or ingredients of `target_ids` and the recipes of the user."""
+    through = getattr(Recipe, field).through
+    linked_field = LINK_FIELDS[through][0]
+    recipe_ids, target_ids = sorted(set(recipe_ids)), sorted(set(target_ids))
+    changed = []
+    with transaction.atomic(using=using):
+        lock_user(user.pk, using)
+        lock_recipes(recipe_ids, using)
+        for batch in _batches(recipe_ids):
+            links = through.objects.using(using).filter(recipe_id__in=batch, **{f'{linked_field}__in': target_ids})
+            existing = _existing(links, linked_field)
+            if add:
+                missing = [(recipe_id, pk) for recipe_id in batch for pk in target_ids if (recipe_id, pk) not in existing]
+                through.objects.using(using).bulk_create(
+                    [through(recipe_id=recipe_id, **{linked_field: pk}) for recipe_id, pk in missing],
+                    ignore_conflicts=True,
+                )
+                # Links inserted meanwhile were skipped, only the new pairs are counted.
+                changed += sorted(_existing(links, linked_field) - existing)
+            elif existing:
+                links.delete()
+                changed += existing
+        links_changed(through, using, changed, 1 if add else -1)
@@ -0,0 +1,19 @@
+"""
+Django command to delete the expired tombstones of the delta sync.
+"""
+from django.core.management.base import BaseCommand
+
+from recipe_api import sync
+
+
+class Command(BaseCommand):
+    """Django command to delete the tombstones older than `SYNC_TOMBSTONE_RETENTION` days."""
+    help = 'Delete the tombstones older than the retention, clients with older tokens sync from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to prune.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        deleted = sync.prune_tombstones(using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones'))
@@ -0,0 +1,20 @@
+"""
+Django command to rebuild the recipe statistics summary rows.
+"""
+from django.core.management.base import BaseCommand
+
+from recipe_api import stats
+
+
+class Command(BaseCommand):
+    """Django command to recompute `RecipeStat` from the recipes."""
+    help = 'Recompute the recipe statistics of every user, or of the given users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help='User id to rebuild.')
+        parser.add_argument('--database', default='default', help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        stats.rebuild(using=options['database'], user_ids=options['user_ids'])
+        self.stdout.write(self.style.SUCCESS('Recipe statistics rebuilt'))
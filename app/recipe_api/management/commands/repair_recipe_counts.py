@@ -0,0 +1,28 @@
+"""
+Django command to check and repair the recipe counters of tags and ingredients.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe_api import counters
+from recipe_api.models import Tag, Ingredient
+
+
+class Command(BaseCommand):
+    """Django command to recompute `recipe_count` from the links."""
+    help = 'Check the recipe_count of tags and ingredients and repair the stale ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only report, fail when a counter is stale.')
+        parser.add_argument('--database', default='default', help='Database alias to repair.')
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        stale = {
+            model.__name__: counters.repair(model, using=options['database'], fix=not options['check'])
+            for model in (Tag, Ingredient)
+        }
+        for name, ids in stale.items():
+            self.stdout.write(f'{name}: {len(ids)} stale counters {ids[:20]}')
+        if options['check'] and any(stale.values()):
+            raise CommandError('Stale recipe counters found')
+        self.stdout.write(self.style.SUCCESS('Recipe counters checked'))
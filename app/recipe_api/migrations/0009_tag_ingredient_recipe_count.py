@@ -0,0 +1,49 @@
+# Generated by Django 4.0 on 2026-10-19 01:21
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_recipes(apps, schema_editor):
+    """Backfill the counters from the link tables."""
+    Recipe = apps.get_model('recipe_api', 'Recipe')
+    for model_name, through, field in (
+        ('Tag', Recipe.tags.through, 'tag_id'),
+        ('Ingredient', Recipe.ingredients.through, 'ingredient_id'),
+    ):
+        links = through.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+            count=Count('pk'),
+        ).values('count')
+        apps.get_model('recipe_api', model_name).objects.using(schema_editor.connection.alias).update(
+            recipe_count=Coalesce(Subquery(links), Value(0)),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_api', '0008_recipestat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),
+        ),
+        migrations.RunPython(count_recipes, migrations.RunPython.noop),
+    ]
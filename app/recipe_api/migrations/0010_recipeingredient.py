@@ -0,0 +1,48 @@
+# Generated by Django 4.0 on 2026-10-19 02:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_api', '0009_tag_ingredient_recipe_count'),
+    ]
+
+    operations = [
+        # The implicit through table already exists with the same columns,
+        # only the migration state learns about the explicit model.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='RecipeIngredient',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipe_api.ingredient')),
+                        ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipe_api.recipe')),
+                    ],
+                    options={
+                        'db_table': 'recipe_api_recipe_ingredients',
+                        'unique_together': {('recipe', 'ingredient')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='ingredients',
+                    field=models.ManyToManyField(blank=True, through='recipe_api.RecipeIngredient', to='recipe_api.Ingredient'),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='quantity',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipeingredient',
+            name='unit',
+            field=models.CharField(blank=True, choices=[('g', 'Grams'), ('kg', 'Kilograms'), ('oz', 'Ounces'), ('lb', 'Pounds'), ('ml', 'Milliliters'), ('l', 'Liters'), ('tsp', 'Teaspoons'), ('tbsp', 'Tablespoons'), ('cup', 'Cups'), ('pc', 'Pieces')], default='', max_length=8),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 4.0 on 2026-10-19 02:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+
+def merge_duplicates(apps, schema_editor):
+    """Merge the tags and ingredients of a user sharing a name into the oldest one.
+
+    Links move to the kept row, the counters and summary rows of the kept
+    rows are recomputed and the merged rows leave tombstones for the delta
+    sync, whose recipes are marked changed.
+    """
+    alias = schema_editor.connection.alias
+    Recipe = apps.get_model('recipe_api', 'Recipe')
+    RecipeStat = apps.get_model('recipe_api', 'RecipeStat')
+    Tombstone = apps.get_model('recipe_api', 'Tombstone')
+    now = timezone.now()
+    for model_name, through, field, dimension in (
+        ('Tag', 'RecipeTag', 'tag_id', 'tag'),
+        ('Ingredient', 'RecipeIngredient', 'ingredient_id', 'ingredient'),
+    ):
+        model = apps.get_model('recipe_api', model_name)
+        links = apps.get_model('recipe_api', through).objects.using(alias)
+        duplicates = model.objects.using(alias).values('user_id', 'name').annotate(
+            count=Count('pk'), keep=Min('pk'),
+        ).filter(count__gt=1)
+        for group in duplicates:
+            user_id, keep = group['user_id'], group['keep']
+            merged = list(model.objects.using(alias).filter(
+                user_id=user_id, name=group['name'],
+            ).exclude(pk=keep).values_list('pk', flat=True))
+            moved = links.filter(**{f'{field}__in': merged})
+            recipe_ids = set(moved.values_list('recipe_id', flat=True))
+            # A recipe linked to both keeps the link of the kept row.
+            moved.filter(recipe_id__in=links.filter(**{field: keep}).values('recipe_id')).delete()
+            moved.update(**{field: keep})
+            model.objects.using(alias).filter(pk__in=merged).delete()
+            RecipeStat.objects.using(alias).filter(user_id=user_id, dimension=dimension, key__in=merged).delete()
+            Tombstone.objects.using(alias).bulk_create([
+                Tombstone(user_id=user_id, model=dimension, object_id=pk) for pk in merged
+            ])
+            Recipe.objects.using(alias).filter(pk__in=recipe_ids).update(updated_at=now)
+
+            totals = Recipe.objects.using(alias).filter(pk__in=links.filter(**{field: keep}).values('recipe_id')).aggregate(
+                recipe_count=Count('pk'), total_time_minutes=Sum('time_minutes'), total_price=Sum('price'),
+            )
+            model.objects.using(alias).filter(pk=keep).update(recipe_count=totals['recipe_count'], updated_at=now)
+            RecipeStat.objects.using(alias).update_or_create(
+                user_id=user_id, dimension=dimension, key=keep, defaults={
+                    'recipe_count': totals['recipe_count'],
+                    'total_time_minutes': totals['total_time_minutes'] or 0,
+                    'total_price': totals['total_price'] or 0,
+                },
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_api', '0015_unconstrained_users'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='ingredient_user_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='tag_user_name_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_ingredient_user_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='unique_tag_user_name'),
+        ),
+    ]
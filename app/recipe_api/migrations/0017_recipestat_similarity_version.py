@@ -0,0 +1,18 @@
+# Generated by Django 4.0 on 2026-10-19 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe_api', '0016_unique_user_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipestat',
+            name='similarity_version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -1,47 +1,268 @@
 """
 Recipe models.
 """
-from django.db import models
+from django.db import models, router, transaction
 from django.conf import settings
 
+from core.sharding import UserShardQuerySet, lock_user
 
-class Recipe(models.Model):
+
+def _keep_recipe_count(instance, kwargs):
+    """Updates of a loaded tag or ingredient must not overwrite `recipe_count`.
+
+    The counter is maintained with atomic increments, see `recipe_api.counters`.
+    """
+    if not instance._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+        kwargs['update_fields'] = [
+            field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name != 'recipe_count'
+        ]
+    return kwargs
+
+
+class AtomicSaveModel(models.Model):
+    """Saves and deletes in a transaction, with the receivers of their signals.
+
+    The derived data and the outbox events written by `recipe_api.signals`
+    then commit or roll back with the row. The transaction is fenced with
+    `core.sharding.lock_user`, a row loaded before a move of its user is not
+    written back to the former shard.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            lock_user(self.user_id, using)
+            return super().save(*args, **kwargs)
+
+    def delete(self, using=None, keep_parents=False):
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            lock_user(self.user_id, using)
+            return super().delete(using, keep_parents)
+
+
+class RecipeQuerySet(UserShardQuerySet):
+
+    def bulk_delete(self):
+        """Delete the recipes skipping the per-object signals, see `recipe_api.deletion`."""
+        from .deletion import bulk_delete
+        return bulk_delete(self)
+
+
+class Recipe(AtomicSaveModel):
     """Recipe object."""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # Not enforced by the database, users and recipe data can be on different shards, see `core.sharding`.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     title = models.CharField(max_length=255)
     thumbnail = models.ImageField(upload_to='images/recipes/', null=True, blank=True)
     time_minutes = models.IntegerField(default=1)
     price = models.DecimalField(max_digits=6, decimal_places=2)
     description = models.TextField(max_length=255)
     link = models.URLField(max_length=255, blank=True)
-    tags = models.ManyToManyField('Tag', blank=True)
-    ingredients = models.ManyToManyField('Ingredient', blank=True)
+    tags = models.ManyToManyField('Tag', blank=True, through='RecipeTag')
+    ingredients = models.ManyToManyField('Ingredient', blank=True, through='RecipeIngredient')
+    # Also set when the links change, see `recipe_api.sync`.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        # One per ordering of the recipes list, ranges and orderings are index scans.
+        indexes = [
+            models.Index(fields=['user', 'id'], name='recipe_user_id_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_idx'),
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='recipe_user_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class RecipeTag(models.Model):
+    """Link of a tag to a recipe, the through model of `Recipe.tags`."""
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    tag = models.ForeignKey('Tag', on_delete=models.CASCADE)
+
+    class Meta:
+        # The table of the former implicit through model, kept with its data.
+        db_table = 'recipe_api_recipe_tags'
+        unique_together = [('recipe', 'tag')]
+        indexes = [
+            # Reverse lookups read the recipe ids from the index only.
+            models.Index(fields=['tag', 'recipe'], name='recipetag_tag_recipe_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.tag_id}'
+
+
+class RecipeIngredient(models.Model):
+    """Quantity of an ingredient in a recipe, the through model of `Recipe.ingredients`.
+
+    Units are normalized to grams, milliliters or pieces when aggregated, see
+    `recipe_api.shopping`.
+    """
+    UNITS = (
+        ('g', 'Grams'),
+        ('kg', 'Kilograms'),
+        ('oz', 'Ounces'),
+        ('lb', 'Pounds'),
+        ('ml', 'Milliliters'),
+        ('l', 'Liters'),
+        ('tsp', 'Teaspoons'),
+        ('tbsp', 'Tablespoons'),
+        ('cup', 'Cups'),
+        ('pc', 'Pieces'),
+    )
+
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE)
+    ingredient = models.ForeignKey('Ingredient', on_delete=models.CASCADE)
+    quantity = models.DecimalField(max_digits=10, decimal_places=3, null=True, blank=True)
+    unit = models.CharField(max_length=8, choices=UNITS, blank=True)
+
+    class Meta:
+        # The table of the former implicit through model, kept with its data.
+        db_table = 'recipe_api_recipe_ingredients'
+        unique_together = [('recipe', 'ingredient')]
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'], name='recipeingr_ingr_recipe_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.quantity or ""} {self.unit} {self.ingredient_id}'.strip()
+
+
+class Tag(AtomicSaveModel):
     """Tags for recipes object."""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     name = models.CharField(max_length=255)
+    recipe_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Names are normalized on save, see `recipe_api.names`.
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_tag_user_name'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'], name='tag_user_count_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='tag_user_updated_idx'),
+        ]
+
+    @staticmethod
+    def normalize_name(name):
+        return str(name).lower().replace(' ', '-')
 
     def save(self, *args, **kwargs):
-        self.name = str(self.name).lower().replace(' ', '-')
-        return super(Tag, self).save(*args, **kwargs)
+        self.name = self.normalize_name(self.name)
+        return super(Tag, self).save(*args, **_keep_recipe_count(self, kwargs))
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(AtomicSaveModel):
     """Tags for recipes object."""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     name = models.CharField(max_length=255)
+    recipe_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = UserShardQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Names are normalized on save, see `recipe_api.names`.
+            models.UniqueConstraint(fields=['user', 'name'], name='unique_ingredient_user_name'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'recipe_count'], name='ingredient_user_count_idx'),
+            models.Index(fields=['user', 'updated_at', 'id'], name='ingredient_user_updated_idx'),
+        ]
+
+    @staticmethod
+    def normalize_name(name):
+        return str(name).capitalize()
 
     def save(self, *args, **kwargs):
-        self.name = str(self.name).capitalize()
-        return super(Ingredient, self).save(*args, **kwargs)
+        self.name = self.normalize_name(self.name)
+        return super(Ingredient, self).save(*args, **_keep_recipe_count(self, kwargs))
 
     def __str__(self):
         return self.name
+
+
+class RecipeStat(models.Model):
+    """Summary row of the recipes of a user, maintained incrementally.
+
+    Each user has one row for all the recipes, one per price bucket, one per
+    tag and one per ingredient, see `recipe_api.stats`.
+    """
+    ALL = 'all'
+    PRICE = 'price'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    DIMENSIONS = (
+        (ALL, 'All recipes'),
+        (PRICE, 'Price bucket'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
+    dimension = models.CharField(max_length=16, choices=DIMENSIONS)
+    key = models.BigIntegerField(default=0)
+    recipe_count = models.IntegerField(default=0)
+    total_time_minutes = models.BigIntegerField(default=0)
+    total_price = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Only on the row of all the recipes, bumped when the similarities of the user change, see `recipe_api.similarity`.
+    similarity_version = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'dimension', 'key'], name='unique_recipe_stat'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} {self.dimension}:{self.key}'
+
+
+class Tombstone(models.Model):
+    """Deleted recipe, tag or ingredient, kept for the delta sync, see `recipe_api.sync`.
+
+    Rows are removed after `SYNC_TOMBSTONE_RETENTION` by `manage.py prune_tombstones`.
+    """
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    INGREDIENT = 'ingredient'
+    MODELS = (
+        (RECIPE, 'Recipe'),
+        (TAG, 'Tag'),
+        (INGREDIENT, 'Ingredient'),
+    )
+
+    # No constraint: deleting a user writes tombstones of its cascaded rows after the
+    # cascade was collected. Tombstones of deleted users are pruned with the others.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    model = models.CharField(max_length=16, choices=MODELS)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at', 'id'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
@@ -0,0 +1,45 @@
+"""
+Tags and ingredients of a user looked up by name, created when missing.
+
+Names are normalized like `Tag.save` and `Ingredient.save`. The missing
+rows are created in one batch, without `save`, and recorded in the outbox
+in the same batch. Lookups of a user and model hold a transaction-level
+advisory lock on PostgreSQL, which the tag and ingredient endpoints also
+take, so concurrent writers do not create a name twice; SQLite runs one
+writer at a time. A unique constraint on (user, name) backs the lock.
+"""
+import zlib
+
+from django.db import connections, transaction
+
+from core import outbox
+from core.models import OutboxEvent
+from core.sharding import lock_user
+
+
+def lock(model, user, using):
+    """Serialize the creators of rows of the user until the end of the transaction."""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        key = zlib.crc32(f'{model._meta.label}:{user.pk}'.encode())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [key])
+
+
+def get_or_create(model, user, names, using='default'):
+    """Returns the rows of the user with the names, in order and without duplicates."""
+    names = list(dict.fromkeys(model.normalize_name(name) for name in names))
+    if not names:
+        return []
+    with transaction.atomic(using=using):
+        lock_user(user.pk, using)
+        lock(model, user, using)
+        rows = {}
+        for row in model.objects.using(using).filter(user=user, name__in=names).order_by('pk'):
+            rows.setdefault(row.name, row)
+        created = model.objects.using(using).bulk_create(
+            [model(user=user, name=name) for name in names if name not in rows],
+        )
+        outbox.record_many(model, OutboxEvent.CREATED, [outbox.payload(row) for row in created], using)
+    rows.update((row.name, row) for row in created)
+    return [rows[name] for name in names]
@@ -0,0 +1,52 @@
+"""
+Pantry search: recipes cookable with the ingredients a user has on hand.
+
+Set containment is answered by the link table, used as an inverted index
+from ingredient to recipes: the recipes using at least one pantry
+ingredient are found through the ingredient index, then grouped by recipe
+to count their pantry and total ingredients in the same query. The cost
+follows the number of links of the pantry ingredients, not the number of
+recipes.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+
+from .models import Recipe
+
+INGREDIENT_LINKS = Recipe.ingredients.through
+
+
+def coverage(user, ingredient_ids, max_missing, using='default'):
+    """Returns {recipe_id: (have, total)} of the user's recipes missing at most `max_missing` ingredients."""
+    if not ingredient_ids:
+        return {}
+    links = INGREDIENT_LINKS.objects.using(using)
+    candidates = links.filter(ingredient_id__in=ingredient_ids, recipe__user_id=user.pk).values('recipe_id')
+    rows = links.filter(recipe_id__in=candidates).order_by().values('recipe_id').annotate(
+        total=Count('pk'),
+        have=Count('pk', filter=Q(ingredient_id__in=ingredient_ids)),
+    ).filter(total__lte=F('have') + max_missing)
+    return {row['recipe_id']: (row['have'], row['total']) for row in rows}
+
+
+def cookable_recipes(user, ingredient_ids, max_missing, using='default'):
+    """Returns the recipes with `missing`, `coverage` and `missing_ingredients`, best covered first."""
+    ingredient_ids = set(ingredient_ids)
+    counts = coverage(user, ingredient_ids, max_missing, using)
+    missing = defaultdict(list)
+    partial = [recipe_id for recipe_id, (have, total) in counts.items() if have < total]
+    if partial:
+        links = INGREDIENT_LINKS.objects.using(using).filter(recipe_id__in=partial).exclude(
+            ingredient_id__in=ingredient_ids,
+        ).order_by('ingredient_id').values_list('recipe_id', 'ingredient_id')
+        for recipe_id, ingredient_id in links:
+            missing[recipe_id].append(ingredient_id)
+
+    recipes = list(Recipe.objects.using(using).filter(pk__in=counts))
+    for recipe in recipes:
+        have, total = counts[recipe.pk]
+        recipe.missing = total - have
+        recipe.coverage = round(have / total, 4)
+        recipe.missing_ingredients = missing[recipe.pk]
+    return sorted(recipes, key=lambda recipe: (recipe.missing, -recipe.coverage, -recipe.pk))
@@ -1,12 +1,86 @@
 """
 Serializer for recipe_api.
 """
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+
 from rest_framework import serializers
-from .models import Recipe, Tag, Ingredient
+from rest_framework.relations import MANY_RELATION_KWARGS
+from . import links, names, sync
+from .models import Recipe, RecipeIngredient, Tag, Ingredient, Tombstone
 
+from core.sharding import lock_user, shard_for
 from user_api.serializers import UserSerializer
 
 
+class UserShardManyRelatedField(serializers.ManyRelatedField):
+    """Resolves the whole list of ids with one query and reports every unknown id at once.
+
+    The rows found are the validated value, saved as links without being
+    read again.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Invalid pks "{pk_values}" - objects do not exist.',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        queryset = self.child_relation.get_queryset()
+        pks = []
+        for item in data:
+            try:
+                if isinstance(item, bool):
+                    raise TypeError
+                pks.append(queryset.model._meta.pk.to_python(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                self.child_relation.fail('incorrect_type', data_type=type(item).__name__)
+        rows = queryset.in_bulk(set(pks))
+        missing = [pk for pk in dict.fromkeys(pks) if pk not in rows]
+        if missing:
+            self.fail('does_not_exist', pk_values=', '.join(map(str, missing)))
+        return [rows[pk] for pk in pks]
+
+
+class UserShardPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Looks the related rows up among the rows of the user of the request, on their shard.
+
+    See `core.sharding`, the rows of other users are reported missing.
+    """
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserShardManyRelatedField(**list_kwargs)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            queryset = queryset.using(shard_for(request.user)).filter(user=request.user)
+        return queryset
+
+    def to_internal_value(self, data):
+        rows = getattr(self, 'resolved', None)
+        if rows is None:
+            return super().to_internal_value(data)
+        # Resolved by the list of the parent, see `RecipeIngredientListSerializer`.
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            return rows[self.get_queryset().model._meta.pk.to_python(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
 class IngredientSerializer(serializers.ModelSerializer):
     user = UserSerializer(many=False, read_only=True)
 
@@ -32,27 +106,184 @@ class RecipeSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class RecipeSimilarSerializer(RecipeSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('similarity',)
+
+
+class RecipePantrySerializer(RecipeSerializer):
+    missing = serializers.IntegerField(read_only=True)
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('missing', 'coverage', 'missing_ingredients',)
+
+
+class PantrySearchSerializer(serializers.Serializer):
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(), max_length=settings.PANTRY_MAX_INGREDIENTS,
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, max_value=settings.PANTRY_MAX_MISSING, default=settings.PANTRY_MAX_MISSING,
+    )
+
+
+class RecipeIngredientListSerializer(serializers.ListSerializer):
+    """Resolves the ingredients of the whole list with one query before validating the items."""
+
+    def to_internal_value(self, data):
+        field = self.child.fields['ingredient']
+        queryset = field.get_queryset()
+        pks = set()
+        if isinstance(data, list):
+            for item in data:
+                try:
+                    pks.add(queryset.model._meta.pk.to_python(item['ingredient']))
+                except (TypeError, KeyError, ValueError, DjangoValidationError):
+                    # Reported by the item.
+                    pass
+        field.resolved = queryset.in_bulk(pks)
+        try:
+            return super().to_internal_value(data)
+        finally:
+            field.resolved = None
+
+
+class RecipeIngredientSerializer(serializers.ModelSerializer):
+    ingredient = UserShardPrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('ingredient', 'quantity', 'unit',)
+        list_serializer_class = RecipeIngredientListSerializer
+
+
 class RecipeDetailSerializer(serializers.ModelSerializer):
     user = UserSerializer(many=False, read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = IngredientSerializer(many=True, read_only=True)
+    ingredient_amounts = RecipeIngredientSerializer(source='recipeingredient_set', many=True, read_only=True)
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'time_minutes', 'price', 'link', 'user', 'description', 'tags', 'ingredients',)
+        fields = (
+            'id', 'title', 'time_minutes', 'price', 'link', 'user', 'description', 'tags', 'ingredients',
+            'ingredient_amounts',
+        )
         read_only_fields = ('id',)
 
 
+class RecipeCompoundSerializer(serializers.ModelSerializer):
+    """Recipe referencing its user, tags and ingredients by id, see `recipe_api.compound`."""
+    ingredient_amounts = RecipeIngredientSerializer(source='recipeingredient_set', many=True, read_only=True)
+
+    class Meta:
+        model = Recipe
+        fields = RecipeDetailSerializer.Meta.fields
+        read_only_fields = fields
+
+
+class TagCompoundSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ('id', 'name', 'user',)
+        read_only_fields = fields
+
+
+class IngredientCompoundSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Ingredient
+        fields = ('id', 'name', 'user',)
+        read_only_fields = fields
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     user = UserSerializer(many=False, read_only=True)
-    tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all(), required=False)
-    ingredients = serializers.PrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all(), required=False)
+    tags = UserShardPrimaryKeyRelatedField(many=True, queryset=Tag.objects.all(), required=False)
+    ingredients = UserShardPrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all(), required=False)
+    ingredient_amounts = RecipeIngredientSerializer(source='recipeingredient_set', many=True, required=False)
+    # Linked along with `tags` and `ingredients`, created when the user has none with the name.
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False,
+        max_length=settings.RECIPE_MAX_NAMES,
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255), write_only=True, required=False,
+        max_length=settings.RECIPE_MAX_NAMES,
+    )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'title', 'time_minutes', 'price', 'link', 'user', 'description', 'tags', 'ingredients',)
+        fields = (
+            'id', 'title', 'time_minutes', 'price', 'link', 'user', 'description', 'tags', 'ingredients',
+            'ingredient_amounts', 'tag_names', 'ingredient_names',
+        )
         read_only_fields = ('id',)
 
+    def _add_named(self, validated_data, user, using, instance=None):
+        """Add the rows named in `tag_names` and `ingredient_names` to `tags` and `ingredients`."""
+        for field, names_field, model in (('tags', 'tag_names', Tag), ('ingredients', 'ingredient_names', Ingredient)):
+            field_names = validated_data.pop(names_field, None)
+            if not field_names:
+                continue
+            if field in validated_data:
+                rows = list(validated_data[field])
+            else:
+                rows = list(getattr(instance, field).all()) if instance is not None else []
+            rows += [row for row in names.get_or_create(model, user, field_names, using) if row not in rows]
+            validated_data[field] = rows
+
+    def _set_amounts(self, recipe, amounts):
+        """Link the ingredients with their quantities, updating the ones already linked."""
+        linked = {link.ingredient_id: link for link in recipe.recipeingredient_set.all()}
+        changed = []
+        # Ingredients to link by their quantity, the first amount of an ingredient wins.
+        added, groups = set(), {}
+        for amount in amounts:
+            ingredient = amount.pop('ingredient')
+            link = linked.get(ingredient.pk)
+            if link is None:
+                if ingredient.pk not in added:
+                    added.add(ingredient.pk)
+                    groups.setdefault(tuple(sorted(amount.items())), []).append(ingredient)
+            elif any(getattr(link, name) != value for name, value in amount.items()):
+                for name, value in amount.items():
+                    setattr(link, name, value)
+                changed.append(link)
+        for amount, ingredients in groups.items():
+            # Through `add` so the link signals maintain the counters.
+            recipe.ingredients.add(*ingredients, through_defaults=dict(amount))
+        if changed:
+            using = recipe._state.db
+            RecipeIngredient.objects.using(using).bulk_update(changed, ['quantity', 'unit'])
+            # Quantities are part of the recipe for the sync and the outbox, like its links.
+            sync.touch(using, [recipe.pk])
+
+    def create(self, validated_data):
+        amounts = validated_data.pop('recipeingredient_set', [])
+        using = shard_for(validated_data['user'])
+        with transaction.atomic(using=using):
+            lock_user(validated_data['user'].pk, using)
+            self._add_named(validated_data, validated_data['user'], using)
+            recipe = super().create(validated_data)
+            self._set_amounts(recipe, amounts)
+        return recipe
+
+    def update(self, instance, validated_data):
+        amounts = validated_data.pop('recipeingredient_set', [])
+        using = instance._state.db
+        with transaction.atomic(using=using):
+            lock_user(instance.user_id, using)
+            # Link changes of the recipe wait for each other, see `recipe_api.links`.
+            links.lock_recipes([instance.pk], using)
+            self._add_named(validated_data, instance.user, using, instance)
+            recipe = super().update(instance, validated_data)
+            self._set_amounts(recipe, amounts)
+        return recipe
+
 
 class RecipeImageSerializer(serializers.ModelSerializer):
     class Meta:
@@ -60,3 +291,86 @@ class RecipeImageSerializer(serializers.ModelSerializer):
         fields = ('id', 'thumbnail',)
         read_only_fields = ('id',)
         extra_kwargs = {'thumbnail': {'required': 'True'}}
+
+
+class RecipeStatSerializer(serializers.Serializer):
+    recipe_count = serializers.IntegerField()
+    average_time_minutes = serializers.FloatField()
+    average_price = serializers.DecimalField(max_digits=8, decimal_places=2)
+
+
+class RecipePriceBucketStatSerializer(RecipeStatSerializer):
+    bucket = serializers.CharField()
+
+
+class RecipeAttrStatSerializer(RecipeStatSerializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class RecipeStatsSerializer(RecipeStatSerializer):
+    price_buckets = RecipePriceBucketStatSerializer(many=True)
+    tags = RecipeAttrStatSerializer(many=True)
+    ingredients = RecipeAttrStatSerializer(many=True)
+
+
+class ShoppingListRequestSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.SHOPPING_LIST_MAX_RECIPES,
+    )
+
+
+class ShoppingListItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    quantity = serializers.DecimalField(max_digits=16, decimal_places=3, allow_null=True)
+    unit = serializers.CharField(allow_blank=True)
+    recipe_count = serializers.IntegerField()
+
+
+class RecipeLinksSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.RECIPE_LINKS_MAX_IDS,
+    )
+
+
+class BulkRecipeLinksSerializer(RecipeLinksSerializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=settings.RECIPE_LINKS_MAX_RECIPES,
+    )
+
+
+class SyncTagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ('id', 'name', 'updated_at',)
+
+
+class SyncIngredientSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Ingredient
+        fields = ('id', 'name', 'updated_at',)
+
+
+class SyncRecipeSerializer(RecipeSerializer):
+    tags = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+    ingredient_amounts = RecipeIngredientSerializer(source='recipeingredient_set', many=True, read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('description', 'tags', 'ingredient_amounts', 'updated_at',)
+
+
+class TombstoneSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tombstone
+        fields = ('model', 'object_id', 'deleted_at',)
+
+
+class SyncSerializer(serializers.Serializer):
+    token = serializers.CharField()
+    has_more = serializers.BooleanField()
+    reset = serializers.BooleanField()
+    tags = SyncTagSerializer(many=True)
+    ingredients = SyncIngredientSerializer(many=True)
+    recipes = SyncRecipeSerializer(many=True)
+    deleted = TombstoneSerializer(many=True)
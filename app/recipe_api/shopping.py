@@ -0,0 +1,67 @@
+"""
+Shopping list of a set of recipes.
+
+Quantities are converted to a base unit and summed by ingredient with one
+GROUP BY on `RecipeIngredient`, whatever the number of recipes.
+"""
+from collections import Counter
+from decimal import Decimal
+
+from django.db.models import Case, CharField, Count, DecimalField, F, Sum, Value, When
+
+from .models import RecipeIngredient
+
+# unit: (base unit, factor to the base unit)
+BASE_UNITS = {
+    'g': ('g', Decimal('1')),
+    'kg': ('g', Decimal('1000')),
+    'oz': ('g', Decimal('28.3495')),
+    'lb': ('g', Decimal('453.592')),
+    'ml': ('ml', Decimal('1')),
+    'l': ('ml', Decimal('1000')),
+    'tsp': ('ml', Decimal('4.92892')),
+    'tbsp': ('ml', Decimal('14.7868')),
+    'cup': ('ml', Decimal('236.588')),
+    'pc': ('pc', Decimal('1')),
+}
+
+QUANTITY = DecimalField(max_digits=16, decimal_places=3)
+
+
+def shopping_list(user, recipe_ids, using='default'):
+    """Returns the merged ingredients of the user's recipes, a recipe listed twice counts twice.
+
+    Quantities in units of different kinds (mass, volume, pieces) are not
+    convertible and stay on separate lines.
+    """
+    servings = Counter(recipe_ids)
+    base_unit = Case(
+        *[When(unit=unit, then=Value(base)) for unit, (base, _) in BASE_UNITS.items()],
+        default=Value(''), output_field=CharField(),
+    )
+    factor = Case(
+        *[When(unit=unit, then=Value(factor)) for unit, (_, factor) in BASE_UNITS.items() if factor != 1],
+        default=Value(Decimal('1')), output_field=QUANTITY,
+    )
+    quantity = F('quantity') * factor
+    if any(count > 1 for count in servings.values()):
+        quantity = quantity * Case(
+            *[When(recipe_id=recipe_id, then=Value(count)) for recipe_id, count in servings.items() if count > 1],
+            default=Value(1),
+        )
+    rows = RecipeIngredient.objects.using(using).filter(
+        recipe_id__in=servings, recipe__user_id=user.pk,
+    ).annotate(base_unit=base_unit).values('ingredient_id', 'ingredient__name', 'base_unit').annotate(
+        quantity=Sum(quantity, output_field=QUANTITY),
+        recipe_count=Count('recipe_id', distinct=True),
+    ).order_by('ingredient__name', 'base_unit')
+    return [
+        {
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'quantity': None if row['quantity'] is None else Decimal(row['quantity']).quantize(Decimal('0.001')),
+            'unit': row['base_unit'],
+            'recipe_count': row['recipe_count'],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,133 @@
+"""
+Signal receivers maintaining the derived data of recipe_api.
+"""
+from decimal import Decimal
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import outbox
+from core.models import OutboxEvent
+
+from . import counters, similarity, stats, sync
+from .links import LINK_FIELDS, links_changed
+from .models import Recipe, RecipeIngredient, RecipeStat, Tag, Ingredient, Tombstone
+
+TOMBSTONE_MODELS = {
+    Recipe: Tombstone.RECIPE,
+    Tag: Tombstone.TAG,
+    Ingredient: Tombstone.INGREDIENT,
+}
+
+
+def _recipe_values(recipe):
+    return recipe.user_id, int(recipe.time_minutes), Decimal(str(recipe.price))
+
+
+def _recipe_links(using, recipe_id):
+    """Returns the tag ids and ingredient ids of a recipe."""
+    return [
+        list(through.objects.using(using).filter(recipe_id=recipe_id).values_list(field, flat=True))
+        for through, (field, _, _) in LINK_FIELDS.items()
+    ]
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_recipe_values(sender, instance, using, **kwargs):
+    """Keep the stored values of an updated recipe to compute its deltas."""
+    instance._stored_values = None
+    if instance.pk is not None and not instance._state.adding:
+        instance._stored_values = Recipe.objects.using(using).filter(pk=instance.pk).values_list(
+            'user_id', 'time_minutes', 'price',
+        ).first()
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, raw, using, **kwargs):
+    """Add a new recipe to the statistics, or move an updated one."""
+    if raw:
+        return
+    deltas = stats.StatDeltas()
+    stored, values = getattr(instance, '_stored_values', None), _recipe_values(instance)
+    if stored is None:
+        deltas.add(1, *values)
+    elif stored != values:
+        tag_ids, ingredient_ids = _recipe_links(using, instance.pk)
+        deltas.add(-1, *stored, tag_ids, ingredient_ids)
+        deltas.add(1, *values, tag_ids, ingredient_ids)
+    deltas.apply(using)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(sender, instance, using, **kwargs):
+    """Remove a recipe and its links from the statistics, the counters and the similarities."""
+    tag_ids, ingredient_ids = _recipe_links(using, instance.pk)
+    deltas = stats.StatDeltas()
+    deltas.add(-1, *_recipe_values(instance), tag_ids, ingredient_ids)
+    deltas.apply(using)
+    counters.adjust(Tag, using, tag_ids, -1)
+    counters.adjust(Ingredient, using, ingredient_ids, -1)
+    similarity.bump(using, [instance.user_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set, using, **kwargs):
+    """Count added links after the insert and removed links before the delete."""
+    field = LINK_FIELDS[sender][0]
+    source, target = (field, 'recipe_id') if reverse else ('recipe_id', field)
+    if action == 'post_add':
+        links, sign = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set], 1
+    elif action in ('pre_remove', 'pre_clear'):
+        # Removed ids may not be linked, only the stored links are counted.
+        links, sign = sender.objects.using(using).filter(**{source: instance.pk}), -1
+        if action == 'pre_remove':
+            links = links.filter(**{f'{target}__in': pk_set})
+        links = list(links.values_list('recipe_id', field))
+    else:
+        return
+    links_changed(sender, using, links, sign)
+
+
+@receiver(post_save, sender=RecipeIngredient)
+def recipe_amount_saved(sender, instance, created, raw, using, **kwargs):
+    """Mark the recipe changed when the quantity of one of its ingredients is saved."""
+    if not raw:
+        sync.touch(using, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def recipe_attr_deleted(sender, instance, using, **kwargs):
+    """Drop the summary rows of a deleted tag or ingredient and touch the recipes losing it."""
+    dimension = RecipeStat.TAG if sender is Tag else RecipeStat.INGREDIENT
+    RecipeStat.objects.using(using).filter(dimension=dimension, key=instance.pk).delete()
+    # Their links are deleted with it, which changes their similarities, see `recipe_api.similarity`.
+    Recipe.objects.using(using).filter(**{f'{dimension}s': instance}).update(updated_at=timezone.now())
+    similarity.bump(using, [instance.user_id])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def record_saved(sender, instance, created, raw, using, **kwargs):
+    """Record the change in the outbox, in the transaction of the save."""
+    if not raw:
+        outbox.record(instance, OutboxEvent.CREATED if created else OutboxEvent.UPDATED, using)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def record_deleted(sender, instance, using, **kwargs):
+    """Record the deletion in the outbox, in the transaction of the delete."""
+    outbox.record(instance, OutboxEvent.DELETED, using)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def write_tombstone(sender, instance, using, **kwargs):
+    """Keep the deletion for the clients syncing the changes."""
+    Tombstone.objects.using(using).create(user_id=instance.user_id, model=TOMBSTONE_MODELS[sender], object_id=instance.pk)
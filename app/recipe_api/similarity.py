@@ -0,0 +1,113 @@
+"""
+Similar recipes by weighted Jaccard similarity over tags and ingredients.
+
+The link tables are an inverted index of the sparse recipe x feature
+matrix: the overlap of a recipe with every other recipe of its user is one
+GROUP BY over the links of its own features, so only recipes sharing at
+least one feature are read.
+
+Results are cached per recipe under the `similarity_version` of the
+summary row of all the recipes of its user, a counter bumped by `bump` in
+the transaction of every change of links (`recipe_api.sync.touch`) and of
+every deletion of recipes, tags or ingredients: reading it is one lookup
+of that row, a change makes the cached results of all the recipes of the
+user stale, in every process, without invalidating entries. The version
+holds the user, recipe ids of different shards do not share entries.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F
+
+from .models import Recipe, RecipeStat
+
+TAG_LINKS = Recipe.tags.through
+INGREDIENT_LINKS = Recipe.ingredients.through
+
+
+def version(recipe):
+    """Returns the version of the similarities of the user of the recipe."""
+    counter = RecipeStat.objects.using(recipe._state.db).filter(
+        user_id=recipe.user_id, dimension=RecipeStat.ALL, key=0,
+    ).values_list('similarity_version', flat=True).first()
+    return f'{recipe.user_id}.{counter or 0}'
+
+
+def bump(using, user_ids):
+    """Make the cached similarities of the users stale, `user_ids` can be a subquery."""
+    RecipeStat.objects.using(using).filter(user_id__in=user_ids, dimension=RecipeStat.ALL, key=0).update(
+        similarity_version=F('similarity_version') + 1,
+    )
+
+
+def cache_key(recipe_id, version):
+    return f'recipe-similar:{recipe_id}:{version}'
+
+
+def _overlaps(links, field, recipe, feature_ids):
+    """Returns {recipe_id: shared features} for the other recipes of the user."""
+    if not feature_ids:
+        return {}
+    return dict(
+        links.objects.using(recipe._state.db).filter(
+            **{f'{field}__in': feature_ids}, recipe__user_id=recipe.user_id,
+        ).exclude(recipe_id=recipe.pk).order_by().values('recipe_id').annotate(
+            shared=Count('pk'),
+        ).values_list('recipe_id', 'shared')
+    )
+
+
+def _sizes(links, recipe_ids, using):
+    """Returns {recipe_id: number of features}."""
+    return dict(
+        links.objects.using(using).filter(recipe_id__in=recipe_ids).order_by().values('recipe_id').annotate(
+            size=Count('pk'),
+        ).values_list('recipe_id', 'size')
+    )
+
+
+def compute(recipe):
+    """Returns [(recipe_id, score)] of the most similar recipes, best first."""
+    using = recipe._state.db
+    tag_ids = list(TAG_LINKS.objects.using(using).filter(recipe_id=recipe.pk).values_list('tag_id', flat=True))
+    ingredient_ids = list(
+        INGREDIENT_LINKS.objects.using(using).filter(recipe_id=recipe.pk).values_list('ingredient_id', flat=True)
+    )
+    shared_tags = _overlaps(TAG_LINKS, 'tag_id', recipe, tag_ids)
+    shared_ingredients = _overlaps(INGREDIENT_LINKS, 'ingredient_id', recipe, ingredient_ids)
+    candidates = set(shared_tags) | set(shared_ingredients)
+    if not candidates:
+        return []
+
+    # The candidates may have features of a kind the recipe has none of, they count in the union.
+    tag_sizes = _sizes(TAG_LINKS, candidates, using)
+    ingredient_sizes = _sizes(INGREDIENT_LINKS, candidates, using)
+    tag_weight, ingredient_weight = settings.SIMILAR_RECIPES_TAG_WEIGHT, settings.SIMILAR_RECIPES_INGREDIENT_WEIGHT
+    scores = []
+    for candidate in candidates:
+        tags, ingredients = shared_tags.get(candidate, 0), shared_ingredients.get(candidate, 0)
+        intersection = tag_weight * tags + ingredient_weight * ingredients
+        tag_union = len(tag_ids) + tag_sizes.get(candidate, 0) - tags
+        ingredient_union = len(ingredient_ids) + ingredient_sizes.get(candidate, 0) - ingredients
+        union = tag_weight * tag_union + ingredient_weight * ingredient_union
+        scores.append((candidate, round(intersection / union, 4)))
+    scores.sort(key=lambda score: (-score[1], -score[0]))
+    return scores[:settings.SIMILAR_RECIPES_MAX]
+
+
+def cached_scores(recipe):
+    """Returns the result of `compute` for the recipe, cached."""
+    key = cache_key(recipe.pk, version(recipe))
+    scores = cache.get(key)
+    if scores is None:
+        scores = compute(recipe)
+        cache.set(key, scores, settings.SIMILAR_RECIPES_CACHE_TIMEOUT)
+    return scores
+
+
+def similar_recipes(recipe, k):
+    """Returns the top `k` similar recipes with their `similarity` attribute, cached."""
+    scores = dict(cached_scores(recipe)[:k])
+    recipes = Recipe.objects.using(recipe._state.db).filter(pk__in=scores, user_id=recipe.user_id)
+    for similar in recipes:
+        similar.similarity = scores[similar.pk]
+    return sorted(recipes, key=lambda similar: (-similar.similarity, -similar.pk))
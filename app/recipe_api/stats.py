@@ -0,0 +1,172 @@
+"""
+Recipe statistics kept in `RecipeStat` summary rows.
+
+Signals in `recipe_api.signals` apply the delta of every recipe write to the
+rows of its user, `rebuild` recomputes them from scratch.
+"""
+import bisect
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+
+from .models import Recipe, RecipeStat, Tag, Ingredient
+
+PRICE_BUCKETS = (Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50'))
+
+
+def price_bucket(price):
+    """Returns the index of the price bucket."""
+    return bisect.bisect_right(PRICE_BUCKETS, price)
+
+
+def price_bucket_label(index):
+    if index == len(PRICE_BUCKETS):
+        return f'{PRICE_BUCKETS[-1]}+'
+    low = PRICE_BUCKETS[index - 1] if index else 0
+    return f'{low}-{PRICE_BUCKETS[index]}'
+
+
+class StatDeltas(defaultdict):
+    """Pending changes of summary rows by (user_id, dimension, key)."""
+
+    def __init__(self):
+        super().__init__(lambda: [0, 0, Decimal(0)])
+
+    def add(self, sign, user_id, time_minutes, price, tag_ids=(), ingredient_ids=()):
+        """Add (sign=1) or remove (sign=-1) the contribution of a recipe."""
+        keys = [(RecipeStat.ALL, 0), (RecipeStat.PRICE, price_bucket(price))]
+        keys += [(RecipeStat.TAG, tag_id) for tag_id in tag_ids]
+        keys += [(RecipeStat.INGREDIENT, ingredient_id) for ingredient_id in ingredient_ids]
+        for dimension, key in keys:
+            self.add_row(sign, user_id, dimension, key, time_minutes, price)
+
+    def add_row(self, sign, user_id, dimension, key, time_minutes, price):
+        delta = self[(user_id, dimension, key)]
+        delta[0] += sign
+        delta[1] += sign * time_minutes
+        delta[2] += sign * price
+
+    def apply(self, using):
+        """Write the pending changes with atomic increments, one UPDATE per distinct change of a dimension."""
+        groups = defaultdict(list)
+        for (user_id, dimension, key), (count, time_minutes, price) in self.items():
+            if count or time_minutes or price:
+                groups[(user_id, dimension, count, time_minutes, price)].append(key)
+        for (user_id, dimension, count, time_minutes, price), keys in groups.items():
+            rows = RecipeStat.objects.using(using).filter(user_id=user_id, dimension=dimension)
+            changes = {
+                'recipe_count': F('recipe_count') + count,
+                'total_time_minutes': F('total_time_minutes') + time_minutes,
+                'total_price': F('total_price') + price,
+            }
+            if len(keys) > 1:
+                with transaction.atomic(using=using):
+                    # Removals from missing rows mean the rows are stale, `rebuild` fixes them.
+                    if rows.filter(key__in=keys).update(**changes) == len(keys) or count <= 0:
+                        continue
+                    # Some rows are missing, the keys are applied one by one.
+                    transaction.set_rollback(True, using=using)
+            for key in keys:
+                self._apply_row(
+                    rows.filter(key=key), changes, user_id=user_id, dimension=dimension, key=key,
+                    recipe_count=count, total_time_minutes=time_minutes, total_price=price,
+                )
+
+    @staticmethod
+    def _apply_row(rows, changes, **values):
+        if rows.update(**changes) or values['recipe_count'] <= 0:
+            return
+        try:
+            with transaction.atomic(using=rows.db):
+                RecipeStat.objects.using(rows.db).create(**values)
+        except IntegrityError:  # Created concurrently
+            rows.update(**changes)
+
+
+def links_changed(using, dimension, links, sign):
+    """Apply added (sign=1) or removed (sign=-1) (recipe_id, tag or ingredient id) links."""
+    if not links:
+        return
+    recipes = Recipe.objects.using(using).filter(
+        pk__in={recipe_id for recipe_id, _ in links},
+    ).values_list('pk', 'user_id', 'time_minutes', 'price')
+    recipes = {pk: values for pk, *values in recipes}
+    deltas = StatDeltas()
+    for recipe_id, key in links:
+        user_id, time_minutes, price = recipes[recipe_id]
+        deltas.add_row(sign, user_id, dimension, key, time_minutes, price)
+    deltas.apply(using)
+
+
+def rebuild(using='default', user_ids=None):
+    """Recompute the summary rows of the given users, or of everyone."""
+    recipes = Recipe.objects.using(using)
+    stats = RecipeStat.objects.using(using)
+    tag_links = Recipe.tags.through.objects.using(using)
+    ingredient_links = Recipe.ingredients.through.objects.using(using)
+    if user_ids is not None:
+        recipes = recipes.filter(user_id__in=user_ids)
+        stats = stats.filter(user_id__in=user_ids)
+        tag_links = tag_links.filter(recipe__user_id__in=user_ids)
+        ingredient_links = ingredient_links.filter(recipe__user_id__in=user_ids)
+
+    bucket = Case(
+        *[When(price__lt=bound, then=index) for index, bound in enumerate(PRICE_BUCKETS)],
+        default=len(PRICE_BUCKETS),
+        output_field=IntegerField(),
+    )
+    totals = {'recipe_count': Count('pk'), 'total_time_minutes': Sum('time_minutes'), 'total_price': Sum('price')}
+    link_totals = {
+        'recipe_count': Count('recipe_id'),
+        'total_time_minutes': Sum('recipe__time_minutes'),
+        'total_price': Sum('recipe__price'),
+    }
+    groups = (
+        (RecipeStat.ALL, recipes.values('user_id').annotate(key=Value(0, IntegerField()), **totals)),
+        (RecipeStat.PRICE, recipes.annotate(key=bucket).values('user_id', 'key').annotate(**totals)),
+        (RecipeStat.TAG, tag_links.values(user_id=F('recipe__user_id'), key=F('tag_id')).annotate(**link_totals)),
+        (RecipeStat.INGREDIENT, ingredient_links.values(user_id=F('recipe__user_id'), key=F('ingredient_id')).annotate(**link_totals)),
+    )
+    with transaction.atomic(using=using):
+        # The similarity versions go on past the rebuild, see `recipe_api.similarity`.
+        versions = dict(stats.filter(dimension=RecipeStat.ALL).values_list('user_id', 'similarity_version'))
+        stats.delete()
+        rows = [RecipeStat(dimension=dimension, **row) for dimension, rows in groups for row in rows.order_by()]
+        for row in rows:
+            if row.dimension == RecipeStat.ALL:
+                row.similarity_version = versions.get(row.user_id, 0) + 1
+        RecipeStat.objects.using(using).bulk_create(rows, batch_size=1000)
+
+
+def summary(user, using='default'):
+    """Returns the statistics of a user from its summary rows."""
+    def averages(row):
+        count = row.recipe_count or 1
+        return {
+            'recipe_count': row.recipe_count,
+            'average_time_minutes': round(row.total_time_minutes / count, 2),
+            'average_price': (Decimal(row.total_price) / count).quantize(Decimal('0.01')),
+        }
+
+    rows = RecipeStat.objects.using(using).filter(user=user, recipe_count__gt=0)
+    by_dimension = defaultdict(list)
+    for row in rows:
+        by_dimension[row.dimension].append(row)
+
+    result = averages(by_dimension[RecipeStat.ALL][0]) if by_dimension[RecipeStat.ALL] else averages(RecipeStat())
+    result['price_buckets'] = [
+        {'bucket': price_bucket_label(row.key), **averages(row)}
+        for row in sorted(by_dimension[RecipeStat.PRICE], key=lambda row: row.key)
+    ]
+    for dimension, model, name in ((RecipeStat.TAG, Tag, 'tags'), (RecipeStat.INGREDIENT, Ingredient, 'ingredients')):
+        names = dict(model.objects.using(using).filter(
+            pk__in=[row.key for row in by_dimension[dimension]],
+        ).values_list('pk', 'name'))
+        result[name] = [
+            {'id': row.key, 'name': names[row.key], **averages(row)}
+            for row in sorted(by_dimension[dimension], key=lambda row: -row.recipe_count)
+            if row.key in names
+        ]
+    return result
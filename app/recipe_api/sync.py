@@ -0,0 +1,111 @@
+"""
+Delta sync of the recipes, tags and ingredients of a user, for offline clients.
+
+Each kind of row is read from its (user, updated_at, id) index after the
+position of the client, at most `limit` rows per kind and call, so a
+reconnecting client reads what changed rather than its whole catalogue.
+The positions travel in an opaque signed token.
+
+A transaction committing late can hold an `updated_at` older than rows
+already read, so once a client caught up its positions restart
+`SYNC_SAFETY_WINDOW` seconds back: the rows of the window are sent again
+and clients apply them idempotently.
+
+Deletions are read from the tombstones. The links of a recipe are part of
+its row and adding or removing one updates the recipe, links to a deleted
+tag or ingredient go away with it. Tombstones are kept
+`SYNC_TOMBSTONE_RETENTION` days, an older token restarts a full sync with
+`reset` set and the client drops its local copy.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+
+from core import outbox
+from core.models import OutboxEvent
+
+from . import similarity
+from .models import Recipe, Tag, Ingredient, Tombstone
+
+SALT = 'recipe_api.sync'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# kind: (model, change time field, prefetched relations)
+KINDS = {
+    'tags': (Tag, 'updated_at', ()),
+    'ingredients': (Ingredient, 'updated_at', ()),
+    'recipes': (Recipe, 'updated_at', ('tags', 'recipeingredient_set')),
+    'deleted': (Tombstone, 'deleted_at', ()),
+}
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+def encode_token(positions):
+    return signing.dumps(
+        {kind: [changed_at.isoformat(), pk] for kind, (changed_at, pk) in positions.items()},
+        salt=SALT, compress=True,
+    )
+
+
+def decode_token(token):
+    """Returns {kind: (changed_at, pk)}, raises InvalidToken for a token not issued by `changes`."""
+    try:
+        data = signing.loads(token, salt=SALT)
+        return {kind: (datetime.fromisoformat(data[kind][0]), int(data[kind][1])) for kind in KINDS}
+    except (signing.BadSignature, KeyError, IndexError, TypeError, ValueError):
+        raise InvalidToken('Invalid sync token.')
+
+
+def changes(user, token=None, limit=None, using='default'):
+    """Returns the rows of the user changed since the token, and the token of the next call.
+
+    `has_more` is set while a kind had more than `limit` changed rows, the
+    client calls again with the new token until it is unset.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    now = timezone.now()
+    horizon = (now - timedelta(seconds=settings.SYNC_SAFETY_WINDOW), 0)
+    positions = decode_token(token) if token else None
+    reset = positions is not None and positions['deleted'][0] < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION)
+    if positions is None or reset:
+        # A new client has nothing to delete.
+        positions = {kind: (EPOCH, 0) for kind in KINDS}
+        positions['deleted'] = horizon
+
+    result = {'reset': reset, 'has_more': False}
+    for kind, (model, field, prefetch) in KINDS.items():
+        changed_at, pk = positions[kind]
+        rows = model.objects.using(using).filter(user=user).filter(
+            Q(**{f'{field}__gt': changed_at}) | Q(**{field: changed_at, 'pk__gt': pk}),
+        ).order_by(field, 'pk').prefetch_related(*prefetch)
+        rows = list(rows[:limit + 1])
+        if len(rows) > limit:
+            rows = rows[:limit]
+            positions[kind] = (getattr(rows[-1], field), rows[-1].pk)
+            result['has_more'] = True
+        else:
+            positions[kind] = horizon
+        result[kind] = rows
+    result['token'] = encode_token(positions)
+    return result
+
+
+def touch(using, recipe_ids):
+    """Mark the recipes changed after a change of their links, in the outbox and the similarities too."""
+    Recipe.objects.using(using).filter(pk__in=recipe_ids).update(updated_at=timezone.now())
+    similarity.bump(using, Recipe.objects.using(using).filter(pk__in=recipe_ids).values('user_id'))
+    if recipe_ids and outbox.enabled():
+        recipes = Recipe.objects.using(using).filter(pk__in=recipe_ids)
+        outbox.record_many(Recipe, OutboxEvent.UPDATED, [outbox.payload(recipe) for recipe in recipes], using)
+
+
+def prune_tombstones(using='default'):
+    """Delete the tombstones older than the retention, returns their number."""
+    expired = timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION)
+    return Tombstone.objects.using(using).filter(deleted_at__lt=expired).delete()[0]
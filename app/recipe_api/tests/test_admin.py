@@ -0,0 +1,55 @@
+"""
+Tests for the recipe_api admin.
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.test import Client
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from recipe_api.models import Recipe, Tag, Ingredient
+
+
+class TestRecipeAdmin(TestCase):
+    """Test links edited in the recipe admin keep the counters."""
+
+    def setUp(self):
+        self.client = Client()
+        self.admin = get_user_model().objects.create_superuser(email='admin@example.com', password='testpass123')
+        self.client.force_login(user=self.admin)
+        self.recipe = Recipe.objects.create(
+            user=self.admin, title='Rice', time_minutes=10, price=Decimal('5.00'), description='Sample description',
+        )
+        self.tag = Tag.objects.create(user=self.admin, name='vegan')
+        self.rice = Ingredient.objects.create(user=self.admin, name='rice')
+
+    def post_links(self, tags, ingredients):
+        """Post the change form with new tag and ingredient inline rows."""
+        payload = {
+            'user': self.admin.pk,
+            'title': self.recipe.title,
+            'time_minutes': self.recipe.time_minutes,
+            'price': self.recipe.price,
+            'description': self.recipe.description,
+        }
+        for prefix, rows in (('recipetag_set', tags), ('recipeingredient_set', ingredients)):
+            payload.update({f'{prefix}-TOTAL_FORMS': len(rows), f'{prefix}-INITIAL_FORMS': 0})
+            for index, row in enumerate(rows):
+                payload.update({f'{prefix}-{index}-{name}': value for name, value in row.items()})
+        return self.client.post(reverse('admin:recipe_api_recipe_change', args=[self.recipe.pk]), payload)
+
+    def test_add_links_in_admin(self):
+        """Test links added in the admin are counted."""
+        res = self.post_links(
+            tags=[{'tag': self.tag.pk}],
+            ingredients=[{'ingredient': self.rice.pk, 'quantity': '200', 'unit': 'g'}],
+        )
+
+        self.assertEqual(res.status_code, 302)
+        self.tag.refresh_from_db()
+        self.rice.refresh_from_db()
+        self.assertEqual(self.tag.recipe_count, 1)
+        self.assertEqual(self.rice.recipe_count, 1)
+        self.assertEqual(self.recipe.recipeingredient_set.get().quantity, Decimal('200'))
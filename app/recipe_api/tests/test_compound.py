@@ -0,0 +1,81 @@
+"""
+Tests for the compound documents of recipes.
+"""
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe_api:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe_api:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, title='Rice'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+
+
+class TestCompoundDocuments(TestCase):
+    """Test compound documents emit each related row once."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.tags = [Tag.objects.create(user=self.user, name=f'tag{index}') for index in range(10)]
+        self.rice = Ingredient.objects.create(user=self.user, name='rice')
+
+    def test_list(self):
+        """Test recipes reference the shared tags, included once."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(3)]
+        for recipe in recipes:
+            recipe.tags.add(*self.tags[:2])
+        recipes[0].ingredients.add(self.rice, through_defaults={'quantity': Decimal('200'), 'unit': 'g'})
+
+        res = self.client.get(RECIPES_URL, {'compound': '1'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['title'] for recipe in res.data['data']], ['Recipe 2', 'Recipe 1', 'Recipe 0'])
+        self.assertEqual(sorted(res.data['data'][0]['tags']), [self.tags[0].pk, self.tags[1].pk])
+        self.assertEqual(res.data['data'][2]['user'], self.user.pk)
+        self.assertEqual(res.data['data'][2]['ingredient_amounts'][0]['ingredient'], self.rice.pk)
+        self.assertEqual([tag['name'] for tag in res.data['included']['tags']], ['tag0', 'tag1'])
+        self.assertEqual([ingredient['name'] for ingredient in res.data['included']['ingredients']], ['Rice'])
+        self.assertEqual([user['email'] for user in res.data['included']['users']], ['user@example.com'])
+
+    def test_smaller_than_nested(self):
+        """Test the compound list of recipes sharing tags is less than half their nested details."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(5)]
+        for recipe in recipes:
+            recipe.tags.add(*self.tags)
+
+        nested = [self.client.get(detail_url(recipe.pk)).data for recipe in recipes]
+        res = self.client.get(RECIPES_URL, {'compound': '1'})
+
+        self.assertLess(len(json.dumps(res.data)), len(json.dumps(nested)) / 2)
+
+    def test_retrieve_queries(self):
+        """Test the compound detail reads the same queries for any number of tags."""
+        recipe = create_recipe(self.user)
+        recipe.tags.add(*self.tags)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(recipe.pk), {'compound': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['data']['tags']), 10)
+        # The recipe, its tags, ingredients and amounts.
+        self.assertEqual(len(queries), 4)
@@ -92,17 +92,15 @@ class PrivateTestIngredientAPI(TestCase):
         self.assertEqual(ingredient.user, self.user)
 
     def test_create_normalized_ingredients(self):
-        """Test if name of the ingredient was normalized."""
-        payload = [{
-            'name': 'ingredient'
-        }, {
-            'name': 'INGREDIENT'
-        }]
-        for item in payload:
-            res = self.client.post(INGREDIENTS_URL, item)
-            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
-            ingredient = Ingredient.objects.get(id=res.data['id'])
-            self.assertEqual(ingredient.name, str(item['name']).capitalize())
+        """Test if name of the ingredient was normalized, a name the user already has is refused."""
+        res = self.client.post(INGREDIENTS_URL, {'name': 'ingredient'})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        ingredient = Ingredient.objects.get(id=res.data['id'])
+        self.assertEqual(ingredient.name, 'Ingredient')
+
+        res = self.client.post(INGREDIENTS_URL, {'name': 'INGREDIENT'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
 
     def test_create_ingredients_no_parameters_error(self):
         """Test creating with no parameter's error."""
@@ -193,3 +191,16 @@ class PrivateTestIngredientAPI(TestCase):
         res = self.client.get(INGREDIENTS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_filter_ingredients_by_min_count(self):
+        """Test filtering ingredients used by a minimum number of recipes."""
+        rice = Ingredient.objects.create(user=self.user, name='Rice')
+        beans = Ingredient.objects.create(user=self.user, name='Beans')
+        for i in range(2):
+            recipe = Recipe.objects.create(title=f'Recipe {i}', time_minutes=5, price=Decimal('5.00'), user=self.user)
+            recipe.ingredients.add(rice)
+        recipe.ingredients.add(beans)
+
+        res = self.client.get(INGREDIENTS_URL, {'min_count': 2})
+
+        self.assertEqual([ingredient['id'] for ingredient in res.data], [rice.id])
@@ -0,0 +1,182 @@
+"""
+Tests for the incremental changes of recipe tags and ingredients.
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api.links import _existing as existing
+from recipe_api.models import Recipe, RecipeStat, Tag, Ingredient
+
+BULK_TAGS_URL = reverse('recipe_api:recipe-bulk-tag-links')
+
+
+def tags_url(recipe_id):
+    return reverse('recipe_api:recipe-tag-links', args=[recipe_id])
+
+
+def ingredients_url(recipe_id):
+    return reverse('recipe_api:recipe-ingredient-links', args=[recipe_id])
+
+
+def create_recipe(user, title='Rice'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+
+
+class TestRecipeLinks(TestCase):
+    """Test adding and removing tags and ingredients of recipes."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='vegan')
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+
+    def test_add_and_remove_tags(self):
+        """Test adding keeps the other tags and removing only drops the given ones."""
+        recipe = create_recipe(self.user)
+        recipe.tags.add(self.vegan)
+
+        res = self.client.post(tags_url(recipe.pk), {'ids': [self.quick.pk, self.vegan.pk]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag['name'] for tag in res.data['tags']), ['quick', 'vegan'])
+        self.quick.refresh_from_db()
+        self.assertEqual(self.quick.recipe_count, 1)
+
+        res = self.client.delete(tags_url(recipe.pk), {'ids': [self.vegan.pk]}, format='json')
+
+        self.assertEqual([tag['name'] for tag in res.data['tags']], ['quick'])
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 0)
+        self.assertFalse(RecipeStat.objects.filter(dimension=RecipeStat.TAG, key=self.vegan.pk, recipe_count__gt=0))
+
+    def test_add_ingredients(self):
+        """Test ingredients are added without quantity and kept on a second add."""
+        recipe = create_recipe(self.user)
+        rice = Ingredient.objects.create(user=self.user, name='rice')
+
+        for _ in range(2):
+            res = self.client.post(ingredients_url(recipe.pk), {'ids': [rice.pk]}, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.ingredients.all()), [rice])
+        rice.refresh_from_db()
+        self.assertEqual(rice.recipe_count, 1)
+
+    def test_other_users_ids(self):
+        """Test tags and recipes of other users are refused."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        other_tag = Tag.objects.create(user=other_user, name='other')
+        other_recipe = create_recipe(other_user)
+        recipe = create_recipe(self.user)
+
+        res = self.client.post(tags_url(recipe.pk), {'ids': [other_tag.pk]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        res = self.client.post(tags_url(other_recipe.pk), {'ids': [self.vegan.pk]}, format='json')
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.post(
+            BULK_TAGS_URL, {'recipes': [recipe.pk, other_recipe.pk], 'ids': [self.vegan.pk]}, format='json',
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(recipe.tags.exists())
+
+    def test_bulk_add_and_remove(self):
+        """Test bulk changes write the links of every recipe."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(5)]
+        recipes[0].tags.add(self.vegan)
+        payload = {'recipes': [recipe.pk for recipe in recipes], 'ids': [self.vegan.pk, self.quick.pk]}
+
+        res = self.client.post(BULK_TAGS_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 5)
+        self.assertEqual(RecipeStat.objects.get(dimension=RecipeStat.TAG, key=self.quick.pk).recipe_count, 5)
+
+        res = self.client.delete(BULK_TAGS_URL, {**payload, 'ids': [self.vegan.pk]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Recipe.objects.filter(tags=self.vegan).exists())
+        self.assertEqual(Recipe.objects.filter(tags=self.quick).count(), 5)
+
+    def test_add_link_added_concurrently(self):
+        """Test a link inserted between the read of the links and the insert is skipped and counted once."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(2)]
+
+        def read_then_link(*args):
+            # The link is inserted by another path after the read, as if by another request.
+            pairs = existing(*args)
+            if not Recipe.tags.through.objects.filter(recipe=recipes[0]).exists():
+                Recipe.tags.through.objects.create(recipe=recipes[0], tag=self.vegan)
+            return pairs
+
+        with patch('recipe_api.links._existing', side_effect=read_then_link):
+            res = self.client.post(
+                BULK_TAGS_URL, {'recipes': [recipe.pk for recipe in recipes], 'ids': [self.vegan.pk]}, format='json',
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(Recipe.tags.through.objects.filter(tag=self.vegan).count(), 2)
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 2)
+        self.assertEqual(RecipeStat.objects.get(dimension=RecipeStat.TAG, key=self.vegan.pk).recipe_count, 2)
+
+    def test_update_locks_the_recipe(self):
+        """Test setting the links of a recipe takes the lock of the link changes."""
+        recipe = create_recipe(self.user)
+
+        with patch('recipe_api.links.lock_recipes') as lock_recipes:
+            res = self.client.put(reverse('recipe_api:recipe-detail', args=[recipe.pk]), {
+                'title': 'Rice', 'time_minutes': 10, 'price': '5.00', 'description': 'Sample description',
+                'tags': [self.vegan.pk],
+            }, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lock_recipes.assert_called_once_with([recipe.pk], 'default')
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+
+    def test_counters_follow_changed_links_only(self):
+        """Test links already there or already gone leave the derived data alone."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(3)]
+        recipes[0].tags.add(self.vegan)
+        payload = {'recipes': [recipe.pk for recipe in recipes], 'ids': [self.vegan.pk]}
+
+        self.client.post(BULK_TAGS_URL, payload, format='json')
+        self.client.post(BULK_TAGS_URL, payload, format='json')
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 3)
+        self.assertEqual(RecipeStat.objects.get(dimension=RecipeStat.TAG, key=self.vegan.pk).recipe_count, 3)
+
+        self.client.delete(BULK_TAGS_URL, {**payload, 'recipes': [recipes[1].pk]}, format='json')
+        self.client.delete(BULK_TAGS_URL, {**payload, 'recipes': [recipes[1].pk, recipes[2].pk]}, format='json')
+        self.vegan.refresh_from_db()
+        self.assertEqual(self.vegan.recipe_count, 1)
+        self.assertEqual(RecipeStat.objects.get(dimension=RecipeStat.TAG, key=self.vegan.pk).recipe_count, 1)
+
+    @override_settings(RECIPE_LINKS_BATCH_SIZE=10)
+    def test_bulk_queries_do_not_grow_with_recipes(self):
+        """Test a bulk change of a batch of recipes costs the same queries for any number of them."""
+        # The stat rows of the tag exist.
+        create_recipe(self.user).tags.add(self.vegan)
+        counts = []
+        for size in (3, 10):
+            recipe_ids = [create_recipe(self.user).pk for _ in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_TAGS_URL, {'recipes': recipe_ids, 'ids': [self.vegan.pk]}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
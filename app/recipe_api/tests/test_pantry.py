@@ -0,0 +1,87 @@
+"""
+Test for the pantry search.
+"""
+from decimal import Decimal
+
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api import pantry
+from recipe_api.models import Recipe, Ingredient
+
+PANTRY_URL = reverse('recipe_api:recipe-pantry')
+
+
+def create_recipe(user, title, ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class TestPantrySearch(TestCase):
+    """Test the pantry search endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.rice, self.beans, self.corn, self.salt = [
+            Ingredient.objects.create(user=self.user, name=name) for name in ('rice', 'beans', 'corn', 'salt')
+        ]
+
+    def test_auth_required(self):
+        """Test auth is required to search the pantry."""
+        res = APIClient().post(PANTRY_URL, {'ingredients': [self.rice.pk]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_pantry_tiers_ranked_by_coverage(self):
+        """Test covered recipes come first, then recipes missing one or two ingredients."""
+        covered = create_recipe(self.user, 'Rice and beans', [self.rice, self.beans])
+        missing_one = create_recipe(self.user, 'Rice and corn', [self.rice, self.corn])
+        missing_two = create_recipe(self.user, 'Corn soup', [self.rice, self.corn, self.salt])
+        create_recipe(self.user, 'Corn and salt', [self.corn, self.salt])
+        create_recipe(self.user, 'Too many missing', [self.rice, self.corn, self.salt, Ingredient.objects.create(
+            user=self.user, name='pepper',
+        )])
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_recipe(other_user, 'Other rice', [self.rice])
+
+        res = self.client.post(PANTRY_URL, {'ingredients': [self.rice.pk, self.beans.pk]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in res.data], [covered.pk, missing_one.pk, missing_two.pk])
+        self.assertEqual([recipe['missing'] for recipe in res.data], [0, 1, 2])
+        self.assertEqual(res.data[0]['coverage'], 1.0)
+        self.assertEqual(res.data[1]['missing_ingredients'], [self.corn.pk])
+        self.assertEqual(res.data[2]['coverage'], round(1 / 3, 4))
+
+    def test_pantry_max_missing(self):
+        """Test only fully covered recipes are returned with max_missing 0."""
+        covered = create_recipe(self.user, 'Rice', [self.rice])
+        create_recipe(self.user, 'Rice and corn', [self.rice, self.corn])
+
+        res = self.client.post(PANTRY_URL, {'ingredients': [self.rice.pk], 'max_missing': 0}, format='json')
+
+        self.assertEqual([recipe['id'] for recipe in res.data], [covered.pk])
+
+    def test_pantry_invalid(self):
+        """Test invalid searches are rejected."""
+        for payload in ({}, {'ingredients': ['rice']}, {'ingredients': [self.rice.pk], 'max_missing': 3}):
+            res = self.client.post(PANTRY_URL, payload, format='json')
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_pantry_query_count(self):
+        """Test the search runs a fixed number of queries whatever the number of recipes."""
+        for index in range(20):
+            create_recipe(self.user, f'Recipe {index}', [self.rice, self.corn])
+
+        with self.assertNumQueries(3):
+            pantry.cookable_recipes(self.user, [self.rice.pk], 2)
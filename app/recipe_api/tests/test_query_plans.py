@@ -0,0 +1,164 @@
+"""
+Test the query plans of the hot queries against seeded data.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api import sync
+from recipe_api.models import Recipe, RecipeTag, Tag, Ingredient
+
+RECIPES_URL = reverse('recipe_api:recipe-list')
+TAGS_URL = reverse('recipe_api:tag-list')
+INGREDIENTS_URL = reverse('recipe_api:ingredient-list')
+FULL_SCANS = ('SCAN recipe_api_', 'Seq Scan', 'TEMP B-TREE', 'Sort')
+
+
+def explain(sql):
+    """Returns the plan of a captured query, one line per step."""
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def constraint_index(table, name):
+    """Returns the name of the index of a unique constraint, SQLite names it after the table."""
+    if connection.vendor == 'sqlite':
+        return f'sqlite_autoindex_{table}_'
+    return name
+
+
+class QueryPlanTestCase(TestCase):
+    """Seeds several users with recipes, tags, ingredients and links."""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            get_user_model().objects.create_user(email=f'user{index}@example.com', password='testpass123')
+            for index in range(4)
+        ]
+        cls.user = users[0]
+        recipes = Recipe.objects.bulk_create([
+            Recipe(
+                user=users[index % len(users)],
+                title=f'Recipe {index}',
+                time_minutes=index % 120,
+                price=Decimal(index % 90),
+                description='Sample description',
+            )
+            for index in range(4000)
+        ])
+        tags = Tag.objects.bulk_create([
+            Tag(user=users[index % len(users)], name=f'tag-{index}', recipe_count=index % 7) for index in range(400)
+        ])
+        Ingredient.objects.bulk_create([
+            Ingredient(user=users[index % len(users)], name=f'Ingredient {index}') for index in range(400)
+        ])
+        RecipeTag.objects.bulk_create([
+            RecipeTag(recipe=recipe, tag=tags[(index * 7 + offset) % len(tags)])
+            for index, recipe in enumerate(recipes) for offset in range(3)
+        ])
+        cls.tag = tags[0]
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def list_plan(self, url, params, table):
+        """Returns the plan of the main query of a list endpoint."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        sql = next(query['sql'] for query in queries if f'FROM "{table}"' in query['sql'])
+        return explain(sql)
+
+    def assertIndexScan(self, plan, index=None):
+        """Assert the plan uses the index, without full scans or sorts."""
+        if index:
+            self.assertIn(index, plan)
+        for full_scan in FULL_SCANS:
+            self.assertNotIn(full_scan, plan)
+
+
+class TestRecipeListPlans(QueryPlanTestCase):
+    """Test filters and orderings of the recipes list are index range scans."""
+
+    def list_plan(self, params):
+        return super().list_plan(RECIPES_URL, params, 'recipe_api_recipe')
+
+    def test_default_ordering(self):
+        """Test the newest recipes of the user are read from an index."""
+        plan = self.list_plan({})
+
+        self.assertIndexScan(plan)
+
+    def test_price_range_ordered_by_price(self):
+        """Test a price range ordered by price scans the price index."""
+        plan = self.list_plan({'price_min': '2', 'price_max': '10', 'ordering': 'price'})
+
+        self.assertIndexScan(plan, 'recipe_user_price_idx')
+
+    def test_time_max_ordered_by_time(self):
+        """Test a maximum time ordered by time descending scans the time index."""
+        plan = self.list_plan({'time_max': '30', 'ordering': '-time_minutes'})
+
+        self.assertIndexScan(plan, 'recipe_user_time_idx')
+
+    def test_ordered_by_title(self):
+        """Test ordering by title scans the title index."""
+        plan = self.list_plan({'ordering': 'title'})
+
+        self.assertIndexScan(plan, 'recipe_user_title_idx')
+
+
+class TestAttrListPlans(QueryPlanTestCase):
+    """Test the tags and ingredients lists and the reverse lookups use indexes."""
+
+    def test_tags_by_name(self):
+        """Test tags ordered by name descending scan the unique name index."""
+        plan = self.list_plan(TAGS_URL, {}, 'recipe_api_tag')
+
+        self.assertIndexScan(plan, constraint_index('recipe_api_tag', 'unique_tag_user_name'))
+
+    def test_ingredients_by_name(self):
+        """Test assigned ingredients ordered by name scan the unique name index."""
+        plan = self.list_plan(INGREDIENTS_URL, {'assigned_only': 1, 'ordering': 'name'}, 'recipe_api_ingredient')
+
+        self.assertIndexScan(plan, constraint_index('recipe_api_ingredient', 'unique_ingredient_user_name'))
+
+    def test_tags_by_recipe_count(self):
+        """Test tags ordered by number of recipes scan the counter index."""
+        plan = self.list_plan(TAGS_URL, {'ordering': '-recipe_count'}, 'recipe_api_tag')
+
+        self.assertIndexScan(plan, 'tag_user_count_idx')
+
+    def test_recipes_of_tag(self):
+        """Test the recipes of a tag are read from the reverse link index only."""
+        sql, params = RecipeTag.objects.filter(tag=self.tag).values('recipe_id').query.sql_with_params()
+
+        plan = explain(sql % tuple(params))
+
+        self.assertIndexScan(plan, 'recipetag_tag_recipe_idx')
+
+
+class TestSyncPlans(QueryPlanTestCase):
+    """Test the delta sync reads the changes from the (user, updated_at, id) indexes."""
+
+    def test_changed_recipes(self):
+        """Test the recipes changed since a token are read in order from the index."""
+        token = sync.changes(self.user, limit=10)['token']
+        with CaptureQueriesContext(connection) as queries:
+            sync.changes(self.user, token, limit=10)
+        sql = next(query['sql'] for query in queries if 'FROM "recipe_api_recipe"' in query['sql'])
+
+        self.assertIndexScan(explain(sql), 'recipe_user_updated_idx')
@@ -8,7 +8,9 @@ from PIL import Image
 
 from decimal import Decimal
 
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
@@ -244,8 +246,8 @@ class TestPrivateRecipeAPI(TestCase):
 
     def test_create_recipe_with_ingredients(self):
         """Test create a new recipe with multiples ingredients successfully."""
-        ingredient1 = create_ingredient(user=self.user)
-        ingredient2 = create_ingredient(user=self.user)
+        ingredient1 = create_ingredient(user=self.user, name='Rice')
+        ingredient2 = create_ingredient(user=self.user, name='Beans')
         payload = {
             'title': 'Sample title',
             'time_minutes': 3,
@@ -267,6 +269,86 @@ class TestPrivateRecipeAPI(TestCase):
         self.assertTrue(exists)
         self.assertEqual(recipe.user, self.user)
 
+    def test_create_recipe_with_unknown_tags(self):
+        """Test tags of other users and missing tags are all reported."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        other_tag = create_tag(user=other_user, name='other')
+        tag = create_tag(user=self.user)
+        payload = {
+            'title': 'Sample title',
+            'price': Decimal('1.50'),
+            'description': 'Sample description',
+            'tags': [tag.pk, other_tag.pk, 0],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(f'{other_tag.pk}, 0', str(res.data['tags'][0]))
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_create_recipe_queries_do_not_grow_with_tags(self):
+        """Test the tags of a recipe are validated and linked with the same queries for any number of them."""
+        tags = [create_tag(user=self.user, name=f'tag{index}') for index in range(31)]
+        # The stat rows of the tags exist.
+        create_recipe(user=self.user).tags.add(*tags)
+        counts = []
+        for size in (2, 30):
+            payload = {
+                'title': 'Sample title',
+                'price': Decimal('1.50'),
+                'description': 'Sample description',
+                'tags': [tag.pk for tag in tags[:size]],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+    def test_create_recipe_with_names(self):
+        """Test tags and ingredients given by name are reused or created once, normalized."""
+        tag = create_tag(user=self.user, name='quick')
+        payload = {
+            'title': 'Sample title',
+            'price': Decimal('1.50'),
+            'description': 'Sample description',
+            'tags': [tag.pk],
+            'tag_names': ['Quick', 'Main Course', 'main course'],
+            'ingredient_names': ['rice'],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(sorted(tag.name for tag in recipe.tags.all()), ['main-course', 'quick'])
+        self.assertEqual([ingredient.name for ingredient in recipe.ingredients.all()], ['Rice'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Tag.objects.get(name='main-course').recipe_count, 1)
+
+    def test_update_recipe_with_names(self):
+        """Test names given without ids are linked along with the current rows."""
+        recipe = create_recipe(user=self.user)
+        tag = create_tag(user=self.user, name='quick')
+        recipe.tags.add(tag)
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_tag(user=other_user, name='vegan')
+
+        payload = {
+            'title': 'New title',
+            'price': Decimal('2.50'),
+            'description': 'New description',
+            'tag_names': ['vegan'],
+        }
+
+        res = self.client.put(recipes_detail_url(recipe.pk), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(tag.name for tag in recipe.tags.all()), ['quick', 'vegan'])
+        self.assertEqual(recipe.tags.get(name='vegan').user, self.user)
+
     def test_filter_recipes_by_tags(self):
         """Test filtering recipes using tags query params."""
         tag1 = create_tag(user=self.user, name='tag1')
@@ -318,6 +400,41 @@ class TestPrivateRecipeAPI(TestCase):
         self.assertIn(serializer_recipe2.data, res.data)
         self.assertNotIn(serializer_recipe3.data, res.data)
 
+    def test_filter_recipes_by_price_and_time(self):
+        """Test filtering recipes by price range and maximum time."""
+        recipe1 = create_recipe(user=self.user, title='recipe1', price=Decimal('5.00'), time_minutes=10)
+        create_recipe(user=self.user, title='recipe2', price=Decimal('5.00'), time_minutes=60)
+        create_recipe(user=self.user, title='recipe3', price=Decimal('50.00'), time_minutes=10)
+        create_recipe(user=self.user, title='recipe4', price=Decimal('1.00'), time_minutes=10)
+
+        params = {'price_min': '2', 'price_max': '10.50', 'time_max': '30'}
+        res = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [RecipeSerializer(recipe1).data])
+
+    def test_order_recipes(self):
+        """Test ordering recipes by price, ascending and descending."""
+        recipe1 = create_recipe(user=self.user, title='b', price=Decimal('5.00'))
+        recipe2 = create_recipe(user=self.user, title='a', price=Decimal('2.00'))
+        recipe3 = create_recipe(user=self.user, title='c', price=Decimal('5.00'))
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'price'})
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe2.id, recipe1.id, recipe3.id])
+
+        res = self.client.get(RECIPES_URL, {'ordering': '-price'})
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe3.id, recipe1.id, recipe2.id])
+
+        res = self.client.get(RECIPES_URL, {'ordering': 'title'})
+        self.assertEqual([recipe['id'] for recipe in res.data], [recipe2.id, recipe1.id, recipe3.id])
+
+    def test_invalid_recipe_filters(self):
+        """Test invalid filters and orderings are rejected."""
+        for params in ({'price_min': 'cheap'}, {'price_max': 'NaN'}, {'time_max': '-1'}, {'ordering': 'user'}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestImageUpload(TestCase):
     """Tests for the image upload API."""
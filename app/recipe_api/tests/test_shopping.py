@@ -0,0 +1,185 @@
+"""
+Test for ingredient quantities and the shopping list.
+"""
+import os
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import OutboxEvent
+from recipe_api import shopping
+from recipe_api.models import Recipe, RecipeIngredient, Ingredient
+from recipe_api.serializers import RecipeCreateSerializer
+
+SHOPPING_LIST_URL = reverse('recipe_api:recipe-shopping-list')
+RECIPES_URL = reverse('recipe_api:recipe-list')
+
+
+def create_recipe(user, title, amounts=()):
+    """Create a recipe with (ingredient, quantity, unit) amounts."""
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+    for ingredient, quantity, unit in amounts:
+        recipe.ingredients.add(ingredient, through_defaults={'quantity': quantity, 'unit': unit})
+    return recipe
+
+
+class TestShoppingList(TestCase):
+    """Test ingredient quantities and the shopping list endpoint."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.rice = Ingredient.objects.create(user=self.user, name='rice')
+        self.milk = Ingredient.objects.create(user=self.user, name='milk')
+        self.eggs = Ingredient.objects.create(user=self.user, name='eggs')
+
+    def test_create_recipe_with_amounts(self):
+        """Test creating a recipe with ingredient quantities links the ingredients."""
+        payload = {
+            'title': 'Rice pudding',
+            'time_minutes': 40,
+            'price': Decimal('3.00'),
+            'description': 'Sample description',
+            'ingredient_amounts': [
+                {'ingredient': self.rice.pk, 'quantity': '0.200', 'unit': 'kg'},
+                {'ingredient': self.milk.pk, 'quantity': '1', 'unit': 'l'},
+            ],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(pk=res.data['id'])
+        self.assertEqual(set(recipe.ingredients.all()), {self.rice, self.milk})
+        self.assertEqual(RecipeIngredient.objects.get(recipe=recipe, ingredient=self.rice).quantity, Decimal('0.2'))
+        self.rice.refresh_from_db()
+        self.assertEqual(self.rice.recipe_count, 1)
+
+    def test_create_recipe_amounts_queries_do_not_grow(self):
+        """Test the amounts are validated and linked with the same queries for any number of ingredients."""
+        ingredients = [Ingredient.objects.create(user=self.user, name=f'ingredient {index}') for index in range(12)]
+        # The stat rows of the ingredients exist.
+        create_recipe(self.user, 'Warm', [(ingredient, 1, 'pc') for ingredient in ingredients])
+        counts = []
+        for size in (2, 12):
+            payload = {
+                'title': 'Sample title',
+                'time_minutes': 10,
+                'price': Decimal('5.00'),
+                'description': 'Sample description',
+                'ingredient_amounts': [
+                    {'ingredient': ingredient.pk, 'quantity': '1', 'unit': 'pc'} for ingredient in ingredients[:size]
+                ],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(RECIPES_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(RecipeIngredient.objects.filter(recipe_id=res.data['id']).count(), 12)
+
+    def test_create_recipe_amounts_of_other_user(self):
+        """Test an ingredient of another user is reported in the item referencing it."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        other = Ingredient.objects.create(user=other_user, name='salt')
+        payload = {
+            'title': 'Sample title',
+            'time_minutes': 10,
+            'price': Decimal('1.50'),
+            'description': 'Sample description',
+            'ingredient_amounts': [
+                {'ingredient': self.rice.pk, 'quantity': '1', 'unit': 'kg'},
+                {'ingredient': other.pk, 'quantity': '1', 'unit': 'g'},
+                {'ingredient': 'x', 'quantity': '1', 'unit': 'g'},
+            ],
+        }
+
+        res = self.client.post(RECIPES_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = res.data['ingredient_amounts']
+        self.assertEqual(errors[0], {})
+        self.assertEqual(errors[1]['ingredient'][0].code, 'does_not_exist')
+        self.assertEqual(errors[2]['ingredient'][0].code, 'incorrect_type')
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(OUTBOX_SINKS=[{'BACKEND': 'core.outbox.FileSink', 'OPTIONS': {'path': os.devnull}}])
+    def test_changed_amounts_mark_recipe_changed(self):
+        """Test changing quantities updates the recipe for the sync and the outbox, unchanged ones do not."""
+        recipe = create_recipe(self.user, 'Rice', [(self.rice, Decimal('100'), 'g'), (self.milk, Decimal('1'), 'l')])
+        before = timezone.now() - timedelta(days=1)
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=before)
+        OutboxEvent.objects.all().delete()
+        amounts = [{'ingredient': self.rice, 'quantity': Decimal('200'), 'unit': 'g'}]
+
+        RecipeCreateSerializer()._set_amounts(recipe, amounts)
+
+        self.assertEqual(RecipeIngredient.objects.get(recipe=recipe, ingredient=self.rice).quantity, Decimal('200'))
+        self.assertGreater(Recipe.objects.get(pk=recipe.pk).updated_at, before)
+        self.assertEqual(
+            list(OutboxEvent.objects.values_list('object_id', 'action')), [(recipe.pk, OutboxEvent.UPDATED)],
+        )
+
+        OutboxEvent.objects.all().delete()
+        RecipeCreateSerializer()._set_amounts(recipe, [{'ingredient': self.rice, 'quantity': Decimal('200'), 'unit': 'g'}])
+        self.assertFalse(OutboxEvent.objects.exists())
+
+        link = RecipeIngredient.objects.get(recipe=recipe, ingredient=self.milk)
+        link.quantity = Decimal('2')
+        link.save()
+        self.assertEqual(OutboxEvent.objects.get().object_id, recipe.pk)
+
+    def test_shopping_list_merges_units(self):
+        """Test quantities are normalized to base units and summed by ingredient."""
+        recipe1 = create_recipe(self.user, 'Rice pudding', [(self.rice, Decimal('0.2'), 'kg'), (self.milk, 1, 'l')])
+        recipe2 = create_recipe(self.user, 'Fried rice', [(self.rice, 150, 'g'), (self.eggs, 2, 'pc')])
+        recipe3 = create_recipe(self.user, 'Omelette', [(self.eggs, 3, 'pc'), (self.milk, 2, 'cup')])
+
+        res = self.client.post(
+            SHOPPING_LIST_URL, {'recipes': [recipe1.pk, recipe2.pk, recipe3.pk]}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        items = {(item['name'], item['unit']): (item['quantity'], item['recipe_count']) for item in res.data}
+        self.assertEqual(items, {
+            ('Rice', 'g'): ('350.000', 2),
+            ('Milk', 'ml'): ('1473.176', 2),
+            ('Eggs', 'pc'): ('5.000', 2),
+        })
+
+    def test_shopping_list_counts_repeated_recipes(self):
+        """Test a recipe planned twice counts twice."""
+        recipe = create_recipe(self.user, 'Omelette', [(self.eggs, 3, 'pc')])
+
+        items = shopping.shopping_list(self.user, [recipe.pk, recipe.pk])
+
+        self.assertEqual(items[0]['quantity'], Decimal('6'))
+
+    def test_shopping_list_limited_to_user(self):
+        """Test recipes of other users are ignored."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        recipe = create_recipe(other_user, 'Other', [(self.eggs, 3, 'pc')])
+
+        res = self.client.post(SHOPPING_LIST_URL, {'recipes': [recipe.pk]}, format='json')
+
+        self.assertEqual(res.data, [])
+
+    def test_shopping_list_query_count(self):
+        """Test the shopping list runs one query whatever the number of recipes."""
+        recipes = [create_recipe(self.user, f'Recipe {index}', [(self.rice, 100, 'g')]) for index in range(50)]
+
+        with self.assertNumQueries(1):
+            shopping.shopping_list(self.user, [recipe.pk for recipe in recipes])
@@ -0,0 +1,150 @@
+"""
+Test for similar recipes.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api import similarity
+from recipe_api.models import Recipe, Tag, Ingredient
+
+
+def similar_url(recipe_id):
+    return reverse('recipe_api:recipe-similar', args=[recipe_id])
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+class TestSimilarRecipes(TestCase):
+    """Test the similar recipes endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.vegan = Tag.objects.create(user=self.user, name='vegan')
+        self.quick = Tag.objects.create(user=self.user, name='quick')
+        self.rice = Ingredient.objects.create(user=self.user, name='rice')
+        self.beans = Ingredient.objects.create(user=self.user, name='beans')
+        self.recipe = create_recipe(self.user, 'Rice and beans', [self.vegan], [self.rice, self.beans])
+
+    def test_similar_ranked_by_weighted_jaccard(self):
+        """Test results are ranked and scoped to recipes sharing features."""
+        close = create_recipe(self.user, 'Beans bowl', [self.vegan], [self.rice, self.beans])
+        far = create_recipe(self.user, 'Quick rice', [self.quick], [self.rice])
+        create_recipe(self.user, 'Unrelated', [self.quick])
+
+        res = self.client.get(similar_url(self.recipe.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['id'] for recipe in res.data], [close.pk, far.pk])
+        self.assertEqual(res.data[0]['similarity'], 1.0)
+        # Shared: rice (weight 2). Union: vegan, quick (1 each), rice, beans (2 each).
+        self.assertAlmostEqual(res.data[1]['similarity'], round(2 / 6, 4))
+
+    def test_similar_limited_to_user(self):
+        """Test recipes of other users are never returned."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_recipe(other_user, 'Copy', [self.vegan], [self.rice, self.beans])
+
+        res = self.client.get(similar_url(self.recipe.pk))
+
+        self.assertEqual(res.data, [])
+
+    def test_similar_other_user_recipe_not_found(self):
+        """Test the endpoint is scoped like the recipe detail."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        recipe = create_recipe(other_user, 'Copy', [self.vegan])
+
+        res = self.client.get(similar_url(recipe.pk))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_similar_counts_features_the_recipe_lacks(self):
+        """Test the features of a kind the recipe has none of count in the union."""
+        plain = create_recipe(self.user, 'Plain rice', ingredients=[self.rice])
+        tags = [Tag.objects.create(user=self.user, name=f'tag-{index}') for index in range(5)]
+        tagged = create_recipe(self.user, 'Tagged rice', tags, [self.rice])
+
+        res = self.client.get(similar_url(plain.pk))
+
+        # Shared: rice (weight 2). Union: 5 tags (1 each), rice (2).
+        similarities = {recipe['id']: recipe['similarity'] for recipe in res.data}
+        self.assertAlmostEqual(similarities[tagged.pk], round(2 / 7, 4))
+
+    def test_similar_cached_and_refreshed(self):
+        """Test results are cached and refreshed when a neighbour changes its links."""
+        other = create_recipe(self.user, 'Other', [self.quick])
+        self.assertEqual(self.client.get(similar_url(self.recipe.pk)).data, [])
+        self.assertIsNotNone(cache.get(similarity.cache_key(self.recipe.pk, similarity.version(self.recipe))))
+
+        other.ingredients.add(self.beans)
+
+        self.assertIsNone(cache.get(similarity.cache_key(self.recipe.pk, similarity.version(self.recipe))))
+        res = self.client.get(similar_url(self.recipe.pk))
+        self.assertEqual([recipe['id'] for recipe in res.data], [other.pk])
+
+    def test_similar_refreshed_through_other_features(self):
+        """Test a recipe gaining a feature refreshes neighbours sharing other features."""
+        plain = create_recipe(self.user, 'Plain rice', ingredients=[self.rice])
+        tagged = create_recipe(self.user, 'Tagged rice', [self.quick], [self.rice, self.beans])
+        # Shared: rice (2). Union: quick (1), rice, beans (2 each).
+        self.assertEqual(self.client.get(similar_url(tagged.pk)).data[-1]['similarity'], round(2 / 5, 4))
+
+        plain.tags.add(self.vegan)
+
+        similarities = {recipe['id']: recipe['similarity'] for recipe in self.client.get(similar_url(tagged.pk)).data}
+        # Union: quick, vegan (1 each), rice, beans (2 each).
+        self.assertAlmostEqual(similarities[plain.pk], round(2 / 6, 4))
+
+    def test_similar_refreshed_when_feature_deleted(self):
+        """Test deleting a tag refreshes the recipes that had it."""
+        other = create_recipe(self.user, 'Other', [self.vegan, self.quick])
+        self.assertEqual(self.client.get(similar_url(other.pk)).data[0]['similarity'], round(1 / 6, 4))
+
+        self.quick.delete()
+
+        res = self.client.get(similar_url(other.pk))
+        # Shared: vegan (1). Union: vegan (1), rice, beans (2 each).
+        self.assertAlmostEqual(res.data[0]['similarity'], round(1 / 5, 4))
+
+    def test_similar_refreshed_when_recipe_deleted(self):
+        """Test deleting a recipe drops it from the cached results of its neighbours."""
+        other = create_recipe(self.user, 'Other', [self.vegan])
+        self.assertEqual([recipe['id'] for recipe in self.client.get(similar_url(self.recipe.pk)).data], [other.pk])
+
+        other.delete()
+
+        self.assertEqual(self.client.get(similar_url(self.recipe.pk)).data, [])
+
+    def test_version_is_one_lookup(self):
+        """Test the version of a user with many recipes is read with one query."""
+        for index in range(5):
+            create_recipe(self.user, f'Recipe {index}', [self.vegan])
+
+        with self.assertNumQueries(1):
+            current = similarity.version(self.recipe)
+
+        self.assertTrue(current.startswith(f'{self.user.pk}.'))
+        Recipe.objects.filter(user=self.user).exclude(pk=self.recipe.pk)[0].tags.add(self.quick)
+        self.assertNotEqual(similarity.version(self.recipe), current)
+
+    def test_invalid_k(self):
+        """Test the number of results is validated."""
+        res = self.client.get(similar_url(self.recipe.pk), {'k': 0})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,160 @@
+"""
+Test for recipe statistics.
+"""
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api import counters, stats
+from recipe_api.models import Recipe, RecipeStat, Tag, Ingredient
+
+STATS_URL = reverse('recipe_api:recipe-stats')
+
+
+def create_recipe(user, **params):
+    payload = {
+        'title': 'Sample title',
+        'time_minutes': 10,
+        'price': Decimal('4.00'),
+        'description': 'Sample description',
+    }
+    payload.update(params)
+    return Recipe.objects.create(user=user, **payload)
+
+
+def stat_rows(user):
+    return sorted(
+        RecipeStat.objects.filter(user=user, recipe_count__gt=0).values_list(
+            'dimension', 'key', 'recipe_count', 'total_time_minutes', 'total_price',
+        )
+    )
+
+
+class TestRecipeStats(TestCase):
+    """Test incrementally maintained recipe statistics."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='testpass123',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='rice')
+
+    def test_auth_required(self):
+        """Test auth is required to read statistics."""
+        res = APIClient().get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_summary(self):
+        """Test statistics endpoint with recipes, tags and ingredients."""
+        recipe1 = create_recipe(self.user, time_minutes=10, price=Decimal('4.00'))
+        recipe2 = create_recipe(self.user, time_minutes=30, price=Decimal('12.00'))
+        recipe1.tags.add(self.tag)
+        recipe2.tags.add(self.tag)
+        recipe2.ingredients.add(self.ingredient)
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_recipe(other_user)
+
+        res = self.client.get(STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['recipe_count'], 2)
+        self.assertEqual(res.data['average_time_minutes'], 20)
+        self.assertEqual(res.data['average_price'], '8.00')
+        self.assertEqual(
+            [(bucket['bucket'], bucket['recipe_count']) for bucket in res.data['price_buckets']],
+            [('0-5', 1), ('10-20', 1)],
+        )
+        self.assertEqual(res.data['tags'][0]['name'], 'vegan')
+        self.assertEqual(res.data['tags'][0]['recipe_count'], 2)
+        self.assertEqual(res.data['ingredients'][0]['average_price'], '12.00')
+
+    def test_stats_reads_summary_rows_only(self):
+        """Test reading statistics does not depend on the number of recipes."""
+        for _ in range(20):
+            recipe = create_recipe(self.user)
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+        with self.assertNumQueries(3):
+            stats.summary(self.user)
+
+    def test_recipe_update_moves_bucket(self):
+        """Test updating the price moves the recipe between buckets and tag totals."""
+        recipe = create_recipe(self.user, price=Decimal('4.00'))
+        recipe.tags.add(self.tag)
+
+        recipe.price = Decimal('60.00')
+        recipe.save()
+
+        summary = stats.summary(self.user)
+        self.assertEqual([bucket['bucket'] for bucket in summary['price_buckets']], ['50+'])
+        self.assertEqual(summary['tags'][0]['average_price'], Decimal('60.00'))
+
+    def test_links_removed_and_recipe_deleted(self):
+        """Test removing links, clearing and deleting recipes update the statistics."""
+        recipe1 = create_recipe(self.user)
+        recipe2 = create_recipe(self.user)
+        recipe1.tags.add(self.tag)
+        recipe2.tags.add(self.tag)
+        recipe1.ingredients.add(self.ingredient)
+
+        recipe1.tags.remove(self.tag, Tag.objects.create(user=self.user, name='unlinked'))
+        recipe1.ingredients.clear()
+        recipe2.delete()
+
+        summary = stats.summary(self.user)
+        self.assertEqual(summary['recipe_count'], 1)
+        self.assertEqual(summary['tags'], [])
+        self.assertEqual(summary['ingredients'], [])
+
+    def test_reverse_links_and_tag_deleted(self):
+        """Test links added from the tag side and deleted tags."""
+        recipe = create_recipe(self.user)
+        self.tag.recipe_set.add(recipe)
+        self.assertEqual(stats.summary(self.user)['tags'][0]['recipe_count'], 1)
+
+        self.tag.delete()
+
+        self.assertFalse(RecipeStat.objects.filter(dimension=RecipeStat.TAG).exists())
+
+    def test_rebuild_matches_incremental(self):
+        """Test the rebuild command computes the same rows as the signals."""
+        recipe1 = create_recipe(self.user, price=Decimal('7.50'))
+        recipe2 = create_recipe(self.user, price=Decimal('100.00'), time_minutes=90)
+        recipe1.tags.add(self.tag)
+        recipe2.ingredients.add(self.ingredient)
+        recipe2.tags.add(self.tag)
+        incremental = stat_rows(self.user)
+
+        RecipeStat.objects.all().delete()
+        call_command('rebuild_recipe_stats', stdout=open('/dev/null', 'w'))
+
+        self.assertEqual(stat_rows(self.user), incremental)
+
+    def test_bulk_delete_matches_signals(self):
+        """Test deleting recipes in bulk keeps the statistics and counters."""
+        recipes = [create_recipe(self.user, price=Decimal(index)) for index in range(1, 7)]
+        for recipe in recipes:
+            recipe.tags.add(self.tag)
+            recipe.ingredients.add(self.ingredient)
+
+        with self.assertNumQueries(16):
+            deleted = Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes[:4]]).bulk_delete()
+
+        self.assertEqual(deleted, 4)
+        incremental = stat_rows(self.user)
+        stats.rebuild(user_ids=[self.user.pk])
+        self.assertEqual(stat_rows(self.user), incremental)
+        self.assertEqual(counters.repair(Tag, fix=False), [])
+        self.assertEqual(counters.repair(Ingredient, fix=False), [])
@@ -0,0 +1,163 @@
+"""
+Test for the delta sync.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from recipe_api import sync
+from recipe_api.models import Recipe, Tag, Ingredient, Tombstone
+
+SYNC_URL = reverse('recipe_api:sync')
+
+
+def create_recipe(user, title='Rice'):
+    return Recipe.objects.create(
+        user=user, title=title, time_minutes=10, price=Decimal('5.00'), description='Sample description',
+    )
+
+
+@override_settings(SYNC_SAFETY_WINDOW=0)
+class TestSync(TestCase):
+    """Test the sync endpoint returns the changes since the token."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+
+    def sync(self, token=None, **params):
+        res = self.client.get(SYNC_URL, {'since': token, **params} if token else params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_then_delta_sync(self):
+        """Test a full sync returns every row, the next ones only the changes."""
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='testpass123')
+        create_recipe(other_user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        rice = Ingredient.objects.create(user=self.user, name='rice')
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tag)
+        recipe.ingredients.add(rice, through_defaults={'quantity': Decimal('200'), 'unit': 'g'})
+        untouched = create_recipe(self.user, 'Soup')
+
+        full = self.sync()
+
+        self.assertFalse(full['has_more'])
+        self.assertFalse(full['reset'])
+        self.assertEqual([row['id'] for row in full['recipes']], [recipe.pk, untouched.pk])
+        self.assertEqual(full['recipes'][0]['tags'], [tag.pk])
+        self.assertEqual(full['recipes'][0]['ingredient_amounts'][0]['ingredient'], rice.pk)
+        self.assertEqual([row['name'] for row in full['tags']], ['vegan'])
+        self.assertEqual(full['deleted'], [])
+
+        recipe.title = 'Fried rice'
+        recipe.save()
+        delta = self.sync(full['token'])
+
+        self.assertEqual([row['title'] for row in delta['recipes']], ['Fried rice'])
+        self.assertEqual((delta['tags'], delta['ingredients'], delta['deleted']), ([], [], []))
+        self.assertEqual(self.sync(delta['token'])['recipes'], [])
+
+    def test_link_changes_and_deletions(self):
+        """Test removed links update the recipe and deleted rows are returned as tombstones."""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        recipe = create_recipe(self.user)
+        recipe.tags.add(tag)
+        removed = create_recipe(self.user, 'Soup')
+        token = self.sync()['token']
+
+        tag_id, removed_id = tag.pk, removed.pk
+        recipe.tags.remove(tag)
+        tag.delete()
+        removed.delete()
+        delta = self.sync(token)
+
+        self.assertEqual([(row['id'], row['tags']) for row in delta['recipes']], [(recipe.pk, [])])
+        self.assertEqual(
+            [(row['model'], row['object_id']) for row in delta['deleted']],
+            [(Tombstone.TAG, tag_id), (Tombstone.RECIPE, removed_id)],
+        )
+
+    def test_bulk_delete_writes_tombstones(self):
+        """Test recipes deleted in bulk are returned as tombstones."""
+        recipes = [create_recipe(self.user, f'Recipe {index}') for index in range(3)]
+        token = self.sync()['token']
+
+        Recipe.objects.filter(user=self.user).bulk_delete()
+
+        self.assertEqual(
+            sorted(row['object_id'] for row in self.sync(token)['deleted']), [recipe.pk for recipe in recipes],
+        )
+
+    def test_paged_sync(self):
+        """Test changes are returned in pages until has_more is unset."""
+        tags = [Tag.objects.create(user=self.user, name=f'tag {index}') for index in range(5)]
+        page = self.sync(limit=2)
+        seen = [row['id'] for row in page['tags']]
+        while page['has_more']:
+            page = self.sync(page['token'], limit=2)
+            seen += [row['id'] for row in page['tags']]
+
+        self.assertEqual(seen, [tag.pk for tag in tags])
+
+    @override_settings(SYNC_SAFETY_WINDOW=60)
+    def test_late_commit_is_synced(self):
+        """Test a row committed after the sync with an older change time is still returned."""
+        token = self.sync()['token']
+        late = Tag.objects.create(user=self.user, name='late')
+        Tag.objects.filter(pk=late.pk).update(updated_at=timezone.now() - timedelta(seconds=30))
+
+        self.assertEqual([row['id'] for row in self.sync(token)['tags']], [late.pk])
+
+    def test_expired_token_resets(self):
+        """Test a token older than the tombstones restarts a full sync."""
+        create_recipe(self.user)
+        expired = timezone.now() - timedelta(days=365)
+        token = sync.encode_token({kind: (expired, 0) for kind in sync.KINDS})
+
+        delta = self.sync(token)
+
+        self.assertTrue(delta['reset'])
+        self.assertEqual(len(delta['recipes']), 1)
+
+    def test_invalid_params(self):
+        """Test forged tokens and invalid limits are refused."""
+        self.assertEqual(self.client.get(SYNC_URL, {'since': 'forged'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(SYNC_URL, {'limit': '0'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_delta_sync_queries(self):
+        """Test a delta sync reads each kind once whatever the number of rows."""
+        for index in range(20):
+            create_recipe(self.user, f'Recipe {index}')
+        token = sync.changes(self.user)['token']
+        create_recipe(self.user, 'New')
+
+        # One query per kind, two prefetches for the links of the recipes.
+        with self.assertNumQueries(6):
+            changes = sync.changes(self.user, token)
+        self.assertEqual([recipe.title for recipe in changes['recipes']], ['New'])
+
+    def test_prune_tombstones(self):
+        """Test the command deletes the expired tombstones only."""
+        create_recipe(self.user).delete()
+        create_recipe(self.user).delete()
+        Tombstone.objects.filter(pk=Tombstone.objects.earliest('pk').pk).update(
+            deleted_at=timezone.now() - timedelta(days=365),
+        )
+        out = StringIO()
+
+        call_command('prune_tombstones', stdout=out)
+
+        self.assertIn('Deleted 1 tombstones', out.getvalue())
+        self.assertEqual(Tombstone.objects.count(), 1)
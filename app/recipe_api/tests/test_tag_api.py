@@ -2,7 +2,10 @@
 Test for tags.
 """
 from decimal import Decimal
+from io import StringIO
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
 from django.urls import reverse
 from django.contrib.auth import get_user_model
@@ -108,6 +111,29 @@ class PrivateTestTagAPI(TestCase):
         tag = Tag.objects.get(id=res.data['id'])
         self.assertEqual(tag.name, 'tag-1')
 
+    def test_create_tag_existing_name(self):
+        """Test a name the user already has is refused once normalized, other users may have it."""
+        create_tag(user=self.user, name='tag-1')
+        create_tag(user=create_user(email='other@example.com'), name='tag-2')
+
+        res = self.client.post(TAGS_URL, {'name': 'TAG 1'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', res.data)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(self.client.post(TAGS_URL, {'name': 'tag-2'}).status_code, status.HTTP_201_CREATED)
+
+    def test_update_tag_existing_name(self):
+        """Test renaming a tag to another tag of the user is refused, keeping its own name is not."""
+        create_tag(user=self.user, name='lunch')
+        tag = create_tag(user=self.user, name='brunch')
+
+        res = self.client.patch(get_detail_tag_url(tag.pk), {'name': 'Lunch'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        res = self.client.put(get_detail_tag_url(tag.pk), {'name': 'brunch'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_perform_tag_update(self):
         """Test tag updated successfully."""
         tag = create_tag(user=self.user, name='my-tag')
@@ -191,3 +217,67 @@ class PrivateTestTagAPI(TestCase):
         res = self.client.get(TAGS_URL, {'assigned_only': 1})
 
         self.assertEqual(len(res.data), 1)
+
+    def test_recipe_count_maintained(self):
+        """Test recipe counters follow links, unlinks and recipe deletions."""
+        tag = create_tag(user=self.user, name='breakfast')
+        recipes = [
+            Recipe.objects.create(title=f'Recipe {i}', time_minutes=5, price=Decimal('5.00'), user=self.user)
+            for i in range(3)
+        ]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        tag.recipe_set.add(recipes[0])  # Already linked
+
+        recipes[0].tags.remove(tag)
+        recipes[1].delete()
+        tag.refresh_from_db()
+
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_update_tag_keeps_recipe_count(self):
+        """Test saving a loaded tag does not overwrite its counter."""
+        tag = create_tag(user=self.user, name='breakfast')
+        recipe = Recipe.objects.create(title='Pancakes', time_minutes=5, price=Decimal('5.00'), user=self.user)
+        recipe.tags.add(tag)
+
+        res = self.client.patch(get_detail_tag_url(tag.pk), {'name': 'brunch'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
+
+    def test_order_and_filter_by_recipe_count(self):
+        """Test ordering by popularity and the minimum count filter."""
+        popular = create_tag(user=self.user, name='popular')
+        rare = create_tag(user=self.user, name='rare')
+        create_tag(user=self.user, name='unused')
+        for i in range(2):
+            recipe = Recipe.objects.create(title=f'Recipe {i}', time_minutes=5, price=Decimal('5.00'), user=self.user)
+            recipe.tags.add(popular)
+        recipe.tags.add(rare)
+
+        res = self.client.get(TAGS_URL, {'ordering': '-recipe_count', 'min_count': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([tag['name'] for tag in res.data], ['popular', 'rare'])
+
+    def test_invalid_ordering(self):
+        """Test unknown orderings are rejected."""
+        res = self.client.get(TAGS_URL, {'ordering': 'user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_repair_recipe_counts(self):
+        """Test the repair command fixes stale counters."""
+        tag = create_tag(user=self.user, name='breakfast')
+        recipe = Recipe.objects.create(title='Pancakes', time_minutes=5, price=Decimal('5.00'), user=self.user)
+        recipe.tags.add(tag)
+        Tag.objects.filter(pk=tag.pk).update(recipe_count=7)
+
+        with self.assertRaises(CommandError):
+            call_command('repair_recipe_counts', check=True, stdout=StringIO())
+        call_command('repair_recipe_counts', stdout=StringIO())
+
+        tag.refresh_from_db()
+        self.assertEqual(tag.recipe_count, 1)
@@ -7,7 +7,8 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (RecipeViewSet,
                     TagViewSet,
-                    IngredientViewSet)
+                    IngredientViewSet,
+                    SyncView)
 
 router = DefaultRouter()
 router.register('recipes', RecipeViewSet)
@@ -16,5 +17,6 @@ router.register('ingredients', IngredientViewSet)
 
 app_name = 'recipe_api'
 urlpatterns = [
-    path('', include(router.urls))
+    path('', include(router.urls)),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
@@ -1,6 +1,11 @@
 """
 Views for recipe_api endpoint.
 """
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+
 from drf_spectacular.utils import (
     extend_schema_view,
     extend_schema,
@@ -11,15 +16,37 @@ from rest_framework import permissions
 from rest_framework import viewsets
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from core.sharding import lock_user, shard_for
+
+from . import compound, links, names, pantry, shopping, similarity, stats, sync
 from .models import Recipe, Tag, Ingredient
 from .serializers import (RecipeCreateSerializer,
                           RecipeSerializer,
                           RecipeDetailSerializer,
                           TagSerializer,
                           IngredientSerializer,
-                          RecipeImageSerializer)
+                          RecipeImageSerializer,
+                          RecipeStatsSerializer,
+                          RecipeSimilarSerializer,
+                          RecipePantrySerializer,
+                          PantrySearchSerializer,
+                          ShoppingListRequestSerializer,
+                          ShoppingListItemSerializer,
+                          RecipeLinksSerializer,
+                          BulkRecipeLinksSerializer,
+                          SyncSerializer)
+
+ATTR_ORDERINGS = ['name', '-name', 'recipe_count', '-recipe_count']
+RECIPE_ORDERINGS = ['price', '-price', 'time_minutes', '-time_minutes', 'title', '-title']
+COMPOUND_PARAMETER = OpenApiParameter(
+    'compound',
+    OpenApiTypes.BOOL,
+    description='Return {"data", "included"}, with the related users, tags and ingredients referenced by id.',
+)
 
 
 class BaseRecipeAttrViewSet(viewsets.ModelViewSet):
@@ -35,6 +62,16 @@ class BaseRecipeAttrViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.INT, enum=[0, 1],
                 description='Filter by items assigned to recipes.',
             ),
+            OpenApiParameter(
+                'min_count',
+                OpenApiTypes.INT,
+                description='Filter by items assigned to at least this number of recipes.',
+            ),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=ATTR_ORDERINGS,
+                description='Order by name or by number of recipes, descending with a leading `-`.',
+            ),
         ]
     )
 )
@@ -45,10 +82,39 @@ class BaseIngredientTagAttrViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Retrieve ingredients or tags only for authenticated user."""
         assigned_only = bool(self.request.query_params.get('assigned_only', 0))
-        queryset = self.queryset
+        min_count = self.request.query_params.get('min_count', None)
+        ordering = self.request.query_params.get('ordering', '-name')
+        if ordering not in ATTR_ORDERINGS:
+            raise ValidationError({'ordering': f'Must be one of {", ".join(ATTR_ORDERINGS)}.'})
+        queryset = self.queryset.using(shard_for(self.request.user))
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+            queryset = queryset.filter(recipe_count__gt=0)
+        if min_count:
+            if not min_count.isdigit():
+                raise ValidationError({'min_count': 'Must be a positive integer.'})
+            queryset = queryset.filter(recipe_count__gte=int(min_count))
+        return queryset.filter(user=self.request.user).order_by(ordering)
+
+    def _save(self, serializer, **kwargs):
+        """Save under the lock of `recipe_api.names`, refusing a name the user already has."""
+        model, user = self.queryset.model, self.request.user
+        using = shard_for(user)
+        name = serializer.validated_data.get('name', getattr(serializer.instance, 'name', ''))
+        with transaction.atomic(using=using):
+            lock_user(user.pk, using)
+            names.lock(model, user, using)
+            taken = model.objects.using(using).filter(user=user, name=model.normalize_name(name))
+            if serializer.instance is not None:
+                taken = taken.exclude(pk=serializer.instance.pk)
+            if taken.exists():
+                raise ValidationError({'name': [f'A {model._meta.verbose_name} with this name already exists.']})
+            serializer.save(**kwargs)
+
+    def perform_create(self, serializer):
+        self._save(serializer, user=self.request.user)
+
+    def perform_update(self, serializer):
+        self._save(serializer)
 
 
 @extend_schema_view(
@@ -64,8 +130,18 @@ class BaseIngredientTagAttrViewSet(viewsets.ModelViewSet):
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter',
             ),
+            OpenApiParameter('price_min', OpenApiTypes.DECIMAL, description='Filter by minimum price.'),
+            OpenApiParameter('price_max', OpenApiTypes.DECIMAL, description='Filter by maximum price.'),
+            OpenApiParameter('time_max', OpenApiTypes.INT, description='Filter by maximum time in minutes.'),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR, enum=RECIPE_ORDERINGS,
+                description='Order by price, time or title, descending with a leading `-`. Newest first by default.',
+            ),
+            COMPOUND_PARAMETER,
         ]
-    )
+    ),
+    retrieve=extend_schema(parameters=[COMPOUND_PARAMETER]),
 )
 class RecipeViewSet(BaseRecipeAttrViewSet):
     model = Recipe
@@ -76,18 +152,50 @@ class RecipeViewSet(BaseRecipeAttrViewSet):
         """Convert string into a list of integers."""
         return [int(param_id) for param_id in qs.split(',')]
 
+    def _decimal_param(self, name):
+        """Returns the decimal query param or None, raises ValidationError when invalid."""
+        value = self.request.query_params.get(name, None)
+        if value is None:
+            return None
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            value = None
+        if value is None or not value.is_finite():
+            raise ValidationError({name: 'Must be a decimal number.'})
+        return value
+
     def get_queryset(self):
-        """Retrieve recipes for authenticated user filtered by tags and ingredients."""
+        """Retrieve recipes for authenticated user filtered by tags, ingredients, price and time."""
         tags = self.request.query_params.get('tags', None)
         ingredients = self.request.query_params.get('ingredients', None)
-        queryset = self.queryset.filter(user=self.request.user)
+        time_max = self.request.query_params.get('time_max', None)
+        ordering = self.request.query_params.get('ordering', None)
+        if ordering is not None and ordering not in RECIPE_ORDERINGS:
+            raise ValidationError({'ordering': f'Must be one of {", ".join(RECIPE_ORDERINGS)}.'})
+        queryset = self.queryset.using(shard_for(self.request.user)).filter(user=self.request.user)
+        price_min, price_max = self._decimal_param('price_min'), self._decimal_param('price_max')
+        if price_min is not None:
+            queryset = queryset.filter(price__gte=price_min)
+        if price_max is not None:
+            queryset = queryset.filter(price__lte=price_max)
+        if time_max is not None:
+            if not time_max.isdigit():
+                raise ValidationError({'time_max': 'Must be a positive integer.'})
+            queryset = queryset.filter(time_minutes__lte=int(time_max))
         if tags:
             tag_ids = self._params_to_ints(tags)
             queryset = queryset.filter(tags__id__in=tag_ids)
         if ingredients:
             ingredient_ids = self._params_to_ints(ingredients)
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.order_by('-id').distinct()
+        if ordering:
+            # The id tie-break matches the (user, field, id) indexes.
+            queryset = queryset.order_by(ordering, f'{ordering[0] if ordering[0] == "-" else ""}id')
+        else:
+            queryset = queryset.order_by('-id')
+        # Only joins on the links can duplicate recipes.
+        return queryset.distinct() if tags or ingredients else queryset
 
     def get_serializer_class(self):
         """Returns serializer class for the request."""
@@ -97,8 +205,26 @@ class RecipeViewSet(BaseRecipeAttrViewSet):
             return RecipeCreateSerializer
         elif self.action == 'upload_image':
             return RecipeImageSerializer
+        elif self.action == 'stats':
+            return RecipeStatsSerializer
+        elif self.action == 'similar':
+            return RecipeSimilarSerializer
+        elif self.action == 'pantry':
+            return RecipePantrySerializer
+        elif self.action == 'shopping_list':
+            return ShoppingListItemSerializer
         return self.serializer_class
 
+    def list(self, request, *args, **kwargs):
+        if not compound.requested(request):
+            return super().list(request, *args, **kwargs)
+        return Response(compound.document(self.filter_queryset(self.get_queryset()), request.user))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not compound.requested(request):
+            return super().retrieve(request, *args, **kwargs)
+        return Response(compound.document(self.get_object(), request.user, many=False))
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
@@ -114,20 +240,151 @@ class RecipeViewSet(BaseRecipeAttrViewSet):
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('k', OpenApiTypes.INT, description='Number of similar recipes to return.'),
+        ]
+    )
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        """Recipes of the user most similar by tags and ingredients."""
+        k = request.query_params.get('k', str(settings.SIMILAR_RECIPES_DEFAULT))
+        if not k.isdigit() or not 0 < int(k) <= settings.SIMILAR_RECIPES_MAX:
+            raise ValidationError({'k': f'Must be between 1 and {settings.SIMILAR_RECIPES_MAX}.'})
+        recipes = similarity.similar_recipes(self.get_object(), int(k))
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @extend_schema(request=PantrySearchSerializer)
+    @action(methods=['POST'], detail=False)
+    def pantry(self, request):
+        """Recipes cookable with the given ingredients or missing at most `max_missing` of them."""
+        search = PantrySearchSerializer(data=request.data)
+        search.is_valid(raise_exception=True)
+        recipes = pantry.cookable_recipes(
+            request.user, search.validated_data['ingredients'], search.validated_data['max_missing'],
+            using=shard_for(request.user),
+        )
+        return Response(self.get_serializer(recipes, many=True).data)
+
+    @extend_schema(request=ShoppingListRequestSerializer)
+    @action(methods=['POST'], detail=False, url_path='shopping-list')
+    def shopping_list(self, request):
+        """Ingredients of the given recipes merged by ingredient and unit."""
+        plan = ShoppingListRequestSerializer(data=request.data)
+        plan.is_valid(raise_exception=True)
+        items = shopping.shopping_list(request.user, plan.validated_data['recipes'], using=shard_for(request.user))
+        return Response(self.get_serializer(items, many=True).data)
+
+    def _check_owned(self, model, ids, field):
+        """Raise ValidationError for ids which are not rows of the user."""
+        unknown = links.unknown_ids(model, self.request.user, ids, using=shard_for(self.request.user))
+        if unknown:
+            raise ValidationError({field: f'Unknown ids: {", ".join(map(str, unknown[:20]))}.'})
+
+    def _change_links(self, request, field):
+        """Link (POST) or unlink (DELETE) the ids of the body, the other links of the recipe are kept."""
+        recipe = self.get_object()
+        body = RecipeLinksSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        self._check_owned(links.FIELDS[field], body.validated_data['ids'], 'ids')
+        links.change(
+            field, request.user, [recipe.pk], body.validated_data['ids'], request.method == 'POST',
+            using=shard_for(request.user),
+        )
+        return Response(self.get_serializer(recipe).data)
+
+    def _bulk_change_links(self, request, field):
+        """Link (POST) or unlink (DELETE) the ids of the body and every recipe of the body."""
+        body = BulkRecipeLinksSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        self._check_owned(Recipe, body.validated_data['recipes'], 'recipes')
+        self._check_owned(links.FIELDS[field], body.validated_data['ids'], 'ids')
+        links.change(
+            field, request.user, body.validated_data['recipes'], body.validated_data['ids'], request.method == 'POST',
+            using=shard_for(request.user),
+        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(request=RecipeLinksSerializer)
+    @action(methods=['POST', 'DELETE'], detail=True, url_path='tags')
+    def tag_links(self, request, pk=None):
+        """Add (POST) or remove (DELETE) tags of the recipe."""
+        return self._change_links(request, 'tags')
+
+    @extend_schema(request=RecipeLinksSerializer)
+    @action(methods=['POST', 'DELETE'], detail=True, url_path='ingredients')
+    def ingredient_links(self, request, pk=None):
+        """Add (POST) or remove (DELETE) ingredients of the recipe."""
+        return self._change_links(request, 'ingredients')
+
+    @extend_schema(
+        methods=['POST'], request=BulkRecipeLinksSerializer, responses={204: None},
+        operation_id='recipes_bulk_tags_create',
+    )
+    @extend_schema(
+        methods=['DELETE'], request=BulkRecipeLinksSerializer, responses={204: None},
+        operation_id='recipes_bulk_tags_destroy',
+    )
+    @action(methods=['POST', 'DELETE'], detail=False, url_path='tags')
+    def bulk_tag_links(self, request):
+        """Add (POST) or remove (DELETE) tags of many recipes."""
+        return self._bulk_change_links(request, 'tags')
+
+    @extend_schema(
+        methods=['POST'], request=BulkRecipeLinksSerializer, responses={204: None},
+        operation_id='recipes_bulk_ingredients_create',
+    )
+    @extend_schema(
+        methods=['DELETE'], request=BulkRecipeLinksSerializer, responses={204: None},
+        operation_id='recipes_bulk_ingredients_destroy',
+    )
+    @action(methods=['POST', 'DELETE'], detail=False, url_path='ingredients')
+    def bulk_ingredient_links(self, request):
+        """Add (POST) or remove (DELETE) ingredients of many recipes."""
+        return self._bulk_change_links(request, 'ingredients')
+
+    @action(methods=['GET'], detail=False)
+    def stats(self, request):
+        """Statistics of the recipes of the user, read from the summary rows."""
+        serializer = self.get_serializer(stats.summary(request.user, using=shard_for(request.user)))
+        return Response(serializer.data)
+
 
 class TagViewSet(BaseIngredientTagAttrViewSet):
     model = Tag
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
-
 
 class IngredientViewSet(BaseIngredientTagAttrViewSet):
     model = Ingredient
     serializer_class = IngredientSerializer
     queryset = Ingredient.objects.all()
 
-    def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+
+class SyncView(APIView):
+    """Recipes, tags and ingredients of the user changed since the `since` token, see `recipe_api.sync`."""
+    permission_classes = (permissions.IsAuthenticated,)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'since',
+                OpenApiTypes.STR,
+                description='Token of the previous response, omitted for a full sync.',
+            ),
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Most rows of each kind to return.'),
+        ],
+        responses=SyncSerializer,
+    )
+    def get(self, request):
+        limit = request.query_params.get('limit', str(settings.SYNC_PAGE_SIZE))
+        if not limit.isdigit() or not 0 < int(limit) <= settings.SYNC_MAX_PAGE_SIZE:
+            raise ValidationError({'limit': f'Must be between 1 and {settings.SYNC_MAX_PAGE_SIZE}.'})
+        try:
+            changes = sync.changes(
+                request.user, request.query_params.get('since') or None, int(limit), using=shard_for(request.user),
+            )
+        except sync.InvalidToken as error:
+            raise ValidationError({'since': str(error)})
+        return Response(SyncSerializer(changes).data)
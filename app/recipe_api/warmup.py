@@ -0,0 +1,57 @@
+"""
+Warmup tasks for recipe_api, run by `core.readiness`.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from rest_framework.test import APIRequestFactory
+
+from core.sharding import shard_for
+from user_api.serializers import UserSerializer, AuthSerializer
+
+from . import similarity
+from .models import Recipe
+from .serializers import (RecipeCreateSerializer,
+                          RecipeSerializer,
+                          RecipeDetailSerializer,
+                          TagSerializer,
+                          IngredientSerializer,
+                          RecipeImageSerializer)
+
+SERIALIZERS = (
+    RecipeSerializer,
+    RecipeDetailSerializer,
+    RecipeCreateSerializer,
+    RecipeImageSerializer,
+    TagSerializer,
+    IngredientSerializer,
+    UserSerializer,
+    AuthSerializer,
+)
+
+
+def prime_serializers():
+    """Build the fields of every API serializer once.
+
+    This loads the model metadata caches and the lazy imports the first
+    request would otherwise pay for.
+    """
+    request = APIRequestFactory().get('/')
+    for serializer_class in SERIALIZERS:
+        serializer_class(context={'request': request}).fields
+
+
+def preload_recent_users():
+    """Fill the caches read by the requests of the most recently active users.
+
+    These are the similar recipes of their `WARMUP_RECENT_RECIPES` latest
+    recipes, see `recipe_api.similarity`.
+    """
+    users = get_user_model().objects.filter(
+        is_active=True, last_login__isnull=False,
+    ).order_by('-last_login').values_list('id', flat=True)[:settings.WARMUP_RECENT_USERS]
+    for user_id in users:
+        using = shard_for(user_id)
+        recipes = Recipe.objects.using(using).filter(user_id=user_id).order_by('-id')
+        for recipe in recipes.only('id', 'user_id')[:settings.WARMUP_RECENT_RECIPES]:
+            similarity.cached_scores(recipe)
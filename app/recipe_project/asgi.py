@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
 
 application = get_asgi_application()
+
+# Warm caches up before the readiness probe lets traffic in.
+from core.readiness import start_warmup  # noqa: E402
+
+start_warmup()
@@ -20,7 +20,7 @@ ALLOWED_HOSTS = []
 
 INSTALLED_APPS = [
     # Native components
-    'django.contrib.admin',
+    'django.contrib.admin.apps.SimpleAdminConfig',  # Admin modules are discovered by the URLconf, not by commands
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -41,6 +41,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
@@ -49,6 +50,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'recipe_project.urls'
@@ -90,9 +92,46 @@ if 'test' in sys.argv or 'test_coverage' in sys.argv:  # Covers regular testing
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-        }
+        },
+        # Local shards, only created for the tests using them
+        'shard_1': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'shard_1.sqlite3'),
+        },
+        'shard_2': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'shard_2.sqlite3'),
+        },
     }
 
+# Recipe data of the users spread on the databases of `RECIPE_SHARDS` by user id,
+# users and the other global tables stay in `default`, see `core.sharding`
+DATABASE_ROUTERS = ['core.sharding.ShardRouter']
+RECIPE_SHARDS = ['default']
+# Sharded models, parents first, with the lookup of their user id
+SHARDED_MODELS = {
+    'recipe_api.Recipe': 'user_id',
+    'recipe_api.Tag': 'user_id',
+    'recipe_api.Ingredient': 'user_id',
+    'recipe_api.RecipeTag': 'recipe__user_id',
+    'recipe_api.RecipeIngredient': 'recipe__user_id',
+    'recipe_api.RecipeStat': 'user_id',
+    'recipe_api.Tombstone': 'user_id',
+}
+SHARD_ID_RANGE = 2 ** 40
+SHARD_MOVE_BATCH_SIZE = 1000
+SHARD_MOVE_ATTEMPTS = 3
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.InstrumentedLocMemCache',
+        'METRICS_ALIAS': 'default',
+    }
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -175,6 +214,94 @@ SPECTACULAR_SETTINGS = {
     }
 }
 
+# Similar recipes, results are cached in the default cache under a version of the
+# recipes of the user, so every process sees changes without invalidations
+SIMILAR_RECIPES_TAG_WEIGHT = 1.0
+SIMILAR_RECIPES_INGREDIENT_WEIGHT = 2.0
+SIMILAR_RECIPES_DEFAULT = 10
+SIMILAR_RECIPES_MAX = 50
+SIMILAR_RECIPES_CACHE_TIMEOUT = 60 * 60
+
+# Pantry search, largest pantry accepted and most missing ingredients per recipe
+PANTRY_MAX_INGREDIENTS = 2000
+PANTRY_MAX_MISSING = 2
+
+# Most tag or ingredient names created along with a recipe write
+RECIPE_MAX_NAMES = 50
+
+# Incremental tag and ingredient links, most ids per request and recipes per statement
+RECIPE_LINKS_MAX_IDS = 100
+RECIPE_LINKS_MAX_RECIPES = 10000
+RECIPE_LINKS_BATCH_SIZE = 500
+
+# Largest number of recipes merged in one shopping list
+SHOPPING_LIST_MAX_RECIPES = 200
+
+# Background tasks run by `manage.py run_worker`, retried with exponential backoff. Running
+# tasks refresh their lock every heartbeat, a task not refreshed for the lock timeout is requeued
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+TASK_HEARTBEAT_INTERVAL = 30
+TASK_LOCK_TIMEOUT = 5 * 60
+TASK_WORKER_CONCURRENCY = 4
+TASK_POLL_INTERVAL = 1.0
+
+# Transactional outbox of recipe, tag and ingredient changes, delivered by `manage.py relay_outbox`.
+# No event is recorded without sinks, changes made while this is empty are never delivered, e.g.
+# [{'BACKEND': 'core.outbox.WebhookSink', 'OPTIONS': {'url': 'https://search.example.com/events'}}]
+OUTBOX_SINKS = []
+OUTBOX_BATCH_SIZE = 500
+# Seconds a relay holds its batch, longer than the sinks take to accept it
+OUTBOX_LEASE_TIMEOUT = 60
+OUTBOX_POLL_INTERVAL = 1.0
+OUTBOX_MAX_RETRY_DELAY = 60
+OUTBOX_MAX_LAG = 60
+
+# Background account deletion, models deleted in batches before the user in this order
+ACCOUNT_DELETION_MODELS = [
+    'recipe_api.Recipe',
+    'recipe_api.Tag',
+    'recipe_api.Ingredient',
+    'recipe_api.RecipeStat',
+    'recipe_api.Tombstone',
+]
+ACCOUNT_DELETION_BATCH_SIZE = 500
+ACCOUNT_DELETION_PRIORITY = -10
+
+# Delta sync of `/api/sync/`: rows of each kind per page, seconds read again behind
+# the newest change for transactions committing late, days deletions are kept
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+SYNC_SAFETY_WINDOW = 60
+SYNC_TOMBSTONE_RETENTION = 30
+
+# Batches of calls of `/api/batch/`, apps whose views may be called, most calls per
+# batch and threads serving the reads of all batches concurrently
+BATCH_APPS = ['recipe_api', 'user_api']
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# Bulk user creation of `manage.py bulk_create_users`, users per INSERT and processes
+# hashing the passwords, one per core when None
+USER_IMPORT_BATCH_SIZE = 1000
+USER_IMPORT_WORKERS = None
+
+# Password checks of the token login: threads hashing per process, checks waiting for
+# them before 429, seconds before 503, Retry-After of the 429 and seconds a successful
+# check is cached
+LOGIN_HASH_WORKERS = 2
+LOGIN_HASH_QUEUE = 8
+LOGIN_HASH_TIMEOUT = 5
+LOGIN_RETRY_AFTER = 1
+LOGIN_CACHE_TIMEOUT = 10
+AUTHENTICATION_BACKENDS = ['user_api.login.PooledModelBackend']
+
+# Precomputed OpenAPI schema, regenerated when the code version changes
+CODE_VERSION = os.environ.get('CODE_VERSION')
+SCHEMA_CACHE_DIR = os.environ.get('SCHEMA_CACHE_DIR', os.path.join(BASE_DIR, 'vol/web/schema/'))
+SCHEMA_CACHE_MAX_AGE = 60 * 60 * 24
+
 # Default Storage
 DEFAULT_FILE_STORAGE = 'storages.backends.s3boto3.S3Boto3Storage'
 
@@ -188,6 +315,33 @@ AWS_STORAGE_BUCKET_NAME = 'recipesdjango'
 AWS_S3_FILE_OVERWRITE = False
 AWS_DEFAULT_ACL = None
 
+# Heavy modules that must only be imported on first use, see `manage.py profile_imports`
+STARTUP_LAZY_MODULES = [
+    'boto3',
+    'botocore',
+    'PIL',
+    'drf_spectacular.views',
+    'drf_spectacular.generators',
+]
+
+# Startup readiness checks and warmup
+READINESS_TIMEOUT = float(os.environ.get('READINESS_TIMEOUT', 60))
+READINESS_STORAGE_PROBE = '.readiness'
+WARMUP_TASKS = [
+    'core.readiness.prime_url_resolvers',
+    'recipe_api.warmup.prime_serializers',
+    'recipe_api.warmup.preload_recent_users',
+]
+WARMUP_RECENT_USERS = 50
+WARMUP_RECENT_RECIPES = 10
+
+# On-demand profiling of live requests, only for staff users
+PROFILING_HEADER = 'X-Profile'
+PROFILING_QUERY_PARAM = 'profile'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 1.0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'vol/web/profiles/'))
+PROFILING_TOP = 25
+
 # CORS configurations
 CORS_ALLOW_ALL_ORIGINS = True  # If this is used then `CORS_ALLOWED_ORIGINS` will not have any effect
 CORS_ALLOW_CREDENTIALS = True
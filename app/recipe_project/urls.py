@@ -6,14 +6,22 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from core.views import BatchView, lazy_view, metrics_view, liveness_view, readiness_view, schema_view
+
+# Admin modules are loaded with the URLconf, so by HTTP processes only, whether or not
+# they serve /admin/; the schema generator is only loaded by processes serving the docs.
+admin.autodiscover()
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('api/batch/', BatchView.as_view(), name='batch'),
     path('api/', include('recipe_api.urls', namespace='recipe')),
     path('api/user/', include('user_api.urls', namespace='user')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='docs')
+    path('api/schema/', schema_view, name='schema'),
+    path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='docs'),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/live/', liveness_view, name='liveness'),
+    path('health/ready/', readiness_view, name='readiness'),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'recipe_project.settings')
 
 application = get_wsgi_application()
+
+# Warm caches up before the readiness probe lets traffic in.
+from core.readiness import start_warmup  # noqa: E402
+
+start_warmup()
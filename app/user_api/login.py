@@ -0,0 +1,114 @@
+"""
+Password checks of the token login on a bounded pool of threads.
+
+At most `LOGIN_HASH_WORKERS` passwords are hashed at once per process and
+`LOGIN_HASH_QUEUE` more wait for a thread; further logins fail at once with
+429 instead of holding a request worker, and a check not done within
+`LOGIN_HASH_TIMEOUT` seconds fails with 503. PBKDF2 releases the GIL, so
+the other requests of the process keep running during login bursts.
+
+Logins go through `PooledModelBackend`, the authentication backend of
+`AUTHENTICATION_BACKENDS`. A successful check is cached for
+`LOGIN_CACHE_TIMEOUT` seconds under a keyed fingerprint of the user, their
+password hash and the password, so retried logins are not hashed again and
+a password change invalidates it.
+"""
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+
+from rest_framework.exceptions import APIException, Throttled
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class LoginUnavailable(APIException):
+    status_code = 503
+    default_detail = 'Login is temporarily unavailable, try again shortly.'
+    default_code = 'login_unavailable'
+
+
+def get_executor():
+    """Returns the pool of the process and the semaphore of its running and queued checks."""
+    global _executor, _slots
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.LOGIN_HASH_WORKERS, thread_name_prefix='login')
+            _slots = threading.BoundedSemaphore(settings.LOGIN_HASH_WORKERS + settings.LOGIN_HASH_QUEUE)
+        return _executor, _slots
+
+
+def run(fn, *args):
+    """Returns the result of fn run on the pool, raises Throttled when the pool is full."""
+    executor, slots = get_executor()
+    if not slots.acquire(blocking=False):
+        raise Throttled(wait=settings.LOGIN_RETRY_AFTER)
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda future: slots.release())
+    try:
+        return future.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+    except TimeoutError:
+        future.cancel()
+        raise LoginUnavailable()
+
+
+def _fingerprint(user, password):
+    # Anyone reading the cache and knowing SECRET_KEY can test guesses of the password
+    # of a cached entry at HMAC speed; entries only exist for LOGIN_CACHE_TIMEOUT seconds
+    # after a successful login, and both secrets already give access to the accounts.
+    message = f'{user.pk}:{user.password}:{password}'.encode()
+    key = hashlib.sha256(f'login-cache:{settings.SECRET_KEY}'.encode()).digest()
+    return 'login:' + hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def check(user, password):
+    """Returns whether the password is the one of the user, checked on the pool unless cached."""
+    key = _fingerprint(user, password)
+    if cache.get(key):
+        return True
+    upgraded = []
+    if not run(check_password, password, user.password, upgraded.append):
+        return False
+    if upgraded:
+        # The hash of the password uses outdated hasher settings.
+        user.set_password(password)
+        user.save(update_fields=['password'])
+        key = _fingerprint(user, password)
+    cache.set(key, True, settings.LOGIN_CACHE_TIMEOUT)
+    return True
+
+
+class PooledModelBackend(ModelBackend):
+    """The ModelBackend hashing the passwords on the pool of the process.
+
+    Failed logins send `user_login_failed` through `django.contrib.auth.authenticate`.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        users = get_user_model()._default_manager
+        if username is None:
+            username = kwargs.get(users.model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = users.get_by_natural_key(username)
+        except users.model.DoesNotExist:
+            # Hash anyway, the response time does not tell registered emails.
+            run(make_password, password)
+            return None
+        if check(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
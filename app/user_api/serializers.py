@@ -3,6 +3,9 @@ Serializers for User.
 """
 from rest_framework import serializers
 from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth.models import update_last_login
+
+from core.utils import check_email
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,6 +20,11 @@ class UserSerializer(serializers.ModelSerializer):
         }
         read_only_fields = ('id',)
 
+    def validate_email(self, value):
+        if not check_email(value.lower()):
+            raise serializers.ValidationError('Email must be in the correct format.')
+        return value
+
     def create(self, validated_data):
         return get_user_model().objects.create_user(**validated_data)
 
@@ -40,6 +48,7 @@ class AuthSerializer(serializers.Serializer):
         email = attrs.get('email')
         password = attrs.get('password')
 
+        # Hashed on the bounded pool of `user_api.login.PooledModelBackend`, 429 or 503 when it is saturated.
         user = authenticate(
             request=self.context.get('request', ),
             username=email,
@@ -50,5 +59,7 @@ class AuthSerializer(serializers.Serializer):
             msg = 'Unable to authenticate with provided credentials'
             raise serializers.ValidationError(msg, code='authorization')
 
+        # A token login is a login, the recent users are preloaded by `recipe_api.warmup`.
+        update_last_login(None, user)
         attrs['user'] = user
         return attrs
@@ -1,12 +1,22 @@
 """
 Test for user_api.
 """
-from django.test import TestCase
+import threading
+import time
+from unittest.mock import patch
+
+from django.contrib.auth.hashers import check_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+
+from core.models import AccountDeletion, Task
+from user_api import login
 
 CREATE_USER_URL = reverse('user_api:create')
 TOKEN_URL = reverse('user_api:token')
@@ -19,6 +29,7 @@ class TestPublicUserAPI(TestCase):
 
     def setUp(self):
         """Setting up client for testing."""
+        cache.clear()
         self.client = APIClient()
 
     def test_create_user_success(self):
@@ -68,6 +79,16 @@ class TestPublicUserAPI(TestCase):
         res = self.client.post(CREATE_USER_URL, payload)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_create_user_email_bad_format(self):
+        """Test create user with an email the validator rejects with error."""
+        payload = {
+            'email': 'test..user@example.com',
+            'password': 'testexample123',
+        }
+        res = self.client.post(CREATE_USER_URL, payload)
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('email', res.data)
+
     def test_create_invalid_user(self):
         """Test create invalid user with error."""
         payload = {}
@@ -97,6 +118,75 @@ class TestPublicUserAPI(TestCase):
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertNotIn('token', res.data)
 
+    def test_create_token_retry_cached(self):
+        """Test a retried login is not hashed again, a wrong password still fails."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test123',
+        }
+        get_user_model().objects.create_user(**payload)
+        with patch('user_api.login.check_password', wraps=check_password) as patched_check:
+            for _ in range(3):
+                res = self.client.post(TOKEN_URL, payload)
+                self.assertEqual(res.status_code, status.HTTP_200_OK)
+            res = self.client.post(TOKEN_URL, {**payload, 'password': 'invalidpassword'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(patched_check.call_count, 2)
+
+    def test_create_token_failed_signal_and_inactive(self):
+        """Test failed logins send user_login_failed and inactive users cannot log in."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test123',
+        }
+        user = get_user_model().objects.create_user(**payload)
+        failures = []
+
+        def receiver(credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(receiver)
+        try:
+            res = self.client.post(TOKEN_URL, {**payload, 'password': 'invalidpassword'})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+            user.is_active = False
+            user.save()
+            res = self.client.post(TOKEN_URL, payload)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        finally:
+            user_login_failed.disconnect(receiver)
+
+        self.assertEqual(failures, ['test@example.com', 'test@example.com'])
+
+    def test_create_token_saturated(self):
+        """Test logins fail at once when every slot of the hashing pool is taken."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test123',
+        }
+        get_user_model().objects.create_user(**payload)
+        executor, _ = login.get_executor()
+        with patch('user_api.login.get_executor', return_value=(executor, threading.BoundedSemaphore(0))):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+
+    @override_settings(LOGIN_HASH_TIMEOUT=0.01)
+    def test_create_token_timeout(self):
+        """Test logins whose check does not end in time fail with 503."""
+        payload = {
+            'email': 'test@example.com',
+            'password': 'test123',
+        }
+        get_user_model().objects.create_user(**payload)
+        with patch('user_api.login.check_password', side_effect=lambda *args: time.sleep(0.2)):
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
     def test_create_token_invalid_empty_parameters(self):
         """Test create invalid token payload empty."""
         payload = {
@@ -178,3 +268,16 @@ class TestPrivateUserAPI(TestCase):
         """Delete user own successfully."""
         res = self.client.delete(ME_URL)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_delete_user_profile_in_background(self):
+        """Delete user deactivates the account and queues the deletion."""
+        res = self.client.delete(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.is_active)
+        deletion = AccountDeletion.objects.get(user_id=self.user.pk)
+        self.assertEqual(deletion.status, AccountDeletion.PENDING)
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'core.deletion.run_deletion')
+        self.assertEqual(task.args, [deletion.pk, 'default'])
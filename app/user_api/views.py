@@ -9,6 +9,8 @@ from rest_framework.response import Response
 
 from django.contrib.auth import get_user_model
 
+from core.deletion import request_deletion
+
 from .serializers import UserSerializer, AuthSerializer
 
 User = get_user_model()
@@ -39,6 +41,10 @@ class UserMeView(generics.RetrieveUpdateDestroyAPIView):
     def get_object(self):
         return self.request.user
 
+    def perform_destroy(self, instance):
+        """Deactivate the account now, its data is deleted in the background."""
+        request_deletion(instance)
+
 # class UserRetrieveView(generics.RetrieveAPIView):
 #     serializer_class = UserSerializer
 #     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)